@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AccountConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'account'
+
+    def ready(self):
+        # Revokes tokens and drops the cached user when a user changes
+        from . import authentication  # noqa: F401
+        # Registers the shared cache deployment check
+        from . import checks  # noqa: F401
@@ -0,0 +1,146 @@
+"""
+Stateless JWT authentication.
+
+Access tokens issued by CustomTokenObtainPairSerializer carry the user's id,
+username, role and capability mask, so ClaimsJWTAuthentication builds the
+request user from the validated token instead of loading the account.User
+row on every request. The few views that need the model itself use
+request.user.full_user, a short-lived cached fetch.
+
+Because the user row is no longer read, revocation is checked against the
+cache: single tokens by jti (logout) and every token of a user issued before
+a point in time (deactivation, role or password change). This needs a cache
+shared by all processes: set CACHE_REDIS_URL in production, which
+`manage.py check --deploy` enforces (see account.checks).
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+USER_CACHE_TTL = 60
+USER_CACHE_KEY = 'account:user:{}'
+REVOKED_TOKEN_KEY = 'account:revoked-token:{}'
+REVOKED_BEFORE_KEY = 'account:revoked-before:{}'
+# Tokens missing any of these are authenticated against the user row
+REQUIRED_CLAIMS = ('username', 'role', 'caps')
+# Changes to these fields invalidate the user's outstanding tokens
+REVOKING_FIELDS = ('role', 'is_active', 'password')
+# Login time with sub-second precision, set by CustomTokenObtainPairSerializer.
+# The standard iat claim is whole seconds, too coarse to tell a token issued
+# just after a role change from one issued just before it
+AUTH_TIME_CLAIM = 'auth_time'
+
+
+def cached_user(user_id):
+    """
+    The User row for user_id, cached for USER_CACHE_TTL seconds.
+    """
+    key = USER_CACHE_KEY.format(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.get(pk=user_id)
+        cache.set(key, user, USER_CACHE_TTL)
+    return user
+
+
+def forget_user(user_id):
+    cache.delete(USER_CACHE_KEY.format(user_id))
+
+
+def revoke_token(token):
+    """
+    Rejects this token until it would have expired anyway.
+    """
+    remaining = token['exp'] - int(time.time())
+    if remaining > 0:
+        cache.set(REVOKED_TOKEN_KEY.format(token[api_settings.JTI_CLAIM]), True, remaining)
+
+
+def revoke_user_tokens(user_id):
+    """
+    Rejects every token of the user issued up to now. Kept for the refresh
+    token lifetime, the longest any of them can live.
+    """
+    timeout = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    cache.set(REVOKED_BEFORE_KEY.format(user_id), time.time(), timeout)
+
+
+def check_revoked(token):
+    """
+    Raises AuthenticationFailed if the token was revoked, in a single cache
+    lookup.
+    """
+    token_key = REVOKED_TOKEN_KEY.format(token.get(api_settings.JTI_CLAIM))
+    user_key = REVOKED_BEFORE_KEY.format(token.get(api_settings.USER_ID_CLAIM))
+    revoked = cache.get_many([token_key, user_key])
+    # Tokens issued before auth_time was added only have the whole-second iat
+    issued_at = token.get(AUTH_TIME_CLAIM, token.get('iat', 0))
+    if token_key in revoked or (user_key in revoked and issued_at < revoked[user_key]):
+        raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user backed by the access token claims. Has id/pk, username,
+    role and caps; use full_user for anything else.
+    """
+    def __str__(self):
+        return self.username
+
+    @cached_property
+    def id(self):
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+    @cached_property
+    def full_user(self):
+        return cached_user(self.id)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication returning a ClaimsUser instead of querying the user.
+    """
+    def get_user(self, validated_token):
+        check_revoked(validated_token)
+        if all(claim in validated_token for claim in REQUIRED_CLAIMS):
+            return ClaimsUser(validated_token)
+        # Issued without the custom claims, e.g. before they were added
+        return super().get_user(validated_token)
+
+
+@receiver(pre_save, sender=User, dispatch_uid='account.authentication.revoke_on_change')
+def revoke_on_change(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(REVOKING_FIELDS):
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*REVOKING_FIELDS).first()
+    if previous and any(previous[field] != getattr(instance, field) for field in REVOKING_FIELDS):
+        user_id = instance.pk
+        transaction.on_commit(lambda: revoke_user_tokens(user_id))
+
+
+@receiver(post_save, sender=User, dispatch_uid='account.authentication.forget_saved_user')
+def forget_saved_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+@receiver(post_delete, sender=User, dispatch_uid='account.authentication.revoke_deleted_user')
+def revoke_deleted_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: (revoke_user_tokens(user_id), forget_user(user_id)))
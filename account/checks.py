@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries are only visible to the process that wrote them
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, Tags.security, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Token revocation (account.authentication) and replica stickiness
+    (restaurant_management.replicas) are kept in the default cache, so it
+    must be shared by every worker process outside development.
+    """
+    if settings.DEBUG:
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f'The default cache ({backend}) is local to each process, so revoked '
+            f'tokens stay valid, and users who just wrote may read stale replicas, '
+            f'in every other worker.',
+            hint='Set CACHE_REDIS_URL, e.g. redis://localhost:6379/2.',
+            id='account.E001',
+        )]
+    return []
@@ -0,0 +1,53 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from account.authentication import ClaimsJWTAuthentication
+from account.serializers import CustomTokenObtainPairSerializer
+from restaurant_management.bench import rolled_back
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Compares requests/sec of an authenticated no-op view behind the
+    DB-backed JWTAuthentication and behind ClaimsJWTAuthentication, so the
+    numbers isolate the authentication cost. The user is rolled back.
+    """
+    help = 'Benchmark DB-backed against claims-based JWT authentication.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self._run(options['requests'])
+
+    def _run(self, count):
+        user = User.objects.create_user(username='bench-auth', password='bench', role=User.Role.WAITER)
+        access = str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+        factory = APIRequestFactory()
+
+        self.stdout.write(f"{'authentication':<28} {'requests/s':>11} {'us/request':>11}")
+        for label, authentication in (
+            ('JWTAuthentication (DB)', JWTAuthentication),
+            ('ClaimsJWTAuthentication', ClaimsJWTAuthentication),
+        ):
+            view = type('BenchView', (APIView,), {
+                'authentication_classes': [authentication],
+                'permission_classes': [IsAuthenticated],
+                'get': lambda self, request: Response({'id': request.user.pk}),
+            }).as_view()
+            requests = [factory.get('/bench/', HTTP_AUTHORIZATION=f'Bearer {access}') for _ in range(count)]
+            started = time.perf_counter()
+            for request in requests:
+                assert view(request).status_code == 200
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{label:<28} {count / elapsed:>11.0f} {elapsed / count * 1e6:>11.1f}')
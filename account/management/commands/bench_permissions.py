@@ -0,0 +1,56 @@
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.permissions import IsManagerOrAdmin
+from account.roles import Capability, has_capability
+from account.serializers import CustomTokenObtainPairSerializer
+from restaurant_management.bench import rolled_back
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Times the permission work of one typical staff request (a permission
+    class plus a queryset scoping check) the old way, loading the user and
+    comparing role strings, and the new way, testing bits of the capability
+    mask carried in the validated token. The user is rolled back afterwards.
+    """
+    help = 'Micro-benchmark per-request permission evaluation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self._run(options['requests'])
+
+    def _run(self, count):
+        user = User.objects.create_user(username='bench-permissions', password='bench', role=User.Role.MANAGER)
+        claims = AccessToken(str(CustomTokenObtainPairSerializer.get_token(user).access_token))
+        user_id = claims['user_id']
+        permission = IsManagerOrAdmin()
+
+        def string_checks(user):
+            allowed = user.role == User.Role.MANAGER or user.role == User.Role.ADMIN
+            return allowed and user.role in [User.Role.ADMIN, User.Role.MANAGER, User.Role.WAITER, User.Role.CASHIER]
+
+        def capability_checks(request):
+            return permission.has_permission(request, None) and has_capability(request, Capability.VIEW_ALL_ORDERS)
+
+        cases = [
+            ('role strings, user loaded from DB', lambda: string_checks(User.objects.get(pk=user_id))),
+            ('role strings, user in memory', lambda: string_checks(user)),
+            ('capability bits from token claims', lambda: capability_checks(SimpleNamespace(user=user, auth=claims))),
+        ]
+        self.stdout.write(f"{'path':<36} {'us/request':>11}")
+        for label, run in cases:
+            started = time.perf_counter()
+            for _ in range(count):
+                assert run()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{label:<36} {elapsed / count * 1e6:>11.2f}')
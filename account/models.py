@@ -10,6 +10,8 @@ class User(AbstractUser):
         MANAGER = "Manager", "Manager"
         CASHIER = "Cashier", "Cashier"
         WAITER = "Waiter", "Waiter"
+        CHEF = "Chef", "Chef"
+        CUSTOMER = "Customer", "Customer"
 
     role = models.CharField(
         max_length=10,
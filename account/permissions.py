@@ -1,32 +1,55 @@
 # account/permissions.py
 
 from rest_framework import permissions
-from .models import User
+from .roles import Capability, has_capability
 
-class IsAdmin(permissions.BasePermission):
+class HasCapability(permissions.BasePermission):
     """
-    Custom permission to only allow admin users access.
+    Base permission allowing users whose role grants `capability`.
     """
+    capability = Capability.NONE
+
     def has_permission(self, request, view):
-        return request.user and request.user.role == User.Role.ADMIN
+        return has_capability(request, self.capability)
 
-class IsManagerOrAdmin(permissions.BasePermission):
+class IsAdmin(HasCapability):
+    """
+    Custom permission to only allow admin users access.
+    """
+    capability = Capability.ADMINISTER
+
+class IsManagerOrAdmin(HasCapability):
     """
     Custom permission to only allow manager or admin users access.
     """
-    def has_permission(self, request, view):
-        return request.user and (request.user.role == User.Role.MANAGER or request.user.role == User.Role.ADMIN)
+    capability = Capability.MANAGE
 
-class IsWaiter(permissions.BasePermission):
+class IsWaiter(HasCapability):
     """
     Custom permission to only allow waiter users access.
     """
-    def has_permission(self, request, view):
-        return request.user and request.user.role == User.Role.WAITER
+    capability = Capability.SERVE_TABLES
 
-class IsCashier(permissions.BasePermission):
+class IsCashier(HasCapability):
     """
     Custom permission to only allow cashier users access.
     """
-    def has_permission(self, request, view):
-        return request.user and request.user.role == User.Role.CASHIER
+    capability = Capability.TAKE_PAYMENTS
+
+class IsChef(HasCapability):
+    """
+    Custom permission to only allow chef users access.
+    """
+    capability = Capability.PREPARE_ORDERS
+
+class IsCustomer(HasCapability):
+    """
+    Custom permission to only allow customer users access.
+    """
+    capability = Capability.LEAVE_FEEDBACK
+
+class CanUpdateOrderStatus(HasCapability):
+    """
+    Staff allowed to move orders through the kitchen workflow.
+    """
+    capability = Capability.UPDATE_ORDER_STATUS
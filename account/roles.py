@@ -0,0 +1,79 @@
+# account/roles.py
+
+"""
+What each role may do, as precomputed capability bitmasks.
+
+Permission classes and queryset scoping test a bit in the mask rather than
+compare role names. The mask is issued in the access token's 'caps' claim
+(see CustomTokenObtainPairSerializer), so a request resolves it from the
+already validated token. A role change revokes the user's outstanding
+tokens (see account.authentication).
+"""
+from enum import IntFlag
+
+from .models import User
+
+
+class Capability(IntFlag):
+    NONE = 0
+    # See every order and reservation, not only one's own
+    VIEW_ALL_ORDERS = 1 << 0
+    VIEW_ALL_RESERVATIONS = 1 << 1
+    # Move orders through the kitchen workflow
+    UPDATE_ORDER_STATUS = 1 << 2
+    # Role specific areas
+    SERVE_TABLES = 1 << 3
+    PREPARE_ORDERS = 1 << 4
+    TAKE_PAYMENTS = 1 << 5
+    LEAVE_FEEDBACK = 1 << 6
+    # Menu, coupons and reports
+    MANAGE = 1 << 7
+    ADMINISTER = 1 << 8
+
+
+ALL_CAPABILITIES = Capability(sum(Capability))
+
+ROLE_CAPABILITIES = {
+    User.Role.ADMIN: ALL_CAPABILITIES,
+    User.Role.MANAGER: (
+        Capability.VIEW_ALL_ORDERS | Capability.VIEW_ALL_RESERVATIONS
+        | Capability.UPDATE_ORDER_STATUS | Capability.MANAGE
+    ),
+    User.Role.WAITER: (
+        Capability.VIEW_ALL_ORDERS | Capability.VIEW_ALL_RESERVATIONS
+        | Capability.UPDATE_ORDER_STATUS | Capability.SERVE_TABLES
+    ),
+    User.Role.CASHIER: (
+        Capability.VIEW_ALL_ORDERS | Capability.VIEW_ALL_RESERVATIONS | Capability.TAKE_PAYMENTS
+    ),
+    User.Role.CHEF: (
+        Capability.VIEW_ALL_ORDERS | Capability.UPDATE_ORDER_STATUS | Capability.PREPARE_ORDERS
+    ),
+    User.Role.CUSTOMER: Capability.LEAVE_FEEDBACK,
+}
+
+
+def role_capabilities(role):
+    return ROLE_CAPABILITIES.get(role, Capability.NONE)
+
+
+def request_capabilities(request):
+    """
+    The capabilities of the request's user, resolved once per request: from
+    the access token's 'caps' claim when present, else from the user's role.
+    """
+    caps = getattr(request, '_capabilities', None)
+    if caps is None:
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            caps = Capability.NONE
+        else:
+            claims = getattr(request, 'auth', None)
+            claim = claims.get('caps') if hasattr(claims, 'get') else None
+            caps = Capability(claim) if claim is not None else role_capabilities(getattr(user, 'role', None))
+        request._capabilities = caps
+    return caps
+
+
+def has_capability(request, capability):
+    return bool(request_capabilities(request) & capability)
@@ -1,5 +1,11 @@
+import time
+
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from .authentication import AUTH_TIME_CLAIM, check_revoked
+from .roles import role_capabilities
 
 User = get_user_model()
 
@@ -21,3 +27,41 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         if User.objects.filter(email=value).exclude(pk=user.pk).exists():
             raise serializers.ValidationError("This email is already in use.")
         return value
+
+class UserSerializer(serializers.ModelSerializer):
+    """
+    Serializer for registering new users. Self-registered accounts are
+    always customers; staff roles are assigned by an admin.
+    """
+    password = serializers.CharField(write_only=True, min_length=8)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email', 'password', 'first_name', 'last_name', 'role']
+        read_only_fields = ['id', 'role']
+
+    def create(self, validated_data):
+        return User.objects.create_user(role=User.Role.CUSTOMER, **validated_data)
+
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Adds the user's username, role and capability mask to the tokens, so
+    requests can be authorized from the token claims alone.
+    """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['role'] = user.role
+        token['caps'] = int(role_capabilities(user.role))
+        token[AUTH_TIME_CLAIM] = time.time()
+        return token
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuses revoked refresh tokens. The new access token copies the role
+    claims of the refresh token, so a revoked one must not be refreshed.
+    """
+    def validate(self, attrs):
+        check_revoked(RefreshToken(attrs['refresh']))
+        return super().validate(attrs)
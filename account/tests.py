@@ -1,3 +1,90 @@
-from django.test import TestCase
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import ClaimsJWTAuthentication, ClaimsUser, revoke_token
+from .checks import check_shared_cache
+from .models import User
+from .permissions import IsCustomer, IsManagerOrAdmin
+from .roles import Capability, has_capability, role_capabilities
+from .serializers import CustomTokenObtainPairSerializer, UserSerializer
+
+
+class CapabilityClaimTests(TestCase):
+    def test_token_carries_role_capabilities(self):
+        user = User.objects.create_user(username='manager', password='secret-pass', role=User.Role.MANAGER)
+        claims = AccessToken(str(CustomTokenObtainPairSerializer.get_token(user).access_token))
+        self.assertEqual(claims['role'], User.Role.MANAGER)
+        self.assertEqual(claims['caps'], role_capabilities(User.Role.MANAGER))
+
+        request = SimpleNamespace(user=user, auth=claims)
+        self.assertTrue(IsManagerOrAdmin().has_permission(request, None))
+        self.assertTrue(has_capability(request, Capability.VIEW_ALL_ORDERS))
+        self.assertFalse(IsCustomer().has_permission(request, None))
+
+    def test_claim_takes_precedence_over_role(self):
+        user = User.objects.create_user(username='waiter', password='secret-pass', role=User.Role.WAITER)
+        request = SimpleNamespace(user=user, auth={'caps': int(Capability.LEAVE_FEEDBACK)})
+        self.assertFalse(has_capability(request, Capability.UPDATE_ORDER_STATUS))
+        self.assertTrue(IsCustomer().has_permission(request, None))
+
+    def test_registration_assigns_customer_role(self):
+        serializer = UserSerializer(data={
+            'username': 'diner', 'password': 'secret-pass', 'role': User.Role.ADMIN,
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save().role, User.Role.CUSTOMER)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='waiter', password='secret-pass', role=User.Role.WAITER)
+        self.token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return ClaimsJWTAuthentication().authenticate(request)
+
+    def test_user_built_from_claims_without_queries(self):
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(self.token)
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.pk, user.username, user.role), (self.user.pk, 'waiter', User.Role.WAITER))
+        self.assertEqual(user.full_user, self.user)
+
+    def test_revoked_token_is_rejected(self):
+        revoke_token(self.token)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.token)
+
+    def test_role_change_revokes_outstanding_tokens(self):
+        self.user.role = User.Role.CHEF
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.token)
+
+    def test_token_issued_right_after_role_change_is_accepted(self):
+        self.user.role = User.Role.CHEF
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        user, _ = self.authenticate(token)
+        self.assertEqual(user.role, User.Role.CHEF)
+
+
+class SharedCacheCheckTests(TestCase):
+    @override_settings(DEBUG=False, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_fails(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['account.E001'])
+
+    @override_settings(DEBUG=False, CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/2',
+    }})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
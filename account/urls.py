@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserRegistrationView, CustomTokenObtainPairView, UserUpdateViewSet
+from .views import UserRegistrationView, CustomTokenObtainPairView, LogoutView, UserUpdateViewSet
 
 router = DefaultRouter()
 router.register(r'profile', UserUpdateViewSet, basename='user-profile')
@@ -8,5 +8,6 @@ router.register(r'profile', UserUpdateViewSet, basename='user-profile')
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='user-register'),
     path('login/', CustomTokenObtainPairView.as_view(), name='token-obtain-pair'),
+    path('logout/', LogoutView.as_view(), name='token-revoke'),
     path('', include(router.urls)),
 ]
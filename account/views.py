@@ -2,9 +2,13 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework import mixins
 from django.contrib.auth import get_user_model
-from .serializers import UserUpdateSerializer
+from .serializers import CustomTokenObtainPairSerializer, UserSerializer, UserUpdateSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework import generics
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import revoke_token
 
 User = get_user_model()
 
@@ -16,6 +20,27 @@ class UserRegistrationView(generics.CreateAPIView):
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+class LogoutView(APIView):
+    """
+    Revokes the access token used for the request and, if given, the
+    refresh token in 'refresh'.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        tokens = [request.auth]
+        if request.data.get('refresh'):
+            try:
+                refresh = RefreshToken(request.data['refresh'])
+            except TokenError:
+                return Response({'detail': 'Invalid refresh token.'}, status=status.HTTP_400_BAD_REQUEST)
+            if str(refresh.get('user_id')) != str(request.user.pk):
+                return Response({'detail': 'Invalid refresh token.'}, status=status.HTTP_400_BAD_REQUEST)
+            tokens.append(refresh)
+        for token in tokens:
+            revoke_token(token)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class UserUpdateViewSet(
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -32,6 +57,7 @@ class UserUpdateViewSet(
     def get_object(self):
         """
         Returns the object the view is displaying. In this case, it's always the
-        logged-in user's profile.
+        logged-in user's profile. Loaded fresh, since request.user is only
+        built from the token claims.
         """
-        return self.request.user
+        return generics.get_object_or_404(self.get_queryset(), pk=self.request.user.pk)
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from products.cache import bump_menu_version
+from .models import MenuCategory
+
+
+@receiver([post_save, post_delete], sender=MenuCategory, dispatch_uid='home.signals.menu_category_changed')
+def menu_category_changed(sender, instance, **kwargs):
+    """
+    Bumps the menu version so category list ETags change after the write.
+    """
+    transaction.on_commit(bump_menu_version)
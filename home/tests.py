@@ -1,3 +1,36 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory
 
-# Create your tests here.
+from products.models import Category
+from .models import MenuCategory
+from .views import CategoryListAPIView
+
+
+class CategoryListETagTests(TestCase):
+    """
+    Unchanged category lists are answered with a 304, and any menu or
+    category write changes the ETag.
+    """
+
+    def setUp(self):
+        cache.clear()
+        MenuCategory.objects.create(name='Mains')
+
+    def _get(self, **headers):
+        return CategoryListAPIView.as_view()(APIRequestFactory().get('/categories/', **headers))
+
+    def test_if_none_match(self):
+        etag = self._get()['ETag']
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        for write in (
+            lambda: MenuCategory.objects.create(name='Desserts'),
+            lambda: Category.objects.create(name='Drinks'),
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            response = self._get(HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
@@ -1,7 +1,24 @@
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import generics
 from rest_framework.permissions import AllowAny
-from .models import ContactFormSubmission
-from .serializers import ContactFormSubmissionSerializer
+from products.cache import menu_etag
+from .models import ContactFormSubmission, MenuCategory
+from .serializers import ContactFormSubmissionSerializer, MenuCategorySerializer
+
+class CategoryListAPIView(generics.ListAPIView):
+    """
+    API view listing all menu categories.
+    Supports conditional GET, so polling clients get a 304 while the menu
+    version is unchanged.
+    """
+    queryset = MenuCategory.objects.order_by('name')
+    serializer_class = MenuCategorySerializer
+    permission_classes = [AllowAny]
+
+    @method_decorator(condition(etag_func=menu_etag))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 class ContactFormSubmissionCreateAPIView(generics.CreateAPIView):
     """
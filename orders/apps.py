@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
+
+    def ready(self):
+        from django.core.signals import request_started
+
+        # Connects the rollup, leaderboard and popularity receivers to
+        # order_sales_changed and the coupon and status cache invalidation to
+        # their model writes
+        from . import coupons, leaderboard, popularity, rollups, statuses  # noqa: F401
+
+        # Warm the status registry as the first request starts rather than
+        # here, since the database may not exist yet when apps are loaded
+        request_started.connect(statuses.warm_registry, dispatch_uid='orders.statuses.warm_registry')
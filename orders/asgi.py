@@ -0,0 +1,141 @@
+"""
+ASGI endpoints for the live order feed, mounted by restaurant_management.asgi:
+
+    ws://<host>/ws/orders/          WebSocket
+    GET /api/orders/stream/         Server-Sent Events
+
+Both stream the JSON events published by orders.feed to staff whose
+access token grants Capability.VIEW_ALL_ORDERS. The token is sent as
+"Authorization: Bearer <token>", or, since browsers can not set headers
+on a WebSocket, as the subprotocols ["bearer", "<token>"]. It is never
+read from the query string, which ends up in access logs. Revoked tokens
+are refused (see account.authentication).
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.authentication import check_revoked
+from account.roles import Capability
+from .feed import get_broker
+
+WEBSOCKET_PATH = '/ws/orders/'
+SSE_PATH = '/api/orders/stream/'
+SSE_HEARTBEAT = 15
+# Offered by browser clients next to the token, echoed back on accept
+BEARER_SUBPROTOCOL = 'bearer'
+
+
+def handles(scope):
+    return (
+        (scope['type'] == 'websocket' and scope['path'] == WEBSOCKET_PATH)
+        or (scope['type'] == 'http' and scope['path'] == SSE_PATH)
+    )
+
+
+def _raw_token(scope):
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            scheme, _, token = value.decode('latin-1').partition(' ')
+            if scheme.lower() == 'bearer' and token:
+                return token.strip()
+    subprotocols = list(scope.get('subprotocols', ()))
+    if BEARER_SUBPROTOCOL in subprotocols:
+        position = subprotocols.index(BEARER_SUBPROTOCOL)
+        if position + 1 < len(subprotocols):
+            return subprotocols[position + 1]
+    return None
+
+
+def _authenticate(scope):
+    """
+    The validated access token of a staff member allowed to see every
+    order, or None.
+    """
+    token = _raw_token(scope)
+    if not token:
+        return None
+    try:
+        token = AccessToken(token)
+        check_revoked(token)
+    except (TokenError, AuthenticationFailed):
+        return None
+    if not Capability(token.get('caps', 0)) & Capability.VIEW_ALL_ORDERS:
+        return None
+    return token
+
+
+async def order_feed_application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await _websocket(scope, receive, send)
+    else:
+        await _server_sent_events(scope, receive, send)
+
+
+async def _wait_for(receive, message_type):
+    while True:
+        message = await receive()
+        if message['type'] == message_type:
+            return
+
+
+async def _websocket(scope, receive, send):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if await sync_to_async(_authenticate)(scope) is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    accept = {'type': 'websocket.accept'}
+    if BEARER_SUBPROTOCOL in scope.get('subprotocols', ()):
+        accept['subprotocol'] = BEARER_SUBPROTOCOL
+    await send(accept)
+
+    subscription = get_broker().subscribe()
+
+    async def forward():
+        while True:
+            await send({'type': 'websocket.send', 'text': await subscription.get()})
+
+    await _run_until_disconnect(forward(), _wait_for(receive, 'websocket.disconnect'), subscription)
+
+
+async def _server_sent_events(scope, receive, send):
+    if await sync_to_async(_authenticate)(scope) is None:
+        await send({'type': 'http.response.start', 'status': 401, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Authentication required.'})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    subscription = get_broker().subscribe()
+
+    async def forward():
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscription.get(), timeout=SSE_HEARTBEAT)
+                body = f'data: {payload}\n\n'
+            except asyncio.TimeoutError:
+                body = ': keep-alive\n\n'
+            await send({'type': 'http.response.body', 'body': body.encode('utf-8'), 'more_body': True})
+
+    await _run_until_disconnect(forward(), _wait_for(receive, 'http.disconnect'), subscription)
+
+
+async def _run_until_disconnect(forward, disconnect, subscription):
+    tasks = [asyncio.ensure_future(forward), asyncio.ensure_future(disconnect)]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        subscription.close()
+        for task in tasks:
+            task.cancel()
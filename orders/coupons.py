@@ -0,0 +1,123 @@
+"""
+Coupon validation and redemption.
+
+Validation is served from a small process-local cache of coupon snapshots,
+so checking a code as the customer types does not hit the database on every
+keystroke. Entries expire after COUPON_CACHE_TTL seconds and are dropped as
+soon as the coupon is written in this process; other processes pick the
+change up when their entry expires. The cache holds at most
+COUPON_CACHE_SIZE codes, evicting the least recently used; unknown codes are
+only remembered for COUPON_MISS_TTL seconds, so guessing codes can neither
+grow it nor keep a newly created coupon hidden for long.
+
+Redemption never trusts the cache: it is a single conditional UPDATE that
+only increments times_used while the coupon is active, in its validity
+window and under its usage limit, so parallel requests cannot over-redeem.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Coupon
+
+COUPON_CACHE_TTL = 60
+COUPON_MISS_TTL = 5
+COUPON_CACHE_SIZE = 1024
+
+CouponSnapshot = namedtuple(
+    'CouponSnapshot',
+    ['id', 'code', 'discount_percentage', 'is_active', 'valid_from', 'valid_until', 'max_uses', 'times_used'],
+)
+
+
+class CouponError(Exception):
+    """
+    Raised when a coupon cannot be used. ``reason`` is a stable identifier.
+    """
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _load(code):
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(code)
+        if entry is not None and entry[1] > now:
+            _cache.move_to_end(code)
+            return entry[0]
+
+    row = Coupon.objects.filter(code=code).values_list(*CouponSnapshot._fields).first()
+    snapshot = CouponSnapshot(*row) if row else None
+    ttl = COUPON_CACHE_TTL if snapshot is not None else COUPON_MISS_TTL
+    with _cache_lock:
+        _cache[code] = (snapshot, now + ttl)
+        _cache.move_to_end(code)
+        while len(_cache) > COUPON_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return snapshot
+
+
+def invalidate(code=None):
+    """
+    Drops one code, or every code, from this process's cache.
+    """
+    with _cache_lock:
+        if code is None:
+            _cache.clear()
+        else:
+            _cache.pop(code, None)
+
+
+@receiver([post_save, post_delete], sender=Coupon, dispatch_uid='orders.coupons.coupon_changed')
+def coupon_changed(sender, instance, **kwargs):
+    invalidate(instance.code)
+
+
+def validate_coupon(code, today=None):
+    """
+    Returns the snapshot of a usable coupon or raises CouponError.
+    The usage count may be up to COUPON_CACHE_TTL seconds old.
+    """
+    today = today or timezone.localdate()
+    coupon = _load(code.strip())
+    if coupon is None:
+        raise CouponError('not_found', 'Coupon code not found.')
+    if not coupon.is_active:
+        raise CouponError('inactive', 'This coupon is no longer active.')
+    if today < coupon.valid_from:
+        raise CouponError('not_yet_valid', 'This coupon is not valid yet.')
+    if today > coupon.valid_until:
+        raise CouponError('expired', 'This coupon has expired.')
+    if coupon.max_uses is not None and coupon.times_used >= coupon.max_uses:
+        raise CouponError('exhausted', 'This coupon has reached its usage limit.')
+    return coupon
+
+
+def redeem_coupon(code, today=None):
+    """
+    Atomically consumes one use of a coupon. Returns the validated snapshot
+    or raises CouponError when the coupon is unusable or already used up.
+    """
+    today = today or timezone.localdate()
+    coupon = validate_coupon(code, today)
+    redeemed = Coupon.objects.filter(
+        Q(max_uses__isnull=True) | Q(times_used__lt=F('max_uses')),
+        pk=coupon.id,
+        is_active=True,
+        valid_from__lte=today,
+        valid_until__gte=today,
+    ).update(times_used=F('times_used') + 1)
+    if not redeemed:
+        invalidate(coupon.code)
+        raise CouponError('exhausted', 'This coupon can no longer be redeemed.')
+    return coupon
@@ -0,0 +1,150 @@
+"""
+Streaming exports of the order history for accounting.
+
+Rows are read with values_list().iterator(), so no model instances are
+built and only one database chunk is held at a time, and written out in
+blocks of CHUNK_SIZE rows. Memory use therefore does not grow with the
+size of the export.
+"""
+import csv
+import datetime
+import io
+import json
+
+from django.utils import timezone
+
+from .models import Order, OrderItem
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    # Spreadsheet friendly: local times, CRLF line endings
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    # Typed columns for Parquet/Arrow/DuckDB readers: UTC ISO 8601
+    # timestamps, plain decimals, LF line endings
+    'parquet-csv': 'text/csv',
+}
+
+EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'parquet-csv': 'csv'}
+
+# Output column -> values_list lookup, per kind of export
+COLUMNS = {
+    'orders': {
+        'order_id': 'id',
+        'created_at': 'created_at',
+        'customer_id': 'customer_id',
+        'waiter_id': 'waiter_id',
+        'status': 'status__name',
+        'total': 'total',
+    },
+    'items': {
+        'order_id': 'order_id',
+        'created_at': 'order__created_at',
+        'customer_id': 'order__customer_id',
+        'waiter_id': 'order__waiter_id',
+        'status': 'order__status__name',
+        'order_item_id': 'id',
+        'menu_item_id': 'item_id',
+        'menu_item_name': 'item__name',
+        'quantity': 'quantity',
+        'unit_price': 'unit_price',
+        'line_total': 'line_total',
+    },
+}
+
+# Chronological, walking the orders' (created_at, id) index
+ORDERING = {
+    'orders': ('created_at', 'id'),
+    'items': ('order__created_at', 'order_id', 'id'),
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def export_rows(kind, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """
+    Returns the header and a lazy iterator of value tuples for orders (or
+    order items) created from start to end, both inclusive dates in the
+    current time zone.
+    """
+    columns = COLUMNS[kind]
+    queryset = Order.objects.all() if kind == 'orders' else OrderItem.objects.all()
+    created_at = 'created_at' if kind == 'orders' else 'order__created_at'
+    if start is not None:
+        queryset = queryset.filter(**{f'{created_at}__gte': _day_start(start)})
+    if end is not None:
+        queryset = queryset.filter(**{f'{created_at}__lt': _day_start(end + datetime.timedelta(days=1))})
+    # Pin the database now: the rows are read while the response streams,
+    # after the view (and any replica routing around it) has returned
+    queryset = queryset.using(queryset.db)
+    rows = queryset.order_by(*ORDERING[kind]).values_list(*columns.values()).iterator(chunk_size=chunk_size)
+    return list(columns), rows
+
+
+def _utc(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _csv_value(value):
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def _typed_value(value):
+    if isinstance(value, datetime.datetime):
+        return _utc(value)
+    return value
+
+
+def _json_value(value):
+    if isinstance(value, datetime.datetime):
+        return _utc(value)
+    if value is None or isinstance(value, (int, str)):
+        return value
+    # Decimals stay strings so no precision is lost
+    return str(value)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render(fmt, header, rows, chunk_size=CHUNK_SIZE):
+    """
+    Yields the export as text blocks of up to chunk_size rows.
+    """
+    if fmt == 'ndjson':
+        for chunk in _chunks(rows, chunk_size):
+            yield ''.join(
+                json.dumps(dict(zip(header, map(_json_value, row)))) + '\n' for row in chunk
+            )
+        return
+
+    convert = _csv_value if fmt == 'csv' else _typed_value
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\r\n' if fmt == 'csv' else '\n')
+    writer.writerow(header)
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows([tuple(map(convert, row)) for row in chunk])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def filename(kind, fmt, start=None, end=None):
+    span = '-'.join(str(day) for day in (start, end) if day is not None)
+    return f"{kind}{'-' + span if span else ''}.{EXTENSIONS[fmt]}"
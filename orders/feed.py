@@ -0,0 +1,175 @@
+"""
+Push feed of order changes for kitchen and waiter displays.
+
+Views publish compact order-delta events after their transaction commits.
+Subscribers (the WebSocket and SSE endpoints in orders.asgi) receive them
+from a broker. The default broker fans events out in-process, which is
+enough when the web workers and the ASGI server share a process. Set
+ORDER_FEED_REDIS_URL to relay events through Redis pub/sub between processes.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per subscriber before a slow display starts losing them
+SUBSCRIBER_QUEUE_SIZE = 256
+REDIS_CHANNEL = 'orders:feed'
+
+
+def order_event(order, event_type):
+    """
+    Builds the compact event published for an order change.
+    """
+    return {
+        'type': event_type,
+        'id': order.pk,
+        'status': order.status.name if order.status_id else None,
+        'waiter': order.waiter_id,
+        'total': str(order.total),
+        'ts': time.time(),
+    }
+
+
+def publish_order_event(order, event_type):
+    """
+    Publishes an order event once the current transaction commits.
+    """
+    event = order_event(order, event_type)
+    transaction.on_commit(lambda: get_broker().publish(event))
+
+
+def publish_bulk_status_event(order_ids, status):
+    """
+    Publishes one event for a batch of orders moved to the same status,
+    once the current transaction commits.
+    """
+    if not order_ids:
+        return
+    event = {
+        'type': 'order.status.bulk',
+        'ids': list(order_ids),
+        'status': status.name,
+        'ts': time.time(),
+    }
+    transaction.on_commit(lambda: get_broker().publish(event))
+
+
+class Subscription:
+    """
+    A single display's view of the feed. Iterate with ``await subscription.get()``.
+    """
+    def __init__(self, broker):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def deliver(self, payload):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Fans events out to every subscription in this process.
+    publish() may be called from any thread.
+    """
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        self.fan_out(json.dumps(event))
+
+    def fan_out(self, payload):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, payload)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes through Redis so every process sees every event. Each process
+    runs one listener that relays messages to its local subscriptions.
+    """
+    def __init__(self, url):
+        super().__init__()
+        import redis
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+
+    def subscribe(self):
+        subscription = super().subscribe()
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    def publish(self, event):
+        try:
+            self._client.publish(REDIS_CHANNEL, json.dumps(event))
+        except Exception as e:
+            logger.error(f"Failed to publish order event to Redis: {e}")
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(REDIS_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    self.fan_out(message['data'].decode('utf-8'))
+        finally:
+            await pubsub.close()
+            await client.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = getattr(settings, 'ORDER_FEED_REDIS_URL', None)
+                _broker = RedisBroker(url) if url else InProcessBroker()
+    return _broker
@@ -0,0 +1,155 @@
+"""
+Precomputed top-customers leaderboard.
+
+Spend is recorded per customer, both as a lifetime total and as per-day
+buckets, from the order_sales_changed signal. Amounts come from the order
+total at write time, so they reflect the price actually paid rather than
+the current Menu.price.
+
+For each window the top LEADERBOARD_SIZE customers are kept in the cache,
+tagged with the leaderboard generation they were built from. A spend change
+only bumps the generation, a single atomic counter increment, and the boards
+are rebuilt lazily on the next read. One reader rebuilds a board under a
+short lock while the others keep serving the previous one.
+"""
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CustomerSpend, CustomerSpendBucket, Order
+from .signals import order_sales_changed
+from .utils import increment_or_create
+
+# Window name -> number of days, None meaning lifetime
+WINDOWS = {'7d': 7, '30d': 30, '365d': 365, 'all': None}
+# Entries kept per board; requests may ask for any limit up to this
+LEADERBOARD_SIZE = 25
+LEADERBOARD_TIMEOUT = 60 * 60 * 24
+# Upper bound on a rebuild; after this another reader may take over
+LEADERBOARD_LOCK_TIMEOUT = 30
+GENERATION_KEY = 'leaderboard:generation'
+
+
+def _board_key(window, today):
+    return f'leaderboard:{window}:{today.isoformat()}'
+
+
+def _window_start(window, today):
+    days = WINDOWS[window]
+    return None if days is None else today - timedelta(days=days - 1)
+
+
+@receiver(order_sales_changed, dispatch_uid='orders.leaderboard.record_spend')
+def record_spend(sender, order, revenue_delta, **kwargs):
+    """
+    Adds an order's change in total to its customer's spend.
+    """
+    if not revenue_delta:
+        return
+    day = timezone.localdate(order.created_at)
+    increment_or_create(CustomerSpend, {'customer_id': order.customer_id}, total=revenue_delta)
+    increment_or_create(CustomerSpendBucket, {'customer_id': order.customer_id, 'day': day}, amount=revenue_delta)
+
+    transaction.on_commit(invalidate_boards)
+
+
+def _generation():
+    """
+    Seeded from the clock so an evicted counter never repeats a value.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate_boards():
+    """
+    Marks every cached board as out of date.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def _build_board(window, today, using=None):
+    start = _window_start(window, today)
+    if start is None:
+        rows = CustomerSpend.objects.using(using).filter(total__gt=0).order_by('-total').values_list(
+            'customer_id', 'customer__username', 'total'
+        )[:LEADERBOARD_SIZE]
+    else:
+        rows = CustomerSpendBucket.objects.using(using).filter(day__gte=start, day__lte=today).values(
+            'customer_id'
+        ).annotate(spent=Sum('amount')).filter(spent__gt=0).order_by('-spent').values_list(
+            'customer_id', 'customer__username', 'spent'
+        )[:LEADERBOARD_SIZE]
+    return [
+        {'customer_id': customer_id, 'name': username, 'total_spent': total}
+        for customer_id, username, total in rows
+    ]
+
+
+def top_customers(window='all', limit=5):
+    """
+    Returns up to limit customers ranked by spend within the window.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f'Unknown window: {window}')
+    limit = min(limit, LEADERBOARD_SIZE)
+    today = timezone.localdate()
+    key = _board_key(window, today)
+
+    entry = cache.get(key)
+    generation = _generation()
+    if entry is not None and entry['generation'] == generation:
+        return entry['board'][:limit]
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=LEADERBOARD_LOCK_TIMEOUT):
+        try:
+            # Built on the primary: a lagging replica could otherwise store
+            # a stale board under the current generation
+            board = _build_board(window, today, using=DEFAULT_DB_ALIAS)
+            # Tagged with the generation read before building, so a board
+            # that missed a concurrent write is rebuilt on the next read
+            cache.set(key, {'generation': generation, 'board': board}, timeout=LEADERBOARD_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+        return board[:limit]
+
+    # Another reader is rebuilding this board
+    if entry is not None:
+        return entry['board'][:limit]
+    return _build_board(window, today)[:limit]
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Recomputes all spend aggregates from the stored order totals.
+    """
+    CustomerSpend.objects.all().delete()
+    CustomerSpendBucket.objects.all().delete()
+
+    CustomerSpend.objects.bulk_create(
+        CustomerSpend(customer_id=row['customer_id'], total=row['spent'] or 0)
+        for row in Order.objects.values('customer_id').annotate(spent=Sum('total')).order_by()
+    )
+    CustomerSpendBucket.objects.bulk_create(
+        (
+            CustomerSpendBucket(customer_id=row['customer_id'], day=row['day'], amount=row['spent'] or 0)
+            for row in Order.objects.annotate(day=TruncDate('created_at')).values('customer_id', 'day')
+            .annotate(spent=Sum('total')).order_by().iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+    transaction.on_commit(invalidate_boards)
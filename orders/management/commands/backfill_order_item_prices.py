@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from orders import leaderboard, rollups
+from orders.models import Order, OrderItem
+from products.models import Menu
+
+
+class Command(BaseCommand):
+    """
+    Fills OrderItem.unit_price and line_total for rows created before the
+    price snapshot columns existed, then recomputes the totals of the
+    affected orders.
+
+    The sales rollups and the customer spend aggregates are built from line
+    and order totals, so once every batch is done the rollups of the days
+    touched and the spend aggregates are rebuilt.
+
+    Works in primary-key batches, each in its own transaction, and only ever
+    selects rows that are still missing a price, so it can be interrupted
+    and re-run at any time. The historical price of these rows is unknown,
+    so the current Menu.price is used.
+    """
+    help = 'Backfill price snapshots on existing order items in resumable batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        menu_price = Subquery(Menu.objects.filter(pk=OuterRef('item_id')).values('price')[:1])
+        order_total = Subquery(
+            OrderItem.objects.filter(order_id=OuterRef('pk')).values('order_id')
+            .annotate(total=Sum('line_total')).values('total')[:1],
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+
+        last_pk, done = 0, 0
+        first_day = last_day = None
+        while True:
+            batch = list(
+                OrderItem.objects.filter(unit_price__isnull=True, pk__gt=last_pk)
+                .order_by('pk').values_list('pk', 'order_id')[:batch_size]
+            )
+            if not batch:
+                break
+            item_ids = [pk for pk, _ in batch]
+            order_ids = {order_id for _, order_id in batch}
+
+            with transaction.atomic():
+                OrderItem.objects.filter(pk__in=item_ids).update(unit_price=menu_price)
+                OrderItem.objects.filter(pk__in=item_ids).update(line_total=F('unit_price') * F('quantity'))
+                Order.objects.filter(pk__in=order_ids).update(total=Coalesce(order_total, 0, output_field=DecimalField()))
+            span = Order.objects.filter(pk__in=order_ids).aggregate(first=Min('created_at'), last=Max('created_at'))
+            first_day = min(filter(None, [first_day, timezone.localdate(span['first'])]))
+            last_day = max(filter(None, [last_day, timezone.localdate(span['last'])]))
+
+            last_pk = item_ids[-1]
+            done += len(item_ids)
+            self.stdout.write(f'Backfilled {done} order items (last id {last_pk}).')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        if done:
+            days = rollups.rebuild(first_day, last_day)
+            leaderboard.rebuild()
+            self.stdout.write(f'Rebuilt the sales rollups of {days} days and the customer spend aggregates.')
+        self.stdout.write(self.style.SUCCESS(f'Done. {done} order items backfilled.'))
@@ -0,0 +1,143 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+
+from orders.serializers import OrderSerializer
+from products.models import Category, Menu
+
+# Environment overrides per profile, on top of the current environment
+PROFILES = {
+    'sqlite-default': {'DB_ENGINE': 'sqlite', 'DB_SQLITE_PROFILE': 'default'},
+    'sqlite-tuned': {'DB_ENGINE': 'sqlite', 'DB_SQLITE_PROFILE': 'tuned'},
+    'postgresql': {'DB_ENGINE': 'postgresql', 'DB_POOL': ''},
+    'postgresql-pooled': {'DB_ENGINE': 'postgresql', 'DB_POOL': 'native'},
+}
+
+
+class Command(BaseCommand):
+    """
+    Write-heavy comparison of the database profiles in
+    restaurant_management/db.py: concurrent threads create orders through
+    OrderSerializer, as the order endpoint does, and the command reports
+    orders/sec, latency and failed writes per profile.
+
+    Every profile runs in a child process against a scratch database that
+    is migrated first. SQLite profiles use a temporary file. PostgreSQL
+    profiles need --postgres-db, an existing empty database that will be
+    migrated and written to, and take the other DB_* variables from the
+    environment.
+    """
+    help = 'Compare order creation throughput across database profiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='sqlite-default,sqlite-tuned')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=50, help='Orders created per thread.')
+        parser.add_argument('--items', type=int, default=3, help='Items per order.')
+        parser.add_argument('--postgres-db', help='Scratch PostgreSQL database for the postgresql profiles.')
+        parser.add_argument('--worker', action='store_true', help='Run one profile against the configured database.')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self._work(options['threads'], options['orders'], options['items'])))
+            return
+
+        self.stdout.write(
+            f"{'profile':<18} {'orders/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'failed':>7}"
+        )
+        for profile in options['profiles'].split(','):
+            if profile not in PROFILES:
+                raise CommandError(f"Unknown profile {profile!r}, choose from {', '.join(PROFILES)}.")
+            result = self._run_profile(profile, options)
+            if result is None:
+                self.stdout.write(f'{profile:<18} skipped, needs --postgres-db')
+                continue
+            self.stdout.write(
+                f"{profile:<18} {result['throughput']:>9.0f} {result['p50'] * 1000:>8.2f} "
+                f"{result['p95'] * 1000:>8.2f} {result['failed']:>7}"
+            )
+
+    def _run_profile(self, profile, options):
+        env = {**os.environ, **PROFILES[profile]}
+        with tempfile.TemporaryDirectory() as directory:
+            if env['DB_ENGINE'] == 'sqlite':
+                env['DB_NAME'] = str(Path(directory) / 'bench.sqlite3')
+            elif options['postgres_db']:
+                env['DB_NAME'] = options['postgres_db']
+            else:
+                return None
+
+            manage = [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py')]
+            subprocess.run(manage + ['migrate', '-v0'], env=env, check=True)
+            output = subprocess.run(
+                manage + [
+                    'bench_db_profiles', '--worker', '--threads', str(options['threads']),
+                    '--orders', str(options['orders']), '--items', str(options['items']),
+                ],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def _work(self, threads, orders_per_thread, items_per_order):
+        customer = get_user_model().objects.create_user(username='bench-db-profiles', password='bench')
+        category = Category.objects.create(name='Bench')
+        menu_ids = [
+            menu.pk for menu in Menu.objects.bulk_create(
+                Menu(name=f'Dish {i}', description='', price='9.50', category=category)
+                for i in range(items_per_order * 4)
+            )
+        ]
+        connection.close()
+
+        latencies, failures = [], []
+        lock = threading.Lock()
+
+        def create_orders(offset):
+            timings, failed = [], 0
+            try:
+                for i in range(orders_per_thread):
+                    start_at = (offset + i) % (len(menu_ids) - items_per_order + 1)
+                    items = [{'item': pk, 'quantity': 1} for pk in menu_ids[start_at:start_at + items_per_order]]
+                    started = time.perf_counter()
+                    try:
+                        serializer = OrderSerializer(data={'items': items})
+                        serializer.is_valid(raise_exception=True)
+                        serializer.save(customer_id=customer.pk)
+                    except OperationalError:
+                        failed += 1
+                        continue
+                    timings.append(time.perf_counter() - started)
+                    # What the request cycle does between requests
+                    close_old_connections()
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(timings)
+                failures.append(failed)
+
+        workers = [threading.Thread(target=create_orders, args=(n,)) for n in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': statistics.median(latencies) if latencies else 0.0,
+            'p95': statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else sum(latencies),
+            'failed': sum(failures),
+        }
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from orders.outbox import drain_outbox, queue_email
+from restaurant_management.bench import rolled_back
+
+
+class Command(BaseCommand):
+    """
+    Measures outbox delivery throughput against Django's locmem backend, so
+    the figure reflects the outbox itself rather than an SMTP server.
+    The queued rows are rolled back afterwards.
+    """
+    help = 'Benchmark emails/sec delivered by the order email outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'), rolled_back():
+            self._run(options)
+
+    def _run(self, options):
+        for i in range(options['emails']):
+            queue_email(f'Order Confirmation: #{i}', 'Thank you for your order!', [f'customer{i}@example.com'])
+
+        sent, seconds = 0, 0.0
+        while True:
+            metrics = drain_outbox(options['batch_size'])
+            if not metrics['claimed']:
+                break
+            sent += metrics['sent']
+            seconds += metrics['seconds']
+
+        self.stdout.write(f'Sent {sent} emails in {seconds:.2f}s ({sent / seconds if seconds else 0:.0f} emails/s)')
@@ -0,0 +1,76 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from orders.serializers import OrderSerializer
+from products.models import Category, Menu
+from restaurant_management.bench import rolled_back
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks nested order creation and update through OrderSerializer.
+    Reports SQL statements per order and p95 latency for each order size.
+    All benchmark rows are created inside a transaction that is rolled back.
+    """
+    help = 'Measure statements per order and p95 latency of OrderSerializer writes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,50,200', help='Comma separated item counts per order.')
+        parser.add_argument('--repeat', type=int, default=50, help='Orders written per size.')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        with rolled_back():
+            self._run(sizes, options['repeat'])
+
+    def _run(self, sizes, repeat):
+        User = get_user_model()
+        customer = User.objects.create_user(username='bench-customer', password='bench')
+        category = Category.objects.create(name='Bench')
+        menu_ids = [
+            menu.pk for menu in Menu.objects.bulk_create(
+                Menu(name=f'Dish {i}', description='', price='9.50', category=category)
+                for i in range(max(sizes) * 2)
+            )
+        ]
+
+        self.stdout.write(f"{'items':>6} {'op':>7} {'stmts':>6} {'p50 ms':>8} {'p95 ms':>8}")
+        for size in sizes:
+            items = [{'item': pk, 'quantity': 1} for pk in menu_ids[:size]]
+            # Half the lines change quantity, a quarter are swapped for new dishes
+            changed = [
+                {'item': pk, 'quantity': 2 if i % 2 else 1}
+                for i, pk in enumerate(menu_ids[size // 4:size + size // 4])
+            ]
+
+            create_stats, update_stats = [], []
+            for _ in range(repeat):
+                serializer = OrderSerializer(data={'items': items})
+                serializer.is_valid(raise_exception=True)
+                create_stats.append(self._measure(lambda: serializer.save(customer=customer)))
+
+                order = serializer.instance
+                serializer = OrderSerializer(order, data={'items': changed}, partial=True)
+                serializer.is_valid(raise_exception=True)
+                update_stats.append(self._measure(serializer.save))
+
+            for op, stats in (('create', create_stats), ('update', update_stats)):
+                statements = int(statistics.median(count for count, _ in stats))
+                latencies = sorted(elapsed for _, elapsed in stats)
+                p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+                self.stdout.write(
+                    f'{size:>6} {op:>7} {statements:>6} '
+                    f'{statistics.median(latencies) * 1000:>8.2f} {p95 * 1000:>8.2f}'
+                )
+
+    def _measure(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        return len(queries), elapsed
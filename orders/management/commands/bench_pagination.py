@@ -0,0 +1,70 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+from orders.pagination import KeysetPagination
+from restaurant_management.bench import rolled_back
+
+
+class Command(BaseCommand):
+    """
+    Compares OFFSET pagination with the (created_at, id) keyset paginator at
+    increasing scroll depths. The generated orders are rolled back afterwards.
+    """
+    help = 'Benchmark offset vs keyset pagination over the orders table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000, help='Number of orders to generate.')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--depths', default='0,1000,10000,100000,500000,990000',
+                            help='Comma separated row offsets to fetch a page at.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self._run(options)
+
+    def _run(self, options):
+        total = options['orders']
+        page_size = options['page_size']
+        User = get_user_model()
+        customer = User.objects.create_user(username='bench-pagination', password='bench')
+
+        self.stdout.write(f'Generating {total} orders...')
+        batch = 10_000
+        for start in range(0, total, batch):
+            Order.objects.bulk_create(
+                Order(customer=customer) for _ in range(min(batch, total - start))
+            )
+
+        paginator = KeysetPagination()
+        ordered = Order.objects.order_by(*paginator.ordering)
+
+        self.stdout.write(f"{'depth':>8} {'offset ms':>10} {'keyset ms':>10}")
+        for depth in (int(d) for d in options['depths'].split(',')):
+            if depth >= total:
+                continue
+            boundary = ordered.values_list('created_at', 'id')[depth - 1] if depth else None
+
+            def offset_page():
+                return list(ordered[depth:depth + page_size])
+
+            def keyset_page():
+                queryset = ordered if boundary is None else paginator.filter_after(ordered, *boundary)
+                return list(queryset[:page_size + 1])
+
+            self.stdout.write(
+                f'{depth:>8} {self._median_ms(offset_page, options["repeat"]):>10.2f} '
+                f'{self._median_ms(keyset_page, options["repeat"]):>10.2f}'
+            )
+
+    def _median_ms(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1000
@@ -0,0 +1,97 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from orders.models import Reservation, ReservationSlot, Table
+from orders.reservations import free_tables, reservation_slots
+from restaurant_management.bench import rolled_back
+
+
+# Sittings a table can be booked for, at most one booking per sitting
+SITTINGS = [datetime.time(h, m) for h, m in ((12, 0), (14, 0), (17, 0), (19, 0), (21, 0))]
+WINDOWS = [(datetime.time(h, 0), datetime.time(h + 2, 0)) for h in (12, 13, 17, 18, 19, 20)]
+
+
+class Command(BaseCommand):
+    """
+    Fills the reservation tables with non-overlapping bookings and times the
+    slot-index availability search against filtering each day's reservations
+    in Python. The generated rows are rolled back afterwards.
+    """
+    help = 'Benchmark free-table search over generated reservations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=100_000)
+        parser.add_argument('--tables', type=int, default=60)
+        parser.add_argument('--queries', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self._run(options)
+
+    def _run(self, options):
+        random.seed(15)
+        customer = get_user_model().objects.create_user(username='bench-reservations', password='bench')
+        base = max(Table.objects.values_list('number', flat=True), default=0)
+        tables = Table.objects.bulk_create(
+            Table(number=base + i + 1, seats=random.choice((2, 2, 4, 4, 6, 8))) for i in range(options['tables'])
+        )
+
+        total = options['reservations']
+        # Roughly 70% of sittings are booked
+        days = max(1, round(total / (len(tables) * len(SITTINGS) * 0.7)))
+        start_day = datetime.date(2030, 1, 1)
+        self.stdout.write(f'Generating {total} reservations over {days} days...')
+        created = 0
+        for offset in range(days):
+            if created >= total:
+                break
+            day = start_day + datetime.timedelta(days=offset)
+            booked = [
+                Reservation(customer=customer, table=table, date=day, time=sitting,
+                            duration_minutes=105, party_size=min(table.seats, 2))
+                for table in tables for sitting in SITTINGS if random.random() < 0.7
+            ][:total - created]
+            Reservation.objects.bulk_create(booked)
+            ReservationSlot.objects.bulk_create(
+                ReservationSlot(reservation=reservation, table_id=reservation.table_id, date=day, slot=slot)
+                for reservation in booked for slot in reservation_slots(reservation)
+            )
+            created += len(booked)
+
+        queries = [
+            (start_day + datetime.timedelta(days=random.randrange(days)), *random.choice(WINDOWS), random.choice((2, 4, 6)))
+            for _ in range(options['queries'])
+        ]
+        indexed = self._time(lambda q: list(free_tables(*q)), queries)
+        scanned = self._time(lambda q: self._free_tables_by_scan(tables, *q), queries)
+
+        self.stdout.write(f'{created} reservations, {ReservationSlot.objects.count()} slots, {len(tables)} tables')
+        self.stdout.write(f"{'':>12} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, timings in (('slot index', indexed), ('day scan', scanned)):
+            self.stdout.write(f'{label:>12} {statistics.median(timings):8.2f} {self._p95(timings):8.2f}')
+
+    def _free_tables_by_scan(self, tables, day, start, end, party_size):
+        start_at = datetime.datetime.combine(day, start)
+        end_at = datetime.datetime.combine(day, end)
+        busy = set()
+        for table_id, at, minutes in Reservation.objects.filter(date=day).values_list('table_id', 'time', 'duration_minutes'):
+            begins = datetime.datetime.combine(day, at)
+            if begins < end_at and begins + datetime.timedelta(minutes=minutes) > start_at:
+                busy.add(table_id)
+        return [table for table in tables if table.seats >= party_size and table.pk not in busy]
+
+    def _time(self, run, queries):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _p95(self, timings):
+        return sorted(timings)[int(len(timings) * 0.95) - 1]
@@ -0,0 +1,84 @@
+import datetime
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders import rollups
+from orders.analytics import sales_series
+from orders.models import Order, OrderStatus
+from restaurant_management.bench import rolled_back
+
+
+class Command(BaseCommand):
+    """
+    Generates orders spread over --days days, rebuilds the daily rollups and
+    times year-long sales_series queries per granularity, from the rollups
+    and from the raw orders. The generated rows are rolled back afterwards.
+    """
+    help = 'Benchmark the date-range sales analytics over generated orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5_000_000)
+        parser.add_argument('--days', type=int, default=730)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        created_at = Order._meta.get_field('created_at')
+        try:
+            # Let bulk_create keep the generated timestamps
+            created_at.auto_now_add = False
+            with rolled_back():
+                self._run(options)
+        finally:
+            created_at.auto_now_add = True
+
+    def _run(self, options):
+        random.seed(17)
+        customer = get_user_model().objects.create_user(username='bench-analytics', password='bench')
+        statuses = [OrderStatus.objects.get_or_create(name=name)[0] for name in ('completed', 'cancelled')]
+        today = timezone.localdate()
+        first_day = today - datetime.timedelta(days=options['days'] - 1)
+        per_day = max(1, options['orders'] // options['days'])
+
+        self.stdout.write(f"Generating {per_day * options['days']} orders over {options['days']} days...")
+        for offset in range(options['days']):
+            day_start = timezone.make_aware(datetime.datetime.combine(first_day + datetime.timedelta(days=offset), datetime.time.min))
+            Order.objects.bulk_create(
+                (
+                    Order(
+                        customer=customer,
+                        status=statuses[random.random() < 0.05],
+                        total=Decimal(random.randint(500, 9000)) / 100,
+                        created_at=day_start + datetime.timedelta(seconds=random.randrange(86400)),
+                    )
+                    for _ in range(per_day)
+                ),
+                batch_size=5000,
+            )
+        self.stdout.write('Rebuilding daily rollups...')
+        rollups.rebuild()
+
+        year_start = today - datetime.timedelta(days=364)
+        cases = [
+            (f'{granularity}, 1 year, rollups', dict(start=year_start, granularity=granularity))
+            for granularity in ('day', 'week', 'month')
+        ] + [
+            (f'{granularity}, 1 year, orders', dict(start=year_start, granularity=granularity, use_rollups=False))
+            for granularity in ('day', 'month')
+        ] + [
+            ('month, 1 year, completed only', dict(start=year_start, granularity='month', status=statuses[0])),
+            ('hour, 31 days', dict(start=today - datetime.timedelta(days=30), granularity='hour')),
+        ]
+        self.stdout.write(f"{'query':<32} {'buckets':>8} {'median ms':>10}")
+        for label, kwargs in cases:
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                buckets = sales_series(end=today, **kwargs)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f'{label:<32} {len(buckets):>8} {statistics.median(timings):>10.1f}')
@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.db.models import F, Sum
+
+from orders.models import Order, OrderStatus
+from orders.statuses import TRANSITIONS, TransitionConflict, registry, transition
+
+# Walk orders along the happy path so they keep moving
+NEXT_STATUS = {
+    'pending': 'preparing',
+    'preparing': 'ready',
+    'ready': 'served',
+    'served': 'completed',
+}
+
+
+class Command(BaseCommand):
+    """
+    Runs many threads that change the status of a few hot orders at once
+    through orders.statuses.transition and reports applied transitions/sec
+    and conflicts. Completed orders are reset to pending with the same kind
+    of conditional update. Afterwards it checks that the version columns add
+    up to the number of applied changes, i.e. no update was lost.
+
+    Threads need committed rows, so the data is created for real and
+    deleted at the end.
+    """
+    help = 'Benchmark concurrent order status transitions on hot orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--changes', type=int, default=200, help='Attempts per thread.')
+
+    def handle(self, *args, **options):
+        for name in TRANSITIONS:
+            OrderStatus.objects.get_or_create(name=name)
+        registry.warm()
+
+        user = get_user_model().objects.create_user(username=f'bench-status-{uuid.uuid4().hex[:8]}')
+        try:
+            pending = registry.get('pending')
+            order_ids = [
+                Order.objects.create(customer=user, status=pending).pk
+                for _ in range(options['orders'])
+            ]
+            self._run(order_ids, options)
+        finally:
+            Order.objects.filter(customer=user).delete()
+            user.delete()
+
+    def _run(self, order_ids, options):
+        counts = {'applied': 0, 'resets': 0, 'conflicts': 0, 'errors': 0}
+        lock = threading.Lock()
+        pending = registry.get('pending')
+
+        def worker():
+            local = dict.fromkeys(counts, 0)
+            try:
+                for _ in range(options['changes']):
+                    order = Order.objects.only('id', 'status_id', 'version').get(pk=random.choice(order_ids))
+                    next_name = NEXT_STATUS.get(registry.by_id(order.status_id).name)
+                    try:
+                        if next_name is None:
+                            reset = Order.objects.filter(
+                                pk=order.pk, status_id=order.status_id, version=order.version,
+                            ).update(status_id=pending.pk, version=F('version') + 1)
+                            local['resets' if reset else 'conflicts'] += 1
+                        else:
+                            transition(order, registry.get(next_name))
+                            local['applied'] += 1
+                    except TransitionConflict:
+                        local['conflicts'] += 1
+                    except DatabaseError:
+                        local['errors'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        counts[key] += value
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        attempts = options['threads'] * options['changes']
+        changes = counts['applied'] + counts['resets']
+        versions = Order.objects.filter(pk__in=order_ids).aggregate(total=Sum('version'))['total']
+        self.stdout.write(
+            f"{attempts} attempts on {len(order_ids)} orders from {options['threads']} threads in {elapsed:.2f}s: "
+            f"{counts['applied']} transitions ({counts['applied'] / elapsed:.0f}/s), {counts['resets']} resets, "
+            f"{counts['conflicts']} conflicts (409), {counts['errors']} database errors"
+        )
+        if versions == changes:
+            self.stdout.write(self.style.SUCCESS(f'No lost updates: versions sum to {versions}'))
+        else:
+            self.stdout.write(self.style.ERROR(f'Lost updates: versions sum to {versions}, expected {changes}'))
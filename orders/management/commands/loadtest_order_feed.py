@@ -0,0 +1,61 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.feed import InProcessBroker
+
+
+class Command(BaseCommand):
+    """
+    Simulates many kitchen displays subscribed to the order feed while events
+    are published from a worker thread, as Django views do. Reports fan-out
+    latency (publish to delivery) percentiles across all displays.
+    """
+    help = 'Load test fan-out latency of the live order feed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--displays', type=int, default=500)
+        parser.add_argument('--events', type=int, default=200)
+        parser.add_argument('--rate', type=float, default=50.0, help='Events published per second.')
+
+    def handle(self, *args, **options):
+        latencies, dropped = asyncio.run(self._run(options))
+        latencies.sort()
+        expected = options['displays'] * options['events']
+        self.stdout.write(f'displays: {options["displays"]}, events: {options["events"]}')
+        self.stdout.write(f'delivered: {len(latencies)}/{expected} (dropped {dropped})')
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f'latency ms  p50={cuts[49] * 1000:.2f}  p95={cuts[94] * 1000:.2f}  '
+                f'p99={cuts[98] * 1000:.2f}  max={latencies[-1] * 1000:.2f}'
+            )
+
+    async def _run(self, options):
+        broker = InProcessBroker()
+        subscriptions = [broker.subscribe() for _ in range(options['displays'])]
+        latencies = []
+
+        async def display(subscription):
+            for _ in range(options['events']):
+                event = json.loads(await subscription.get())
+                latencies.append(time.time() - event['ts'])
+
+        def publisher():
+            interval = 1.0 / options['rate']
+            for i in range(options['events']):
+                broker.publish({'type': 'order.status', 'id': i, 'status': 'ready', 'waiter': None, 'total': '0.00', 'ts': time.time()})
+                time.sleep(interval)
+
+        tasks = [asyncio.create_task(display(subscription)) for subscription in subscriptions]
+        thread = threading.Thread(target=publisher)
+        thread.start()
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        await asyncio.wait(tasks, timeout=5)
+        for task in tasks:
+            task.cancel()
+        return latencies, sum(subscription.dropped for subscription in subscriptions)
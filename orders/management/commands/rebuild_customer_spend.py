@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from orders import leaderboard
+
+
+class Command(BaseCommand):
+    """
+    Backfills or repairs CustomerSpend and CustomerSpendBucket from the
+    stored order totals and drops the cached leaderboards.
+    """
+    help = 'Rebuild the per-customer spend aggregates behind the top-customers report.'
+
+    def handle(self, *args, **options):
+        leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt customer spend aggregates.'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from orders import rollups
+
+
+class Command(BaseCommand):
+    """
+    Backfills or repairs DailySalesRollup and DailyItemSales from the raw
+    order tables. Without arguments the whole history is rebuilt.
+    """
+    help = 'Rebuild the daily sales rollup tables from orders and order items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        start = self._parse(options['start'])
+        end = self._parse(options['end'])
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end.')
+
+        days = rollups.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups for {days} day(s).'))
+
+    def _parse(self, value):
+        if value is None:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Invalid date: {value}')
+        return day
@@ -1,11 +1,15 @@
 from django.db import models
-from django.db.models import F, Sum, UniqueConstraint
+from django.db.models import F, Q, Sum, UniqueConstraint
 from django.conf import settings
+from django.utils import timezone
 from .utils import generate_coupon_code
 
 # Assuming a `Menu` model exists in the `products` app
 # and a `User` model exists in the `account` app.
 
+# Statuses an order never leaves, see orders.statuses.TRANSITIONS
+FINAL_STATUSES = ('completed', 'cancelled')
+
 class OrderStatus(models.Model):
     """
     Model to represent the status of an order (e.g., 'pending', 'completed').
@@ -15,6 +19,26 @@ class OrderStatus(models.Model):
     def __str__(self):
         return self.name
 
+class OrderQuerySet(models.QuerySet):
+    """
+    Query plans for reading orders.
+    """
+    def for_listing(self):
+        """
+        Loads everything OrderSerializer renders in a fixed number of queries:
+        the waiter and status are joined in, and the items are prefetched
+        together with their Menu rows.
+        """
+        return self.select_related('waiter', 'status').prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.select_related('item'))
+        )
+
+    def active(self):
+        """
+        Orders not yet completed or cancelled, read from order_active_idx.
+        """
+        return self.filter(is_active=True)
+
 class Order(models.Model):
     """
     Model to represent a customer's order.
@@ -25,21 +49,239 @@ class Order(models.Model):
     status = models.ForeignKey(OrderStatus, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Bumped by every status transition, see orders.statuses.transition
+    version = models.PositiveIntegerField(default=0)
+    # False once the status is one of FINAL_STATUSES. Kept on the row so
+    # the open orders, a small and hot slice of the table, get their own
+    # partial index; status itself is a foreign key an index cannot filter on
+    is_active = models.BooleanField(default=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        # Keyset pagination walks these in (created_at, id) order
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            models.Index(fields=['customer', 'created_at', 'id'], name='order_customer_created_idx'),
+            models.Index(fields=['waiter', 'created_at', 'id'], name='order_waiter_created_idx'),
+            # Date-range sales analytics, optionally filtered by status
+            models.Index(fields=['created_at', 'status'], name='order_created_status_idx'),
+            # Open orders only, newest first
+            models.Index(fields=['created_at', 'id'], name='order_active_idx', condition=Q(is_active=True)),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.customer.username}"
 
+    def save(self, *args, **kwargs):
+        # Partial saves leave the status alone; orders.statuses moves it and
+        # keeps is_active in step
+        if kwargs.get('update_fields') is None:
+            self.is_active = self.status is None or self.status.name.lower() not in FINAL_STATUSES
+        super().save(*args, **kwargs)
+
 class OrderItem(models.Model):
     """
     Model for individual items within an order.
     """
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    item = models.ForeignKey('products.Menu', on_delete=models.CASCADE)
+    # Indexed by order_item_dish_idx below, which leads with the dish
+    item = models.ForeignKey('products.Menu', on_delete=models.CASCADE, db_index=False)
     quantity = models.IntegerField(default=1)
+    # Price snapshot taken when the item was ordered, so revenue queries read
+    # a single table and stay correct after menu price changes. Rows created
+    # before these columns existed are filled by backfill_order_item_prices.
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    line_total = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    @classmethod
+    def for_menu_item(cls, menu_item, quantity, **kwargs):
+        """
+        Builds an unsaved item priced at the menu item's current price.
+        """
+        order_item = cls(item=menu_item, unit_price=menu_item.price, **kwargs)
+        order_item.set_quantity(quantity)
+        return order_item
+
+    @property
+    def price_paid(self):
+        """
+        The snapshotted unit price, falling back to the menu price for rows
+        that have not been backfilled yet.
+        """
+        return self.unit_price if self.unit_price is not None else self.item.price
+
+    def set_quantity(self, quantity):
+        """
+        Sets the quantity and recomputes the line total from the unit price.
+        """
+        self.unit_price = self.price_paid
+        self.quantity = quantity
+        self.line_total = self.unit_price * quantity
 
     def __str__(self):
         return f"{self.quantity} of {self.item.name}"
 
+    class Meta:
+        indexes = [
+            # Orders containing a dish, and the per-dish rollup rebuilds
+            models.Index(fields=['item', 'order'], name='order_item_dish_idx'),
+        ]
+
+class DailySalesRollup(models.Model):
+    """
+    Per-day sales totals, maintained incrementally as orders are written.
+    """
+    date = models.DateField(unique=True)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Sales for {self.date}: {self.order_count} orders, {self.revenue}"
+
+class DailyItemSales(models.Model):
+    """
+    Per-day, per-dish quantities sold, maintained alongside DailySalesRollup.
+    """
+    date = models.DateField()
+    item = models.ForeignKey('products.Menu', on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['date', 'item'], name='unique_daily_item_sales')
+        ]
+        indexes = [
+            models.Index(fields=['date', '-quantity'], name='daily_item_top_idx'),
+        ]
+        verbose_name_plural = "Daily item sales"
+
+    def __str__(self):
+        return f"{self.quantity} of {self.item_id} on {self.date}"
+
+class DishSalesBucket(models.Model):
+    """
+    Quantity of a dish sold in one short time bucket, see orders.popularity.
+    Sliding-window popularity is the sum over the buckets in the window.
+    """
+    bucket = models.DateTimeField()
+    item = models.ForeignKey('products.Menu', on_delete=models.CASCADE, related_name='sales_buckets')
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['bucket', 'item'], name='unique_dish_sales_bucket')
+        ]
+        indexes = [
+            models.Index(fields=['bucket', 'item', 'quantity'], name='dish_sales_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} of {self.item_id} from {self.bucket}"
+
+class CustomerSpend(models.Model):
+    """
+    Lifetime spend per customer, maintained incrementally on order writes.
+    """
+    customer = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='spend')
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total'], name='customer_spend_total_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} spent {self.total}"
+
+class CustomerSpendBucket(models.Model):
+    """
+    Per-customer spend for a single day. Windowed leaderboards (last 7, 30
+    or 365 days) are sums over these partial totals.
+    """
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='spend_buckets')
+    day = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['customer', 'day'], name='unique_customer_spend_day')
+        ]
+        indexes = [
+            models.Index(fields=['day', 'customer', 'amount'], name='customer_spend_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} spent {self.amount} on {self.day}"
+
+class Table(models.Model):
+    """
+    A bookable table in the dining room.
+    """
+    number = models.PositiveIntegerField(unique=True)
+    seats = models.PositiveSmallIntegerField()
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['number']
+        indexes = [
+            # Bookable tables in the order free_tables returns them. Partial,
+            # since a bare boolean term can not use an index on is_active
+            models.Index(fields=['seats', 'number'], name='table_capacity_idx', condition=Q(is_active=True)),
+        ]
+
+    def __str__(self):
+        return f"Table {self.number} ({self.seats} seats)"
+
+class Reservation(models.Model):
+    """
+    A customer's booking of a table from time for duration_minutes.
+    The minutes it covers are claimed in ReservationSlot, see orders.reservations.
+    """
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reservations')
+    table = models.ForeignKey(Table, on_delete=models.PROTECT, related_name='reservations')
+    date = models.DateField()
+    time = models.TimeField()
+    duration_minutes = models.PositiveSmallIntegerField(default=90)
+    party_size = models.PositiveSmallIntegerField(default=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Keyset pagination walks these in (created_at, id) order
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='reservation_created_id_idx'),
+            models.Index(fields=['customer', 'created_at', 'id'], name='reservation_customer_idx'),
+            models.Index(fields=['date', 'table'], name='reservation_date_table_idx'),
+        ]
+
+    def __str__(self):
+        return f"Table {self.table_id} on {self.date} at {self.time} for {self.party_size}"
+
+class ReservationSlot(models.Model):
+    """
+    One fixed-length slot of a table's day held by a reservation. The unique
+    (table, date, slot) constraint is what prevents double booking.
+    """
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='slots')
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name='slots')
+    date = models.DateField()
+    # Index of the slot within the day, see orders.reservations.SLOT_MINUTES
+    slot = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['table', 'date', 'slot'], name='unique_table_date_slot')
+        ]
+        # Availability looks up busy tables by date and slot range
+        indexes = [
+            models.Index(fields=['date', 'slot', 'table'], name='reservation_slot_busy_idx'),
+        ]
+
+    def __str__(self):
+        return f"Table {self.table_id} slot {self.slot} on {self.date}"
+
 class Restaurant(models.Model):
     """
     Model to store general restaurant information, like loyalty points earned per visit.
@@ -59,10 +301,55 @@ class Coupon(models.Model):
     is_active = models.BooleanField(default=True)
     valid_from = models.DateField()
     valid_until = models.DateField()
+    # Leave max_uses empty for unlimited redemptions
+    max_uses = models.PositiveIntegerField(null=True, blank=True)
+    times_used = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'valid_from', 'valid_until'], name='coupon_validity_idx'),
+        ]
 
     def __str__(self):
         return f"Coupon: {self.code} - {self.discount_percentage}%"
 
+class OutboundEmailStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    SENDING = "sending", "Sending"
+    SENT = "sent", "Sent"
+    FAILED = "failed", "Failed"
+
+class OutboundEmail(models.Model):
+    """
+    Outbox row for an email waiting to be delivered by the send_outbox_emails task.
+    Rows are written in the same transaction as the change they announce.
+    """
+    # Defined at module level so Meta below can refer to it
+    Status = OutboundEmailStatus
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only undelivered rows, not the ever growing history of sent ones
+            models.Index(
+                fields=['next_attempt_at', 'id'], name='outbox_due_idx',
+                condition=Q(status__in=[OutboundEmailStatus.PENDING, OutboundEmailStatus.SENDING]),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
 class Feedback(models.Model):
     """
     Model to store customer feedback for a completed order.
@@ -76,6 +363,9 @@ class Feedback(models.Model):
         constraints = [
             UniqueConstraint(fields=['order'], name='unique_order_feedback')
         ]
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='feedback_created_id_idx'),
+        ]
         verbose_name_plural = "Feedback"
 
     def __str__(self):
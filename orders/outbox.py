@@ -0,0 +1,138 @@
+"""
+Transactional email outbox.
+
+Emails are stored as OutboundEmail rows inside the caller's transaction and
+delivered later by the send_outbox_emails Celery task, so a slow SMTP server
+never blocks a request. Each drain claims a batch of due rows, sends them
+over a single SMTP connection and schedules failed ones for a retry with
+exponential backoff.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = timedelta(seconds=30)
+# How long a claimed batch is reserved before another worker may retry it
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def queue_email(subject, message, recipient_list, from_email=None):
+    """
+    Stores an email in the outbox and schedules delivery once the current
+    transaction commits.
+    """
+    email = OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+    transaction.on_commit(_schedule_drain)
+    return email
+
+
+def _schedule_drain():
+    from .tasks import send_outbox_emails
+    try:
+        # Fail fast instead of retrying the publish: this runs on the
+        # request thread, and the beat drain covers a broker outage
+        with send_outbox_emails.app.connection_for_write(transport_options={'max_retries': 0}) as conn:
+            send_outbox_emails.apply_async(connection=conn, retry=False)
+    except Exception as e:
+        # The periodic drain will pick the email up once the broker is back
+        logger.warning(f"Could not schedule outbox delivery: {e}")
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        due = (
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[OutboundEmail.Status.PENDING, OutboundEmail.Status.SENDING], next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+        )
+        batch = list(due[:batch_size])
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            status=OutboundEmail.Status.SENDING, next_attempt_at=now + CLAIM_LEASE
+        )
+    return batch
+
+
+def _record_failure(email, error, retried, failed):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutboundEmail.Status.FAILED
+        failed.append(email)
+    else:
+        email.status = OutboundEmail.Status.PENDING
+        email.next_attempt_at = timezone.now() + RETRY_BASE_DELAY * 2 ** (email.attempts - 1)
+        retried.append(email)
+
+
+def drain_outbox(batch_size=100):
+    """
+    Sends one batch of due emails over a single connection.
+    Returns delivery metrics for the batch.
+    """
+    start = time.perf_counter()
+    batch = _claim_batch(batch_size)
+    sent, retried, failed = [], [], []
+    if batch:
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+            for email in batch:
+                message = EmailMessage(
+                    email.subject, email.body, email.from_email, email.recipients, connection=connection
+                )
+                try:
+                    connection.send_messages([message])
+                except Exception as e:
+                    _record_failure(email, e, retried, failed)
+                else:
+                    email.attempts += 1
+                    email.status = OutboundEmail.Status.SENT
+                    email.sent_at = timezone.now()
+                    sent.append(email)
+        except Exception as e:
+            # Could not even connect: counts as a failed attempt for every
+            # email not handled yet, so an SMTP outage backs off and
+            # eventually gives up like any other delivery error
+            logger.error(f"Outbox connection failed: {e}")
+            handled = len(sent) + len(retried) + len(failed)
+            for email in batch[handled:]:
+                _record_failure(email, e, retried, failed)
+        finally:
+            connection.close()
+
+        OutboundEmail.objects.bulk_update(
+            sent + retried + failed,
+            ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+        )
+
+    elapsed = time.perf_counter() - start
+    metrics = {
+        'claimed': len(batch),
+        'sent': len(sent),
+        'retried': len(retried),
+        'failed': len(failed),
+        'seconds': elapsed,
+        'emails_per_sec': len(sent) / elapsed if elapsed else 0.0,
+    }
+    if batch:
+        logger.info(
+            f"Outbox batch: {metrics['sent']} sent, {metrics['retried']} retried, "
+            f"{metrics['failed']} failed in {elapsed:.3f}s ({metrics['emails_per_sec']:.0f} emails/s)"
+        )
+    return metrics
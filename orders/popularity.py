@@ -0,0 +1,101 @@
+"""
+Sliding-window dish popularity.
+
+Quantities sold are counted per dish in BUCKET_MINUTES-long buckets from the
+order_sales_changed signal, in the same transaction as the order write. The
+top dishes for a window are the sums over the buckets it covers. They are
+cached per window for POPULAR_TTL seconds, so a request is a single cache
+read and the buckets are aggregated at most once per TTL and window.
+"""
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import Menu
+from .models import DishSalesBucket
+from .signals import order_sales_changed
+from .utils import bulk_increment_or_create
+
+BUCKET_MINUTES = 10
+# Window name -> length; windows are rounded to whole buckets
+WINDOWS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(days=7),
+}
+# Dishes kept per cached board; requests may ask for any limit up to this
+POPULAR_SIZE = 50
+POPULAR_TTL = 60
+# Buckets older than this are no longer needed by any window
+BUCKET_RETENTION = timedelta(days=8)
+
+
+def bucket_start(moment):
+    moment = timezone.localtime(moment)
+    return moment.replace(minute=moment.minute - moment.minute % BUCKET_MINUTES, second=0, microsecond=0)
+
+
+@receiver(order_sales_changed, dispatch_uid='orders.popularity.record_dish_sales')
+def record_dish_sales(sender, order, item_deltas, **kwargs):
+    """
+    Adds the change in quantity per dish to the bucket the order was placed in.
+    """
+    bulk_increment_or_create(
+        DishSalesBucket, {'bucket': bucket_start(order.created_at)}, 'item_id',
+        {
+            item_id: {'quantity': quantity}
+            for item_id, (quantity, revenue) in item_deltas.items()
+            if quantity
+        },
+    )
+
+
+def _compute(window, current_bucket):
+    start = current_bucket - WINDOWS[window] + timedelta(minutes=BUCKET_MINUTES)
+    totals = list(
+        DishSalesBucket.objects.filter(bucket__gte=start)
+        .values('item_id')
+        .annotate(sold=Sum('quantity'))
+        .filter(sold__gt=0)
+        .order_by('-sold', 'item_id')[:POPULAR_SIZE]
+    )
+    dishes = Menu.objects.select_related('category').in_bulk([row['item_id'] for row in totals])
+    return [
+        {
+            'id': row['item_id'],
+            'name': dishes[row['item_id']].name,
+            'price': str(dishes[row['item_id']].price),
+            'category': dishes[row['item_id']].category.name,
+            'sold': row['sold'],
+        }
+        for row in totals
+        if row['item_id'] in dishes
+    ]
+
+
+def top_dishes(window, limit=10):
+    """
+    Returns (dishes, max_age): the best selling dishes in the window, most
+    sold first, and how many more seconds that result stays current.
+    """
+    current_bucket = bucket_start(timezone.now())
+    key = f'popular:{window}:{current_bucket.isoformat()}'
+    board = cache.get(key)
+    if board is None:
+        board = {'computed_at': time.time(), 'dishes': _compute(window, current_bucket)}
+        cache.set(key, board, POPULAR_TTL)
+    max_age = max(0, int(POPULAR_TTL - (time.time() - board['computed_at'])))
+    return board['dishes'][:limit], max_age
+
+
+def prune(now=None):
+    """
+    Deletes buckets that have fallen out of every window. Returns the count.
+    """
+    cutoff = bucket_start(now or timezone.now()) - BUCKET_RETENTION
+    deleted, _ = DishSalesBucket.objects.filter(bucket__lt=cutoff).delete()
+    return deleted
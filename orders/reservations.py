@@ -0,0 +1,82 @@
+"""
+Table booking on a fixed slot grid.
+
+Each day is split into SLOT_MINUTES-long slots, and a reservation claims
+one ReservationSlot row per slot it covers. The unique (table, date, slot)
+constraint makes the database reject a second booking of the same slot,
+including from concurrent requests. Availability is answered by looking up
+the busy tables for a date and slot range in the (date, slot, table) index.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Subquery
+
+from .models import ReservationSlot, Table
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+class TableUnavailable(Exception):
+    """
+    The table is already booked for part of the requested time.
+    """
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def slot_range(start, end):
+    """
+    Slots covering the times start to end (datetime.time). A missing end
+    means the end of the day. Partial slots count as whole ones.
+    """
+    first = _minutes(start) // SLOT_MINUTES
+    last = SLOTS_PER_DAY if end is None else -(-_minutes(end) // SLOT_MINUTES)
+    return range(first, last)
+
+
+def reservation_slots(reservation):
+    first = _minutes(reservation.time) // SLOT_MINUTES
+    count = -(-reservation.duration_minutes // SLOT_MINUTES)
+    return range(first, first + count)
+
+
+def _claim_slots(reservation):
+    ReservationSlot.objects.bulk_create(
+        ReservationSlot(reservation=reservation, table_id=reservation.table_id, date=reservation.date, slot=slot)
+        for slot in reservation_slots(reservation)
+    )
+
+
+def book(reservation):
+    """
+    Saves reservation and claims its slots in one transaction. Raises
+    TableUnavailable if any of them is already taken. Also used to move an
+    existing reservation, whose old slots are released first.
+    """
+    try:
+        with transaction.atomic():
+            if reservation.pk:
+                reservation.slots.all().delete()
+            reservation.save()
+            _claim_slots(reservation)
+    except IntegrityError:
+        raise TableUnavailable(
+            f"Table {reservation.table.number} is already booked on {reservation.date} around {reservation.time:%H:%M}."
+        )
+    return reservation
+
+
+def free_tables(date, start, end, party_size=1):
+    """
+    Active tables seating party_size that have no booking between start and
+    end on date, smallest table first.
+    """
+    slots = slot_range(start, end)
+    busy = ReservationSlot.objects.filter(
+        date=date, slot__gte=slots.start, slot__lt=slots.stop,
+    ).values('table_id')
+    return Table.objects.filter(is_active=True, seats__gte=party_size).exclude(
+        pk__in=Subquery(busy)
+    ).order_by('seats', 'number')
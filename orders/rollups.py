@@ -0,0 +1,99 @@
+"""
+Incrementally maintained daily sales rollups.
+
+DailySalesRollup and DailyItemSales are updated from the order_sales_changed
+signal in the same transaction as the order write, so the dashboard and the
+daily report tasks read a couple of rows instead of re-aggregating history.
+Use the rebuild_sales_rollups management command to backfill or repair them.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import DailyItemSales, DailySalesRollup, Order, OrderItem
+from .signals import order_sales_changed
+from .utils import bulk_increment_or_create, increment_or_create
+
+
+@receiver(order_sales_changed, dispatch_uid='orders.rollups.apply_order_delta')
+def apply_order_delta(sender, order, order_delta, revenue_delta, item_deltas, **kwargs):
+    """
+    Folds an order write into the rollups for the day the order was placed.
+    """
+    day = timezone.localdate(order.created_at)
+    if order_delta or revenue_delta:
+        increment_or_create(DailySalesRollup, {'date': day}, order_count=order_delta, revenue=revenue_delta)
+    bulk_increment_or_create(
+        DailyItemSales, {'date': day}, 'item_id',
+        {
+            item_id: {'quantity': quantity, 'revenue': revenue}
+            for item_id, (quantity, revenue) in item_deltas.items()
+            if quantity or revenue
+        },
+    )
+
+
+def daily_summary(day):
+    """
+    Returns the sales summary for a single day from the rollup tables.
+    """
+    rollup = DailySalesRollup.objects.filter(date=day).first()
+    top_item = (
+        DailyItemSales.objects.filter(date=day, quantity__gt=0)
+        .select_related('item')
+        .order_by('-quantity')
+        .first()
+    )
+    return {
+        'date': day.isoformat(),
+        'total_orders': rollup.order_count if rollup else 0,
+        'total_sales': rollup.revenue if rollup else Decimal('0.00'),
+        'top_item': top_item.item.name if top_item else None,
+    }
+
+
+@transaction.atomic
+def rebuild(start=None, end=None):
+    """
+    Recomputes the rollups from the raw order tables for the given inclusive
+    date range (all history when omitted). Returns the number of days rebuilt.
+    """
+    orders = Order.objects.annotate(day=TruncDate('created_at'))
+    items = OrderItem.objects.annotate(day=TruncDate('order__created_at'))
+    rollups = DailySalesRollup.objects.all()
+    item_sales = DailyItemSales.objects.all()
+    if start:
+        orders, items = orders.filter(day__gte=start), items.filter(day__gte=start)
+        rollups, item_sales = rollups.filter(date__gte=start), item_sales.filter(date__gte=start)
+    if end:
+        orders, items = orders.filter(day__lte=end), items.filter(day__lte=end)
+        rollups, item_sales = rollups.filter(date__lte=end), item_sales.filter(date__lte=end)
+
+    rollups.delete()
+    item_sales.delete()
+
+    daily = list(orders.values('day').annotate(order_count=Count('id'), revenue=Sum('total')).order_by())
+    DailySalesRollup.objects.bulk_create(
+        DailySalesRollup(date=row['day'], order_count=row['order_count'], revenue=row['revenue'] or 0)
+        for row in daily
+    )
+
+    per_item = items.values('day', 'item_id').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum('line_total'),
+    ).order_by()
+    DailyItemSales.objects.bulk_create(
+        (
+            DailyItemSales(
+                date=row['day'], item_id=row['item_id'],
+                quantity=row['total_quantity'], revenue=row['total_revenue'] or 0,
+            )
+            for row in per_item.iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+    return len(daily)
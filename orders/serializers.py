@@ -1,5 +1,10 @@
+from decimal import Decimal
+from django.db import transaction
 from rest_framework import serializers
-from .models import Order, OrderItem, Reservation, Coupon, Feedback, OrderStatus
+from .models import Order, OrderItem, Reservation, Coupon, Feedback, OrderStatus, Table
+from .reservations import SLOTS_PER_DAY, book, reservation_slots
+from .signals import add_item_delta, deletes_accounted, order_sales_changed
+from .utils import send_order_confirmation_email
 from products.models import Menu
 
 class OrderStatusSerializer(serializers.ModelSerializer):
@@ -15,13 +20,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
     Serializer for the OrderItem model. Handles nested creation within Order.
     """
     item_name = serializers.CharField(source='item.name', read_only=True)
-    item_price = serializers.DecimalField(source='item.price', max_digits=6, decimal_places=2, read_only=True)
+    item_price = serializers.DecimalField(source='unit_price', max_digits=6, decimal_places=2, read_only=True)
     item = serializers.PrimaryKeyRelatedField(queryset=Menu.objects.all())
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'item', 'item_name', 'quantity', 'item_price']
-        read_only_fields = ['id', 'item_name']
+        fields = ['id', 'item', 'item_name', 'quantity', 'item_price', 'line_total']
+        read_only_fields = ['id', 'item_name', 'line_total']
+        extra_kwargs = {'quantity': {'min_value': 1}}
 
 class OrderSerializer(serializers.ModelSerializer):
     """
@@ -33,48 +39,168 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'waiter', 'waiter_username', 'status', 'total', 'customer', 'created_at', 'items']
-        read_only_fields = ['id', 'waiter_username', 'status', 'total', 'customer', 'created_at']
+        fields = ['id', 'waiter', 'waiter_username', 'status', 'version', 'total', 'customer', 'created_at', 'items']
+        read_only_fields = ['id', 'waiter_username', 'status', 'version', 'total', 'customer', 'created_at']
 
     def create(self, validated_data):
         """
         Overrides the create method to handle nested OrderItems.
+        All items are written with a single bulk insert, one per menu item.
+        Each item snapshots the Menu price loaded during validation, and the
+        order total is the sum of the resulting line totals.
         """
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
+        order_items = [
+            OrderItem.for_menu_item(data['item'], data['quantity'])
+            for data in self._merge_items(items_data).values()
+        ]
+        with transaction.atomic():
+            order = Order.objects.create(
+                total=sum((order_item.line_total for order_item in order_items), Decimal('0.00')),
+                **validated_data
+            )
+            for order_item in order_items:
+                order_item.order = order
+            OrderItem.objects.bulk_create(order_items)
+
+            item_deltas = {}
+            for order_item in order_items:
+                add_item_delta(item_deltas, order_item.item_id, order_item.unit_price, order_item.quantity)
+            order_sales_changed.send(
+                sender=Order, order=order, order_delta=1,
+                revenue_delta=order.total, item_deltas=item_deltas,
+            )
+            # Written to the outbox in this transaction, delivered by Celery
+            send_order_confirmation_email(order)
         return order
 
     def update(self, instance, validated_data):
         """
         Overrides the update method to handle nested OrderItems.
-        This method replaces all existing items with the new list provided.
+        The provided list replaces the current items, but only rows that
+        actually changed are inserted, updated or deleted.
         """
         items_data = validated_data.pop('items', None)
 
-        # Update other fields on the Order instance
-        instance.waiter = validated_data.get('waiter', instance.waiter)
-        instance.status = validated_data.get('status', instance.status)
-        instance.save()
-
-        # Update or create nested items if they were provided
-        if items_data is not None:
-            # Clear existing items and add new ones
-            instance.items.all().delete()
-            for item_data in items_data:
-                OrderItem.objects.create(order=instance, **item_data)
-        
+        with transaction.atomic():
+            # Update other fields on the Order instance. Status is read-only
+            # here and only changes through orders.statuses.transition
+            instance.waiter = validated_data.get('waiter', instance.waiter)
+            update_fields = ['waiter']
+
+            if items_data is not None:
+                previous_total = instance.total
+                item_deltas, instance.total = self._sync_items(instance, items_data)
+                update_fields.append('total')
+
+            instance.save(update_fields=update_fields)
+
+            if items_data is not None:
+                order_sales_changed.send(
+                    sender=Order, order=instance, order_delta=0,
+                    revenue_delta=instance.total - previous_total, item_deltas=item_deltas,
+                )
+
         return instance
 
+    def _merge_items(self, items_data):
+        """
+        Adds up the quantities of repeated menu items, keyed by menu item id.
+        """
+        merged = {}
+        for item_data in items_data:
+            menu_item = item_data['item']
+            if menu_item.pk in merged:
+                merged[menu_item.pk]['quantity'] += item_data.get('quantity', 1)
+            else:
+                merged[menu_item.pk] = {'item': menu_item, 'quantity': item_data.get('quantity', 1)}
+        return merged
+
+    def _sync_items(self, order, items_data):
+        """
+        Diffs the requested items against the stored ones, keyed by menu item,
+        and issues at most one bulk INSERT, one bulk UPDATE and one DELETE.
+        Kept items keep the price they were ordered at; new items snapshot
+        the current Menu price. Returns the per-menu-item sales deltas for
+        order_sales_changed and the new order total.
+        """
+        wanted = self._merge_items(items_data)
+        item_deltas = {}
+        total = Decimal('0.00')
+        to_update, to_delete = [], []
+        for existing in order.items.select_related('item'):
+            data = wanted.pop(existing.item_id, None)
+            new_quantity = 0 if data is None else data['quantity']
+            if new_quantity != existing.quantity:
+                add_item_delta(item_deltas, existing.item_id, existing.price_paid, new_quantity - existing.quantity)
+
+            if data is None:
+                to_delete.append(existing.pk)
+                continue
+            if new_quantity != existing.quantity or existing.unit_price is None:
+                existing.set_quantity(new_quantity)
+                to_update.append(existing)
+            total += existing.line_total
+
+        if to_delete:
+            # Already in item_deltas and the new total
+            with deletes_accounted():
+                OrderItem.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            OrderItem.objects.bulk_update(to_update, ['quantity', 'unit_price', 'line_total'])
+        if wanted:
+            new_items = [
+                OrderItem.for_menu_item(data['item'], data['quantity'], order=order)
+                for data in wanted.values()
+            ]
+            OrderItem.objects.bulk_create(new_items)
+            for order_item in new_items:
+                total += order_item.line_total
+                add_item_delta(item_deltas, order_item.item_id, order_item.unit_price, order_item.quantity)
+        # Drop any stale prefetch so the response reflects the new rows
+        getattr(order, '_prefetched_objects_cache', {}).pop('items', None)
+        return item_deltas, total
+
 class ReservationSerializer(serializers.ModelSerializer):
     """
-    Serializer for the Reservation model.
+    Serializer for the Reservation model. Saving claims the reservation's
+    time slots and raises orders.reservations.TableUnavailable if the
+    table is already booked.
     """
+    table_number = serializers.SlugRelatedField(
+        source='table', slug_field='number', queryset=Table.objects.filter(is_active=True)
+    )
+
     class Meta:
         model = Reservation
-        fields = ['id', 'customer', 'table_number', 'date', 'time', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'customer', 'table_number', 'date', 'time', 'duration_minutes', 'party_size', 'created_at']
+        read_only_fields = ['id', 'customer', 'created_at']
+
+    def validate(self, attrs):
+        table = attrs.get('table', getattr(self.instance, 'table', None))
+        party_size = attrs.get('party_size', getattr(self.instance, 'party_size', 2))
+        if table is not None and party_size > table.seats:
+            raise serializers.ValidationError(
+                {'party_size': f'Table {table.number} seats at most {table.seats}.'}
+            )
+        if attrs.get('duration_minutes') == 0:
+            raise serializers.ValidationError({'duration_minutes': 'Duration must be positive.'})
+
+        reservation = Reservation(
+            time=attrs.get('time', getattr(self.instance, 'time', None)),
+            duration_minutes=attrs.get('duration_minutes', getattr(self.instance, 'duration_minutes', 90)),
+        )
+        if reservation.time is not None and reservation_slots(reservation).stop > SLOTS_PER_DAY:
+            raise serializers.ValidationError({'time': 'Reservations must end by midnight.'})
+        return attrs
+
+    def create(self, validated_data):
+        return book(Reservation(**validated_data))
+
+    def update(self, instance, validated_data):
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        return book(instance)
 
 class CouponSerializer(serializers.ModelSerializer):
     """
@@ -82,8 +208,11 @@ class CouponSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Coupon
-        fields = ['id', 'code', 'discount', 'active', 'created_at']
-        read_only_fields = ['code', 'created_at']
+        fields = [
+            'id', 'code', 'discount_percentage', 'is_active',
+            'valid_from', 'valid_until', 'max_uses', 'times_used'
+        ]
+        read_only_fields = ['code', 'times_used']
 
 class FeedbackSerializer(serializers.ModelSerializer):
     order_id = serializers.PrimaryKeyRelatedField(
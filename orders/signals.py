@@ -0,0 +1,73 @@
+import contextlib
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db.models import F
+from django.db.models.signals import pre_delete
+from django.dispatch import Signal, receiver
+
+from .models import Order, OrderItem
+
+# Sent inside the writing transaction whenever an order's sales figures
+# change. Receivers get the order plus:
+#   order_delta   -- +1 when the order is placed, -1 when removed, else 0
+#   revenue_delta -- change to the order total (Decimal)
+#   item_deltas   -- {menu_item_id: [quantity_delta, revenue_delta]}
+order_sales_changed = Signal()
+
+# True while the caller deletes rows it has already accounted for
+_deletes_accounted = ContextVar('deletes_accounted', default=False)
+
+
+def add_item_delta(item_deltas, item_id, unit_price, quantity):
+    """
+    Accumulates a quantity change for a menu item, priced at the unit price
+    the customer paid, into item_deltas.
+    """
+    delta = item_deltas.setdefault(item_id, [0, Decimal('0.00')])
+    delta[0] += quantity
+    delta[1] += unit_price * quantity
+
+
+@contextlib.contextmanager
+def deletes_accounted():
+    """
+    Turns the delete receivers below off for code that sends
+    order_sales_changed for the rows it deletes itself.
+    """
+    token = _deletes_accounted.set(True)
+    try:
+        yield
+    finally:
+        _deletes_accounted.reset(token)
+
+
+# Deletes are accounted for in pre_delete, so QuerySet.delete() and cascades
+# (a deleted customer or dish) keep the aggregates right, not just the API.
+# Django deletes, and signals, an order's items before the order itself:
+# each item reverses its share and takes it off the order total, then the
+# order reverses whatever is left of its total along with its count.
+
+@receiver(pre_delete, sender=OrderItem, dispatch_uid='orders.signals.order_item_deleted')
+def order_item_deleted(sender, instance, **kwargs):
+    if _deletes_accounted.get():
+        return
+    item_deltas = {}
+    add_item_delta(item_deltas, instance.item_id, instance.price_paid, -instance.quantity)
+    revenue_delta = item_deltas[instance.item_id][1]
+    Order.objects.filter(pk=instance.order_id).update(total=F('total') + revenue_delta)
+    order_sales_changed.send(
+        sender=Order, order=instance.order, order_delta=0,
+        revenue_delta=revenue_delta, item_deltas=item_deltas,
+    )
+
+
+@receiver(pre_delete, sender=Order, dispatch_uid='orders.signals.order_deleted')
+def order_deleted(sender, instance, **kwargs):
+    if _deletes_accounted.get():
+        return
+    remaining = sender.objects.filter(pk=instance.pk).values_list('total', flat=True).first()
+    order_sales_changed.send(
+        sender=sender, order=instance, order_delta=-1,
+        revenue_delta=-(remaining or 0), item_deltas={},
+    )
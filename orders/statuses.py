@@ -0,0 +1,208 @@
+"""
+In-process registry of order statuses and the transitions allowed between them.
+
+The status table is tiny and almost never changes, so it is loaded once per
+process (on the first request, see OrdersConfig.ready) and resolved from
+memory afterwards. Writes to OrderStatus clear the registry in the writing
+process; other processes reload it after REGISTRY_TTL seconds.
+"""
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FINAL_STATUSES, Order, OrderStatus
+
+REGISTRY_TTL = 300
+
+# Allowed next statuses for each status. Setting the current status again
+# is always allowed, and statuses missing from the graph cannot be left.
+TRANSITIONS = {
+    'pending': {'preparing', 'cancelled'},
+    'preparing': {'ready', 'cancelled'},
+    'ready': {'served'},
+    'served': {'completed'},
+    'completed': set(),
+    'cancelled': set(),
+}
+
+
+class StatusRegistry:
+    """
+    Resolves status names and ids to OrderStatus instances in O(1).
+    """
+    def __init__(self):
+        # (by_name, by_id, loaded_at), replaced as a whole so readers never
+        # see a half-loaded or just-invalidated registry
+        self._state = None
+        self._lock = threading.Lock()
+
+    def warm(self):
+        statuses = list(OrderStatus.objects.all())
+        state = (
+            {status.name.lower(): status for status in statuses},
+            {status.pk: status for status in statuses},
+            time.monotonic(),
+        )
+        with self._lock:
+            self._state = state
+        return state
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+
+    def _maps(self):
+        state = self._state
+        if state is None or time.monotonic() - state[2] > REGISTRY_TTL:
+            state = self.warm()
+        return state[0], state[1]
+
+    def get(self, name):
+        """
+        Returns the status with the given name (case-insensitive) or raises
+        OrderStatus.DoesNotExist.
+        """
+        by_name, _ = self._maps()
+        try:
+            return by_name[name.lower()]
+        except KeyError:
+            raise OrderStatus.DoesNotExist(f"Unknown order status: {name}")
+
+    def by_id(self, pk):
+        _, by_id = self._maps()
+        return by_id.get(pk)
+
+    def can_transition(self, current, new):
+        """
+        Whether an order may move from status current (an OrderStatus or
+        None) to status new, checked against TRANSITIONS.
+        """
+        if current is None or current.pk == new.pk:
+            return True
+        return new.name.lower() in TRANSITIONS.get(current.name.lower(), ())
+
+    def sources_of(self, new):
+        """
+        Ids of the statuses TRANSITIONS allows to move to status new.
+        """
+        _, by_id = self._maps()
+        name = new.name.lower()
+        return [
+            pk for pk, status in by_id.items()
+            if name in TRANSITIONS.get(status.name.lower(), ())
+        ]
+
+
+registry = StatusRegistry()
+
+
+class InvalidTransition(Exception):
+    """
+    The requested status cannot follow the order's current status.
+    """
+    def __init__(self, current, new):
+        self.current = current
+        self.new = new
+        super().__init__(
+            f"Cannot change status from '{current.name}' to '{new.name}'."
+        )
+
+
+class TransitionConflict(Exception):
+    """
+    The order changed since it was read, so the transition was not applied.
+    """
+    def __init__(self, order):
+        self.order = order
+        super().__init__('The order was modified by another request. Reload it and try again.')
+
+
+def transition(order, new_status, expected_version=None):
+    """
+    Moves order to new_status with a single conditional UPDATE that only
+    matches while the row still has the status and version that were read,
+    so concurrent transitions cannot overwrite each other. Only status,
+    version and is_active are written. Callers may pass the version their client last saw
+    as expected_version.
+
+    Raises InvalidTransition if TRANSITIONS does not allow the move and
+    TransitionConflict if the order changed in the meantime. On success the
+    instance is updated in place.
+    """
+    current = registry.by_id(order.status_id)
+    if not registry.can_transition(current, new_status):
+        raise InvalidTransition(current, new_status)
+
+    version = order.version if expected_version is None else expected_version
+    is_active = new_status.name.lower() not in FINAL_STATUSES
+    updated = Order.objects.filter(
+        pk=order.pk, status_id=order.status_id, version=version,
+    ).update(status_id=new_status.pk, version=F('version') + 1, is_active=is_active)
+    if not updated:
+        order.refresh_from_db(fields=['status', 'version', 'is_active'])
+        raise TransitionConflict(order)
+
+    order.status = new_status
+    order.version = version + 1
+    order.is_active = is_active
+    return order
+
+
+def bulk_transition(order_ids, new_status):
+    """
+    Moves every order in order_ids to new_status in one transaction.
+
+    The rows are locked and checked against TRANSITIONS in memory. Then one
+    set-based UPDATE moves them, with a WHERE clause that repeats the check.
+    Returns a dict mapping each requested id to one of 'updated',
+    'unchanged' (already in new_status), 'invalid_transition', 'not_found'
+    or 'conflict' (changed by another request in between).
+    """
+    results = dict.fromkeys(order_ids, 'not_found')
+    with transaction.atomic():
+        rows = Order.objects.select_for_update().filter(pk__in=results).values_list('pk', 'status_id')
+        movable = []
+        for pk, status_id in rows:
+            if status_id == new_status.pk:
+                results[pk] = 'unchanged'
+            elif registry.can_transition(registry.by_id(status_id), new_status):
+                movable.append(pk)
+            else:
+                results[pk] = 'invalid_transition'
+
+        if movable:
+            queryset = Order.objects.filter(
+                Q(status__isnull=True) | Q(status_id__in=registry.sources_of(new_status)),
+                pk__in=movable,
+            )
+            updated = queryset.update(
+                status_id=new_status.pk, version=F('version') + 1,
+                is_active=new_status.name.lower() not in FINAL_STATUSES,
+            )
+            if updated == len(movable):
+                results.update(dict.fromkeys(movable, 'updated'))
+            else:
+                # Only possible where select_for_update is a no-op (SQLite)
+                moved = set(Order.objects.filter(pk__in=movable, status_id=new_status.pk).values_list('pk', flat=True))
+                for pk in movable:
+                    results[pk] = 'updated' if pk in moved else 'conflict'
+    return results
+
+
+@receiver([post_save, post_delete], sender=OrderStatus, dispatch_uid='orders.statuses.status_changed')
+def status_changed(sender, **kwargs):
+    registry.invalidate()
+
+
+def warm_registry(sender, **kwargs):
+    """
+    request_started receiver that loads the registry on the first request
+    and then disconnects itself.
+    """
+    from django.core.signals import request_started
+    request_started.disconnect(warm_registry, dispatch_uid='orders.statuses.warm_registry')
+    registry.warm()
@@ -1,33 +1,42 @@
 from celery import shared_task
-from django.db.models import Sum
-from .models import Order
 from django.utils import timezone
-from datetime import timedelta
+from restaurant_management.replicas import replica_reads
+from . import popularity
+from .outbox import drain_outbox
+from .rollups import daily_summary
 
 @shared_task
+@replica_reads()
 def generate_daily_report():
     """
     Generates and saves a daily sales report.
+    The figures are read from the daily sales rollups, not the raw orders,
+    on a replica when one is configured.
     """
-    today = timezone.now().date()
-    start_of_day = timezone.make_aware(timezone.datetime.combine(today, timezone.datetime.min.time()))
-    end_of_day = timezone.make_aware(timezone.datetime.combine(today, timezone.datetime.max.time()))
+    report = daily_summary(timezone.localdate())
+    report['top_item'] = report['top_item'] or "N/A"
 
-    orders_today = Order.objects.filter(created_at__range=(start_of_day, end_of_day))
-    total_sales = orders_today.aggregate(Sum('total_price'))['total_price__sum'] or 0
-    total_orders = orders_today.count()
+    # Save the report (You will need to create a SalesReport model)
+    # SalesReport.objects.create(**report)
 
-    # Logic to find top-selling item
-    # This is a simplified version, as your models are not provided.
-    top_item = "Not Implemented"
+    return report
 
-    # Save the report (You will need to create a SalesReport model)
-    # SalesReport.objects.create(date=today, total_sales=total_sales, total_orders=total_orders, top_item=top_item)
+@shared_task(ignore_result=True)
+def send_outbox_emails(batch_size=100):
+    """
+    Delivers queued emails from the outbox over a single SMTP connection.
+    Re-queues itself while full batches keep coming, so a backlog drains
+    without waiting for the next periodic run.
+    """
+    metrics = drain_outbox(batch_size)
+    if metrics['claimed'] == batch_size:
+        send_outbox_emails.delay(batch_size)
+    return metrics
 
-    return {
-        "date": today.isoformat(),
-        "total_orders": total_orders,
-        "total_sales": total_sales,
-        "top_item": top_item
-    }
 
+@shared_task
+def prune_dish_sales_buckets():
+    """
+    Deletes popularity buckets older than the longest popularity window.
+    """
+    return popularity.prune()
@@ -1,3 +1,1132 @@
-from django.test import TestCase
+import asyncio
+import json
+import re
+import tempfile
+import threading
+import time as time_module
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import django
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from account.authentication import revoke_token
+from account.serializers import CustomTokenObtainPairSerializer
+from products.models import Category, Menu
+from restaurant_management import task as project_tasks
+from restaurant_management.db import database_config, replica_configs
+from restaurant_management.replicas import (
+    ReplicaReadMixin,
+    ReplicaStickinessMiddleware,
+    replica_reads,
+    user_is_sticky,
+)
+from . import leaderboard, rollups
+from .analytics import sales_series
+from .asgi import SSE_PATH, WEBSOCKET_PATH, order_feed_application
+from . import coupons
+from .coupons import CouponError, redeem_coupon, validate_coupon
+from .feed import get_broker
+from .models import (
+    Coupon, CustomerSpend, CustomerSpendBucket, DailyItemSales, DailySalesRollup, DishSalesBucket, Feedback, Order,
+    OrderItem, OrderStatus, OutboundEmail, Reservation, Table,
+)
+from .outbox import MAX_ATTEMPTS, drain_outbox, queue_email
+from .popularity import bucket_start, top_dishes
+from .reservations import TableUnavailable, book, free_tables
+from .serializers import OrderSerializer
+from . import exports, tasks
+from .views import (
+    CouponViewSet,
+    DashboardAPIView,
+    FeedbackListAPIView,
+    OrderExportView,
+    OrderViewSet,
+    ReservationViewSet,
+    SalesAnalyticsView,
+    TopCustomersReportView,
+    WaiterOrderViewSet,
+)
+from .statuses import StatusRegistry, TransitionConflict, registry as status_registry, transition
+
+User = get_user_model()
+
+
+class OrderListingQueryCountTests(TestCase):
+    """
+    Serializing a page of orders must cost the same number of queries
+    whether the page holds one order or many.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(username='customer', password='secret')
+        cls.waiter = User.objects.create_user(username='waiter', password='secret', role=User.Role.WAITER)
+        cls.pending = OrderStatus.objects.create(name='pending')
+        category = Category.objects.create(name='Mains')
+        cls.dishes = [
+            Menu.objects.create(name=f'Dish {i}', description='', price='10.00', category=category)
+            for i in range(3)
+        ]
+
+    def _create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(customer=self.customer, waiter=self.waiter, status=self.pending)
+            OrderItem.objects.bulk_create(OrderItem(order=order, item=dish) for dish in self.dishes)
+
+    def _listing_queries(self, page_size):
+        # Order query + items prefetch (joined with Menu)
+        with self.assertNumQueries(2):
+            data = OrderSerializer(Order.objects.for_listing()[:page_size], many=True).data
+        return data
+
+    def test_query_count_is_constant_regardless_of_page_size(self):
+        self._create_orders(1)
+        self.assertEqual(len(self._listing_queries(1)), 1)
+
+        self._create_orders(24)
+        data = self._listing_queries(25)
+        self.assertEqual(len(data), 25)
+        self.assertEqual(data[0]['waiter_username'], 'waiter')
+        self.assertEqual(data[0]['status'], 'pending')
+        self.assertEqual(len(data[0]['items']), 3)
+
+
+class OrderItemSyncTests(TestCase):
+    """
+    Saving an order's items writes only the rows that changed, and repeated
+    menu items become a single line.
+    """
+
+    def setUp(self):
+        self.customer = User.objects.create_user(username='customer', password='secret')
+        category = Category.objects.create(name='Mains')
+        self.curry, self.naan, self.rice, self.dal = (
+            Menu.objects.create(name=name, description='', price='5.00', category=category)
+            for name in ('Curry', 'Naan', 'Rice', 'Dal')
+        )
+
+    def save(self, items, instance=None):
+        serializer = OrderSerializer(instance, data={'items': [{'item': dish.pk, 'quantity': n} for dish, n in items]})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(customer=self.customer)
+
+    def lines(self, order):
+        return {
+            item.item_id: (item.quantity, str(item.unit_price))
+            for item in order.items.all()
+        }
+
+    def test_create_merges_repeated_items(self):
+        order = self.save([(self.curry, 1), (self.naan, 2), (self.curry, 2)])
+        self.assertEqual(self.lines(order), {self.curry.pk: (3, '5.00'), self.naan.pk: (2, '5.00')})
+        self.assertEqual(str(order.total), '25.00')
+
+    def test_update_writes_only_the_difference(self):
+        order = self.save([(self.curry, 1), (self.naan, 2), (self.rice, 1)])
+        Menu.objects.filter(pk__in=[self.curry.pk, self.naan.pk, self.dal.pk]).update(price='8.00')
+
+        # Curry kept as is, naan changes quantity, rice goes, dal is new
+        items = [(self.curry, 1), (self.naan, 1), (self.dal, 1), (self.naan, 2)]
+        with CaptureQueriesContext(connection) as queries:
+            self.save(items, instance=Order.objects.get(pk=order.pk))
+        table = OrderItem._meta.db_table
+        writes = [
+            query['sql'].split()[0] for query in queries.captured_queries
+            if re.match(rf'(INSERT INTO|UPDATE|DELETE FROM) "{table}"', query['sql'])
+        ]
+        self.assertEqual(sorted(writes), ['DELETE', 'INSERT', 'UPDATE'])
+
+        order.refresh_from_db()
+        self.assertEqual(self.lines(order), {
+            self.curry.pk: (1, '5.00'),
+            self.naan.pk: (3, '5.00'),
+            self.dal.pk: (1, '8.00'),
+        })
+        self.assertEqual(str(order.total), '28.00')
+
+    def test_non_positive_quantities_are_rejected(self):
+        view = OrderViewSet.as_view({'post': 'create'})
+        for quantity in (0, -2):
+            request = APIRequestFactory().post(
+                '/', {'items': [{'item': self.curry.pk, 'quantity': quantity}]}, format='json'
+            )
+            force_authenticate(request, user=self.customer)
+            response = view(request)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('quantity', response.data['items'][0])
+        self.assertFalse(Order.objects.exists())
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Walking the order listing page by page returns every order exactly
+    once, even when many share a created_at.
+    """
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='secret', role=User.Role.MANAGER)
+        customer = User.objects.create_user(username='customer', password='secret')
+        orders = [Order.objects.create(customer=customer) for _ in range(7)]
+        # Three timestamps for seven orders, so pages end inside a tie
+        moments = [timezone.now() - timedelta(minutes=minutes) for minutes in (0, 0, 0, 5, 5, 9, 9)]
+        for order, moment in zip(orders, moments):
+            Order.objects.filter(pk=order.pk).update(created_at=moment)
+        self.expected = list(Order.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def list(self, **params):
+        request = APIRequestFactory().get('/orders/', params)
+        force_authenticate(request, user=self.manager)
+        return OrderViewSet.as_view({'get': 'list'})(request)
+
+    def test_pages_have_no_duplicates_or_gaps(self):
+        seen, params, pages = [], {'page_size': 2}, 0
+        while True:
+            response = self.list(**params)
+            self.assertEqual(response.status_code, 200)
+            seen += [order['id'] for order in response.data['results']]
+            pages += 1
+            if response.data['next'] is None:
+                break
+            params['cursor'] = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        self.assertEqual(pages, 4)
+        self.assertEqual(seen, self.expected)
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ('not-base64!', 'bm90IGEgY3Vyc29y', 'MjAyNC0wMS0wMXxhYmM='):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.list(cursor=cursor).status_code, 400)
+
+
+class StatusRegistryTests(TestCase):
+    """
+    Status lookups are served from memory once the registry is warm, and
+    writes to OrderStatus are picked up.
+    """
+
+    def setUp(self):
+        for name in ('pending', 'preparing', 'ready', 'cancelled'):
+            OrderStatus.objects.create(name=name)
+        status_registry.invalidate()
+        self.addCleanup(status_registry.invalidate)
+
+    def test_lookups_hit_memory_after_warm(self):
+        status_registry.warm()
+        with self.assertNumQueries(0):
+            pending = status_registry.get('Pending')
+            self.assertEqual(status_registry.by_id(pending.pk), pending)
+            with self.assertRaises(OrderStatus.DoesNotExist):
+                status_registry.get('lost')
+
+    def test_save_invalidates(self):
+        status_registry.warm()
+        OrderStatus.objects.create(name='served')
+        self.assertEqual(status_registry.get('served').name, 'served')
+
+    def test_concurrent_invalidate_during_load(self):
+        # Another thread invalidates right after this one finished loading
+        def warm_then_invalidate():
+            state = StatusRegistry.warm(status_registry)
+            status_registry.invalidate()
+            return state
+
+        with mock.patch.object(status_registry, 'warm', side_effect=warm_then_invalidate):
+            self.assertEqual(status_registry.get('pending').name, 'pending')
+
+    def test_transition_graph(self):
+        pending, preparing, ready, cancelled = (
+            status_registry.get(name) for name in ('pending', 'preparing', 'ready', 'cancelled')
+        )
+        self.assertTrue(status_registry.can_transition(pending, preparing))
+        self.assertTrue(status_registry.can_transition(preparing, cancelled))
+        self.assertFalse(status_registry.can_transition(pending, ready))
+        self.assertFalse(status_registry.can_transition(cancelled, pending))
+
+    def test_stale_transition_conflicts(self):
+        customer = User.objects.create_user(username='customer', password='secret')
+        order = Order.objects.create(customer=customer, status=status_registry.get('pending'))
+        stale = Order.objects.get(pk=order.pk)
+
+        transition(order, status_registry.get('preparing'))
+        with self.assertRaises(TransitionConflict):
+            transition(stale, status_registry.get('cancelled'))
+
+        order.refresh_from_db()
+        self.assertEqual((order.status.name, order.version), ('preparing', 1))
+
+    def test_final_status_closes_the_order(self):
+        customer = User.objects.create_user(username='customer', password='secret')
+        open_order = Order.objects.create(customer=customer, status=status_registry.get('pending'))
+        order = Order.objects.create(customer=customer, status=status_registry.get('pending'))
+        transition(order, status_registry.get('cancelled'))
+        self.assertFalse(order.is_active)
+        self.assertEqual(list(Order.objects.active()), [open_order])
+        self.assertFalse(Order.objects.create(customer=customer, status=status_registry.get('cancelled')).is_active)
+
+
+class BulkStatusTests(TestCase):
+    """
+    The bulk-status action moves valid orders in one UPDATE, reports every
+    id and publishes a single feed event.
+    """
+
+    def setUp(self):
+        for name in ('pending', 'preparing', 'completed'):
+            OrderStatus.objects.create(name=name)
+        status_registry.invalidate()
+        self.addCleanup(status_registry.invalidate)
+        self.waiter = User.objects.create_user(username='waiter', password='secret', role=User.Role.WAITER)
+
+    def test_bulk_status_results_and_single_event(self):
+        pending = [Order.objects.create(customer=self.waiter, status=status_registry.get('pending')) for _ in range(3)]
+        done = Order.objects.create(customer=self.waiter, status=status_registry.get('completed'))
+        ids = [order.pk for order in pending] + [done.pk, 999999]
+
+        request = APIRequestFactory().post('/orders/bulk-status/', {'ids': ids, 'status': 'preparing'}, format='json')
+        force_authenticate(request, user=self.waiter)
+        with mock.patch('orders.feed.get_broker') as get_broker, self.captureOnCommitCallbacks(execute=True):
+            response = OrderViewSet.as_view({'post': 'bulk_status'}, **OrderViewSet.bulk_status.kwargs)(request)
+
+        self.assertEqual(response.status_code, 200)
+        results = {row['id']: row['result'] for row in response.data['results']}
+        self.assertEqual(results, {
+            **{order.pk: 'updated' for order in pending},
+            done.pk: 'invalid_transition',
+            999999: 'not_found',
+        })
+        self.assertEqual(
+            Order.objects.filter(status__name='preparing', version=1).count(), 3
+        )
+        get_broker.return_value.publish.assert_called_once()
+        event = get_broker.return_value.publish.call_args.args[0]
+        self.assertEqual((event['type'], sorted(event['ids'])), ('order.status.bulk', [o.pk for o in pending]))
+
+
+class SalesSeriesTests(TestCase):
+    """
+    Reading closed days from the rollups gives the same buckets as
+    aggregating the raw orders.
+    """
+
+    def test_rollups_match_raw_orders(self):
+        customer = User.objects.create_user(username='customer', password='secret')
+        now = timezone.now()
+        for days_ago, total in ((40, '12.00'), (40, '8.00'), (3, '20.00'), (0, '5.50')):
+            order = Order.objects.create(customer=customer, total=total)
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(days=days_ago))
+        rollups.rebuild()
+
+        today = timezone.localdate()
+        start = today - timedelta(days=60)
+        for granularity in ('day', 'week', 'month'):
+            with self.subTest(granularity=granularity):
+                self.assertEqual(
+                    sales_series(start, today, granularity),
+                    sales_series(start, today, granularity, use_rollups=False),
+                )
+        daily = sales_series(start, today, 'day')
+        self.assertEqual([bucket['orders'] for bucket in daily], [2, 1, 1])
+        self.assertEqual(str(daily[0]['average_ticket']), '10.00')
+
+
+class RollupConsistencyTests(TestCase):
+    """
+    The incrementally maintained aggregates match a rebuild from the raw
+    orders after every kind of write, including deletes outside the API.
+    """
+
+    def setUp(self):
+        self.customer = User.objects.create_user(username='customer', password='secret')
+        category = Category.objects.create(name='Mains')
+        self.curry, self.naan, self.rice = (
+            Menu.objects.create(name=name, description='', price=price, category=category)
+            for name, price in (('Curry', '9.50'), ('Naan', '2.00'), ('Rice', '3.00'))
+        )
+
+    def save(self, items, instance=None):
+        serializer = OrderSerializer(instance, data={'items': [{'item': dish.pk, 'quantity': n} for dish, n in items]})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(customer=self.customer)
+
+    def aggregates(self):
+        return (
+            sorted(DailySalesRollup.objects.filter(order_count__gt=0).values_list('date', 'order_count', 'revenue')),
+            sorted(DailyItemSales.objects.filter(quantity__gt=0).values_list('date', 'item_id', 'quantity', 'revenue')),
+            sorted(CustomerSpend.objects.filter(total__gt=0).values_list('customer_id', 'total')),
+            sorted(CustomerSpendBucket.objects.filter(amount__gt=0).values_list('customer_id', 'day', 'amount')),
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.aggregates()
+        rollups.rebuild()
+        leaderboard.rebuild()
+        self.assertEqual(incremental, self.aggregates())
+
+    def test_writes_match_rebuild(self):
+        order = self.save([(self.curry, 2), (self.naan, 3)])
+        other = self.save([(self.rice, 1), (self.naan, 1)])
+        self.assertMatchesRebuild()
+
+        self.save([(self.curry, 1), (self.rice, 2)], instance=order)
+        self.assertMatchesRebuild()
+
+        order.items.get(item=self.rice).delete()
+        self.assertMatchesRebuild()
+        order.refresh_from_db()
+        self.assertEqual(str(order.total), '9.50')
+
+        # Cascades from a dish to its order items
+        self.naan.delete()
+        self.assertMatchesRebuild()
+
+        Order.objects.filter(pk__in=[order.pk, other.pk]).delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(self.aggregates(), ([], [], [], []))
+
+
+class LeaderboardTests(TestCase):
+    """
+    Spend is recorded per customer and day, and the cached boards are
+    rebuilt after any spend change.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user(username='manager', password='secret', role=User.Role.MANAGER)
+        category = Category.objects.create(name='Mains')
+        self.curry = Menu.objects.create(name='Curry', description='', price='10.00', category=category)
+
+    def order(self, username, quantity, days_ago=0):
+        customer, _ = User.objects.get_or_create(username=username)
+        serializer = OrderSerializer(data={'items': [{'item': self.curry.pk, 'quantity': quantity}]})
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = serializer.save(customer=customer)
+        if days_ago:
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+            leaderboard.rebuild()
+        return order
+
+    def board(self, window='all', limit=5):
+        return [(entry['name'], entry['total_spent']) for entry in leaderboard.top_customers(window, limit)]
+
+    def test_record_spend(self):
+        order = self.order('asha', 2)
+        self.order('asha', 1)
+        customer = order.customer
+        self.assertEqual(str(CustomerSpend.objects.get(customer=customer).total), '30.00')
+        self.assertEqual(
+            str(CustomerSpendBucket.objects.get(customer=customer, day=timezone.localdate()).amount), '30.00'
+        )
+
+    def test_boards_follow_writes(self):
+        self.order('asha', 2)
+        self.order('ben', 3)
+        self.assertEqual(self.board(), [('ben', Decimal('30.00')), ('asha', Decimal('20.00'))])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.board(limit=1), [('ben', Decimal('30.00'))])
+
+        self.order('asha', 2)
+        self.assertEqual(self.board(), [('asha', Decimal('40.00')), ('ben', Decimal('30.00'))])
+
+    def test_windows(self):
+        self.order('asha', 5, days_ago=20)
+        self.order('ben', 1)
+        self.assertEqual(self.board('7d'), [('ben', Decimal('10.00'))])
+        self.assertEqual(self.board('30d'), [('asha', Decimal('50.00')), ('ben', Decimal('10.00'))])
+
+        request = APIRequestFactory().get('/', {'window': '7d'})
+        force_authenticate(request, user=self.manager)
+        response = TopCustomersReportView.as_view()(request)
+        self.assertEqual(response.data['customers'], [{'name': 'ben', 'total_spent': Decimal('10.00')}])
+
+        request = APIRequestFactory().get('/', {'window': '2d'})
+        force_authenticate(request, user=self.manager)
+        self.assertEqual(TopCustomersReportView.as_view()(request).status_code, 400)
+
+
+class OrderExportTests(TestCase):
+    """
+    Exports stream every order in the inclusive date range, in CSV or
+    NDJSON, however many chunks that takes.
+    """
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='secret', role=User.Role.MANAGER)
+        customer = User.objects.create_user(username='customer', password='secret')
+        category = Category.objects.create(name='Mains')
+        curry = Menu.objects.create(name='Curry', description='', price='9.50', category=category)
+        self.today = timezone.localdate()
+        self.orders = []
+        # The last one just before midnight on the end date, then one the day after
+        for days_ago, hour in ((2, 12), (1, 12), (1, 23), (0, 23), (-1, 0)):
+            serializer = OrderSerializer(data={'items': [{'item': curry.pk, 'quantity': 2}]})
+            serializer.is_valid(raise_exception=True)
+            order = serializer.save(customer=customer)
+            moment = timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(hour, 59)))
+            Order.objects.filter(pk=order.pk).update(created_at=moment)
+            self.orders.append(order.pk)
+
+    def export(self, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=self.manager)
+        response = OrderExportView.as_view()(request)
+        if response.status_code != 200:
+            return response, None
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_covers_the_end_date(self):
+        start = (self.today - timedelta(days=1)).isoformat()
+        response, body = self.export(kind='orders', start=start, end=self.today.isoformat())
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = body.split('\r\n')
+        self.assertEqual(lines[0], 'order_id,created_at,customer_id,waiter_id,status,total')
+        self.assertEqual([int(line.split(',')[0]) for line in lines[1:-1]], self.orders[1:4])
+        self.assertTrue(lines[-2].endswith(',19.00'))
+
+    def test_ndjson_items(self):
+        response, body = self.export(kind='items', output='ndjson', start=self.today.isoformat())
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['order_id'] for row in rows], self.orders[3:])
+        self.assertEqual((rows[0]['menu_item_name'], rows[0]['line_total']), ('Curry', '19.00'))
+        self.assertTrue(rows[0]['created_at'].endswith('Z'))
+
+    def test_bad_parameters(self):
+        for params in ({'kind': 'refunds'}, {'output': 'xlsx'}, {'start': '2024-13-01'}, {'end': 'yesterday'}):
+            with self.subTest(**params):
+                self.assertEqual(self.export(**params)[0].status_code, 400)
+
+    def test_chunked_output_matches_single_block(self):
+        for fmt in exports.FORMATS:
+            with self.subTest(fmt=fmt):
+                header, rows = exports.export_rows('orders', chunk_size=2)
+                blocks = list(exports.render(fmt, header, rows, chunk_size=2))
+                header, rows = exports.export_rows('orders')
+                self.assertEqual(len(blocks), 3)
+                self.assertEqual(''.join(blocks), ''.join(exports.render(fmt, header, rows)))
+
+
+class BackfillOrderItemPricesTests(TestCase):
+    """
+    Backfilled line totals flow into the order total and every aggregate
+    built from it.
+    """
+
+    def test_legacy_order_is_priced_and_aggregated(self):
+        customer = User.objects.create_user(username='customer', password='secret')
+        category = Category.objects.create(name='Mains')
+        curry = Menu.objects.create(name='Curry', description='', price='9.50', category=category)
+        # Written before price snapshots existed, so no signal ran either
+        order = Order.objects.create(customer=customer)
+        OrderItem.objects.bulk_create([OrderItem(order=order, item=curry, quantity=2)])
+
+        call_command('backfill_order_item_prices', batch_size=10, stdout=StringIO())
+
+        order.refresh_from_db()
+        item = order.items.get()
+        self.assertEqual((str(item.unit_price), str(item.line_total)), ('9.50', '19.00'))
+        self.assertEqual(str(order.total), '19.00')
+        today = timezone.localdate(order.created_at)
+        self.assertEqual(str(DailySalesRollup.objects.get(date=today).revenue), '19.00')
+        self.assertEqual(DailyItemSales.objects.get(date=today, item=curry).quantity, 2)
+        self.assertEqual(str(CustomerSpend.objects.get(customer=customer).total), '19.00')
+        self.assertEqual(str(CustomerSpendBucket.objects.get(customer=customer, day=today).amount), '19.00')
+
+
+class PopularDishesTests(TestCase):
+    """
+    Popularity sums only the buckets inside the window, and repeated reads
+    are served from the cache.
+    """
+
+    def test_windows_and_cached_reads(self):
+        category = Category.objects.create(name='Mains')
+        curry, naan = (
+            Menu.objects.create(name=name, description='', price='9.00', category=category)
+            for name in ('Curry', 'Naan')
+        )
+        now = bucket_start(timezone.now())
+        DishSalesBucket.objects.bulk_create([
+            DishSalesBucket(bucket=now, item=curry, quantity=3),
+            DishSalesBucket(bucket=now - timedelta(hours=3), item=naan, quantity=10),
+        ])
+
+        cache.clear()
+        hour, _ = top_dishes('hour')
+        self.assertEqual([(dish['name'], dish['sold']) for dish in hour], [('Curry', 3)])
+        day, max_age = top_dishes('day')
+        self.assertEqual([dish['name'] for dish in day], ['Naan', 'Curry'])
+        with self.assertNumQueries(0):
+            self.assertEqual(top_dishes('day', limit=1)[0], day[:1])
+        self.assertLessEqual(max_age, 60)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxDeliveryTests(TestCase):
+    """
+    The outbox drains in batches over one connection and backs off on failure.
+    """
+
+    def test_batch_is_sent_over_a_single_connection(self):
+        for i in range(40):
+            queue_email(f'Order #{i}', 'Thanks!', [f'customer{i}@example.com'])
+
+        with mock.patch('orders.outbox.get_connection', wraps=mail.get_connection) as get_connection:
+            metrics = drain_outbox(batch_size=100)
+
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 40)
+        self.assertEqual(metrics['sent'], 40)
+        self.assertGreater(metrics['emails_per_sec'], 0)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.Status.SENT).exists())
+
+    def test_failed_send_is_retried_with_backoff(self):
+        email = queue_email('Order #1', 'Thanks!', ['customer@example.com'])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            metrics = drain_outbox()
+
+        email.refresh_from_db()
+        self.assertEqual(metrics['retried'], 1)
+        self.assertEqual(email.status, OutboundEmail.Status.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        # Not due yet, so the next drain leaves it alone
+        self.assertEqual(drain_outbox()['claimed'], 0)
+
+    def test_connection_failure_counts_as_an_attempt(self):
+        first = queue_email('Order #1', 'Thanks!', ['customer@example.com'])
+        last = queue_email('Order #2', 'Thanks!', ['customer@example.com'])
+        OutboundEmail.objects.filter(pk=last.pk).update(attempts=MAX_ATTEMPTS - 1)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError('refused')):
+            metrics = drain_outbox()
+
+        first.refresh_from_db()
+        last.refresh_from_db()
+        self.assertEqual((metrics['retried'], metrics['failed']), (1, 1))
+        self.assertEqual((first.status, first.attempts, first.last_error), (OutboundEmail.Status.PENDING, 1, 'refused'))
+        self.assertGreater(first.next_attempt_at, timezone.now())
+        self.assertEqual(last.status, OutboundEmail.Status.FAILED)
+
+    def test_broker_outage_does_not_fail_the_write(self):
+        with mock.patch.object(tasks.send_outbox_emails, 'apply_async', side_effect=OSError('refused')) as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                email = queue_email('Order #1', 'Thanks!', ['customer@example.com'])
+
+        self.assertIs(apply_async.call_args.kwargs['retry'], False)
+        email.refresh_from_db()
+        # Left for the periodic drain
+        self.assertEqual(email.status, OutboundEmail.Status.PENDING)
+
+
+class CouponRedemptionConcurrencyTests(TransactionTestCase):
+    """
+    Parallel redemptions must never push a coupon past its usage limit.
+    """
+
+    def test_no_over_redemption_under_parallel_requests(self):
+        today = timezone.localdate()
+        Coupon.objects.create(
+            code='RUSH10', discount_percentage=10, max_uses=5,
+            valid_from=today - timedelta(days=1), valid_until=today + timedelta(days=1),
+        )
+        results = []
+        barrier = threading.Barrier(20)
+
+        def redeem():
+            barrier.wait()
+            try:
+                redeem_coupon('RUSH10')
+                results.append(True)
+            except CouponError:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=redeem) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(Coupon.objects.get(code='RUSH10').times_used, 5)
+
+
+class CouponCacheTests(TestCase):
+    def setUp(self):
+        coupons.invalidate()
+        self.addCleanup(coupons.invalidate)
+        self.customer = User.objects.create_user(username='customer', password='secret')
+
+    def test_cache_is_bounded(self):
+        with mock.patch.object(coupons, 'COUPON_CACHE_SIZE', 3):
+            for code in ('A1', 'B2', 'C3', 'D4'):
+                with self.assertRaises(CouponError):
+                    validate_coupon(code)
+            self.assertEqual(list(coupons._cache), ['B2', 'C3', 'D4'])
+
+    def test_unknown_code_is_forgotten_quickly(self):
+        today = timezone.localdate()
+        with self.assertRaises(CouponError):
+            validate_coupon('LATE10')
+        # Created by another process, so no signal reaches this cache
+        Coupon.objects.bulk_create([Coupon(
+            code='LATE10', discount_percentage=10,
+            valid_from=today - timedelta(days=1), valid_until=today + timedelta(days=1),
+        )])
+        with mock.patch('orders.coupons.time.monotonic', return_value=time_module.monotonic() + coupons.COUPON_MISS_TTL + 1):
+            self.assertEqual(validate_coupon('LATE10').code, 'LATE10')
+
+    def test_non_string_code_is_rejected(self):
+        for action, method in (('validate', 'post'), ('redeem', 'post')):
+            request = APIRequestFactory().post('/', {'code': ['SAVE10']}, format='json')
+            force_authenticate(request, user=self.customer)
+            view = CouponViewSet.as_view({method: action}, **getattr(CouponViewSet, action).kwargs)
+            self.assertEqual(view(request).status_code, 400)
+
+
+class ReservationBookingTests(TestCase):
+    """
+    Overlapping bookings of a table are rejected by the slot constraint, and
+    availability skips tables booked for any part of the window.
+    """
+
+    def setUp(self):
+        self.customer = User.objects.create_user(username='customer', password='secret')
+        self.small = Table.objects.create(number=1, seats=2)
+        self.large = Table.objects.create(number=2, seats=6)
+        self.day = date(2024, 5, 17)
+
+    def _reservation(self, table, at, minutes=90, party_size=2):
+        return Reservation(
+            customer=self.customer, table=table, date=self.day,
+            time=at, duration_minutes=minutes, party_size=party_size,
+        )
+
+    def test_free_tables_excludes_overlapping_bookings(self):
+        book(self._reservation(self.large, time(19, 30)))
+
+        self.assertEqual(list(free_tables(self.day, time(19, 0), time(21, 0))), [self.small])
+        self.assertEqual(list(free_tables(self.day, time(19, 0), time(21, 0), party_size=4)), [])
+        self.assertEqual(list(free_tables(self.day, time(21, 0), time(22, 0), party_size=4)), [self.large])
+
+    def test_overlapping_booking_is_rejected(self):
+        first = book(self._reservation(self.large, time(19, 0)))
+        with self.assertRaises(TableUnavailable):
+            book(self._reservation(self.large, time(20, 15)))
+        self.assertEqual(Reservation.objects.filter(table=self.large).count(), 1)
+
+        # Moving a booking releases the slots it held
+        first.time = time(17, 0)
+        book(first)
+        book(self._reservation(self.large, time(20, 15)))
+        self.assertEqual(first.slots.count(), 6)
+
+
+class DatabaseConfigTests(TestCase):
+    """
+    restaurant_management.db builds the DATABASES entries from the
+    environment and rejects values it does not understand.
+    """
+    BASE_DIR = Path('/srv/restaurant')
+
+    def test_sqlite_defaults_to_stock_settings(self):
+        self.assertEqual(database_config(self.BASE_DIR, {}), {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': self.BASE_DIR / 'db.sqlite3',
+        })
+
+    @skipUnless(django.VERSION >= (5, 1), 'init_command needs Django 5.1')
+    def test_tuned_sqlite_profile_applies_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = database_config(self.BASE_DIR, {
+                'DB_SQLITE_PROFILE': 'tuned', 'DB_NAME': f'{directory}/tuned.sqlite3', 'DB_CONN_MAX_AGE': '30',
+            })
+            self.assertEqual(config['CONN_MAX_AGE'], 30)
+            self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+            tuned = ConnectionHandler({'default': config})['default']
+            try:
+                with tuned.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 5000)
+            finally:
+                tuned.close()
+
+    def test_postgresql(self):
+        env = {
+            'DB_ENGINE': 'postgresql', 'DB_NAME': 'orders', 'DB_HOST': 'db', 'DB_PORT': '6432',
+            'DB_CONN_HEALTH_CHECKS': 'off', 'DB_POOL': 'pgbouncer',
+        }
+        config = database_config(self.BASE_DIR, env)
+        self.assertEqual(
+            (config['NAME'], config['HOST'], config['PORT'], config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']),
+            ('orders', 'db', '6432', 60, False),
+        )
+        self.assertTrue(config['DISABLE_SERVER_SIDE_CURSORS'])
+
+        if django.VERSION >= (5, 1):
+            pooled = database_config(self.BASE_DIR, {**env, 'DB_POOL': 'native', 'DB_POOL_MAX_SIZE': '20'})
+            self.assertEqual(pooled['CONN_MAX_AGE'], 0)
+            self.assertEqual(pooled['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+
+    def test_invalid_values(self):
+        for env in (
+            {'DB_ENGINE': 'mysql'},
+            {'DB_SQLITE_PROFILE': 'fast'},
+            {'DB_SQLITE_PROFILE': 'tuned', 'DB_CONN_MAX_AGE': 'forever'},
+            {'DB_ENGINE': 'postgresql', 'DB_POOL': 'pgpool'},
+            {'DB_ENGINE': 'postgresql', 'DB_CONNECT_TIMEOUT': '5s'},
+        ):
+            with self.subTest(env=env), self.assertRaises(ImproperlyConfigured):
+                database_config(self.BASE_DIR, env)
+
+    def test_replica_configs(self):
+        primary = database_config(self.BASE_DIR, {'DB_ENGINE': 'postgresql', 'DB_HOST': 'primary'})
+        replicas = replica_configs(primary, {'DB_REPLICAS': 'replica-a:6432, replica-b,'})
+        self.assertEqual(list(replicas), ['replica_1', 'replica_2'])
+        self.assertEqual(
+            [(config['HOST'], config['PORT']) for config in replicas.values()],
+            [('replica-a', '6432'), ('replica-b', '5432')],
+        )
+        self.assertEqual(replicas['replica_1']['TEST'], {'MIRROR': 'default'})
+        # Each replica gets its own OPTIONS
+        self.assertIsNot(replicas['replica_1']['OPTIONS'], primary['OPTIONS'])
+        self.assertEqual(replica_configs(primary, {}), {})
+
+        sqlite = replica_configs(database_config(self.BASE_DIR, {}), {'DB_REPLICAS': '/mnt/replica.sqlite3'})
+        self.assertEqual(sqlite['replica_1']['NAME'], '/mnt/replica.sqlite3')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_test'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Reads are routed to a replica only where allowed. The replica is a real
+    alias mirroring the test database, as DB_REPLICAS entries are in test
+    runs, added here so the suite does not depend on the environment.
+    Mirrors only see committed rows, hence TransactionTestCase.
+    """
+    REPLICA = 'replica_test'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Registered once the test databases exist, so it mirrors the test
+        # database, and allowed only then: the runner checks databases first
+        config = {**connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'}}
+        configured = connections.configure_settings({**connections.settings, cls.REPLICA: config})
+        connections.settings[cls.REPLICA] = configured[cls.REPLICA]
+        cls.databases = {*cls.databases, cls.REPLICA}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[cls.REPLICA].close()
+        del connections[cls.REPLICA]
+        del connections.settings[cls.REPLICA]
+        cls.databases = cls.databases - {cls.REPLICA}
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='manager', password='secret', role=User.Role.MANAGER)
+        self.order = Order.objects.create(customer=self.user)
+
+    def read_orders(self):
+        """
+        Reads the orders, returning them and the alias the query went to.
+        """
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[self.REPLICA]) as replica:
+            orders = list(Order.objects.values_list('pk', flat=True))
+        self.assertEqual(len(primary) + len(replica), 1)
+        return orders, self.REPLICA if replica else 'default'
+
+    def read_orders_in_view(self):
+        test = self
+
+        class ReadView(ReplicaReadMixin, APIView):
+            def get(self, request):
+                return Response(test.read_orders())
+
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.user)
+        return ReadView.as_view()(request).data
+
+    def test_reads_use_replica_only_inside_marker(self):
+        self.assertEqual(self.read_orders(), ([self.order.pk], 'default'))
+        with replica_reads():
+            self.assertEqual(self.read_orders(), ([self.order.pk], self.REPLICA))
+            Order.objects.filter(pk=self.order.pk).update(total='5.00')
+            # Read your writes for the rest of the block
+            self.assertEqual(self.read_orders()[1], 'default')
+        with replica_reads():
+            with transaction.atomic():
+                self.assertEqual(self.read_orders()[1], 'default')
+
+    def test_user_sticks_to_primary_after_writing(self):
+        self.assertEqual(self.read_orders_in_view(), ([self.order.pk], self.REPLICA))
+
+        def write(request):
+            request.user = self.user
+            Order.objects.create(customer=self.user)
+            return Response()
+
+        ReplicaStickinessMiddleware(write)(APIRequestFactory().post('/'))
+        self.assertTrue(user_is_sticky(self.user.pk))
+        self.assertEqual(self.read_orders_in_view()[1], 'default')
+
+    def test_cached_leaderboard_is_built_on_primary(self):
+        with replica_reads(), CaptureQueriesContext(connections[self.REPLICA]) as replica:
+            leaderboard.top_customers('7d')
+            leaderboard.top_customers('all')
+        self.assertEqual(len(replica), 0)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class QueryPlanTests(TestCase):
+    """
+    Every statement issued by the order views and the report tasks must be
+    answered from an index. The queries are captured from the real code
+    paths and explained; a full table scan fails the test. On PostgreSQL
+    sequential scans are disabled first, so one only shows up in the plan
+    when no index can serve the query.
+    """
+    # Lookup tables read whole by design (orders.statuses.StatusRegistry)
+    FULL_SCAN_ALLOWED = {OrderStatus._meta.db_table}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='secret', role=User.Role.MANAGER)
+        cls.waiter = User.objects.create_user(username='waiter', password='secret', role=User.Role.WAITER)
+        cls.customer = User.objects.create_user(
+            username='customer', password='secret', role=User.Role.CUSTOMER, email='customer@example.com'
+        )
+        for name in ('pending', 'preparing', 'ready', 'served', 'completed'):
+            OrderStatus.objects.create(name=name)
+        status_registry.invalidate()
+        category = Category.objects.create(name='Mains')
+        cls.dish = dish = Menu.objects.create(name='Curry', description='', price='9.00', category=category)
+
+        serializer = OrderSerializer(data={'items': [{'item': dish.pk, 'quantity': 2}]})
+        serializer.is_valid(raise_exception=True)
+        cls.order = serializer.save(customer=cls.customer, waiter=cls.waiter, status=status_registry.get('pending'))
+        serializer = OrderSerializer(data={'items': [{'item': dish.pk, 'quantity': 1}]})
+        serializer.is_valid(raise_exception=True)
+        completed = serializer.save(customer=cls.customer, status=status_registry.get('completed'))
+        Feedback.objects.create(order=completed, rating=5)
+
+        cls.table = Table.objects.create(number=1, seats=4)
+        book(Reservation(customer=cls.customer, table=cls.table, date=date.today(), time=time(19, 0)))
+        Coupon.objects.create(
+            code='SAVE10', discount_percentage='10.00',
+            valid_from=date.today() - timedelta(days=1), valid_until=date.today() + timedelta(days=1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        status_registry.invalidate()
+        self.addCleanup(status_registry.invalidate)
+
+    def get(self, view, user, actions=None, **params):
+        pk = params.pop('pk', None)
+        self.call(APIRequestFactory().get('/', params), view, user, actions, pk)
+
+    def send(self, method, view, user, actions, data, pk=None):
+        request = getattr(APIRequestFactory(), method)('/', data, format='json')
+        self.call(request, view, user, actions, pk)
+
+    def call(self, request, view, user, actions, pk):
+        force_authenticate(request, user=user)
+        kwargs = {} if pk is None else {'pk': pk}
+        if actions:
+            # Extra actions carry their own permission_classes in .kwargs
+            initkwargs = getattr(getattr(view, next(iter(actions.values()))), 'kwargs', {})
+            view = view.as_view(actions, **initkwargs)
+        else:
+            view = view.as_view()
+        response = view(request, **kwargs)
+        # Streamed rows are only read while the response is consumed
+        for _ in getattr(response, 'streaming_content', ()):
+            pass
+        self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+
+    def exercise_hot_paths(self):
+        today = date.today().isoformat()
+        self.get(OrderViewSet, self.customer, {'get': 'list'})
+        self.get(OrderViewSet, self.manager, {'get': 'list'})
+        self.get(OrderViewSet, self.customer, {'get': 'retrieve'}, pk=self.order.pk)
+        self.get(WaiterOrderViewSet, self.waiter, {'get': 'list'})
+        self.get(ReservationViewSet, self.customer, {'get': 'list'})
+        self.get(ReservationViewSet, self.customer, {'get': 'availability'}, date=today, start='19:30')
+        self.get(CouponViewSet, self.customer, {'get': 'validate'}, code='SAVE10')
+        self.get(FeedbackListAPIView, self.manager)
+        self.get(DashboardAPIView, self.manager)
+        self.get(TopCustomersReportView, self.manager)
+        self.get(TopCustomersReportView, self.manager, window='7d')
+        self.get(SalesAnalyticsView, self.manager)
+        self.get(SalesAnalyticsView, self.manager, source='orders', status='pending')
+        self.get(OrderExportView, self.manager, kind='items', start=today, end=today)
+        self.get(OrderExportView, self.manager, kind='orders', start=today)
+
+        # Writes: nested create and item diff, then the conditional status
+        # UPDATE on pk/status/version and the locked set-based bulk UPDATE
+        items = {'items': [{'item': self.dish.pk, 'quantity': 1}]}
+        self.send('post', OrderViewSet, self.customer, {'post': 'create'}, items)
+        self.send('patch', OrderViewSet, self.customer, {'patch': 'partial_update'}, items, pk=self.order.pk)
+        self.send(
+            'patch', OrderViewSet, self.manager, {'patch': 'update_status'},
+            {'status': 'preparing', 'version': self.order.version}, pk=self.order.pk,
+        )
+        self.send('put', WaiterOrderViewSet, self.waiter, {'put': 'change_status'}, {'status': 'ready'}, pk=self.order.pk)
+        self.send('post', OrderViewSet, self.manager, {'post': 'bulk_status'}, {'ids': [self.order.pk], 'status': 'served'})
+
+        queue_email('Order #1', 'Thanks!', ['customer@example.com'])
+        tasks.generate_daily_report()
+        tasks.send_outbox_emails()
+        tasks.prune_dish_sales_buckets()
+        with mock.patch('builtins.print'):
+            project_tasks.generate_daily_sales_report()
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = [line for line, in cursor.fetchall()]
+                return re.findall(r'Seq Scan on (\w+)', '\n'.join(plan)), plan
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        # "SCAN t USING [COVERING] INDEX i" walks an index; a bare "SCAN t" reads the table
+        return [
+            match.group(1) for match in map(re.compile(r'SCAN (\w+)$').match, plan) if match
+        ], plan
+
+    def test_hot_queries_use_indexes(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.exercise_hot_paths()
+
+        statements = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].lstrip().split(' ', 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE')
+        ]
+        self.assertGreater(len(statements), 20)
+        order_updates = [sql for sql in statements if sql.startswith(f'UPDATE "{Order._meta.db_table}"')]
+        self.assertTrue(order_updates, 'the status writes were not exercised')
+        for sql in statements:
+            tables, plan = self.full_scans(sql)
+            scanned = set(tables) - self.FULL_SCAN_ALLOWED
+            self.assertFalse(scanned, f'Full scan of {", ".join(sorted(scanned))}:\n{sql}\n' + '\n'.join(plan))
+
+    def test_active_orders_use_partial_index(self):
+        queryset = Order.objects.active().order_by('-created_at', '-id')[:50]
+        tables, plan = self.full_scans(str(queryset.query))
+        self.assertFalse(tables, plan)
+        self.assertIn('order_active_idx', '\n'.join(plan))
+
+
+class OrderFeedAuthTests(TestCase):
+    """
+    The WebSocket and SSE feeds only stream to staff who may see every
+    order, and refuse revoked tokens.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.waiter = User.objects.create_user(username='waiter', password='secret', role=User.Role.WAITER)
+        self.customer = User.objects.create_user(username='customer', password='secret', role=User.Role.CUSTOMER)
+
+    def token(self, user):
+        return CustomTokenObtainPairSerializer.get_token(user).access_token
+
+    def run_feed(self, scope):
+        """
+        Runs the feed until it sends an event or refuses the client, and
+        returns the ASGI messages it sent.
+        """
+        broker = get_broker()
+        disconnect = 'websocket.disconnect' if scope['type'] == 'websocket' else 'http.disconnect'
+
+        async def scenario():
+            incoming = asyncio.Queue()
+            sent = []
+            subscribers = broker.subscriber_count
+
+            async def publish_once_subscribed():
+                while broker.subscriber_count == subscribers:
+                    await asyncio.sleep(0.01)
+                broker.publish({'type': 'order.created', 'id': 1})
+
+            async def send(message):
+                sent.append(message)
+                if message['type'] == 'websocket.send' or message.get('more_body'):
+                    await incoming.put({'type': disconnect})
+
+            if scope['type'] == 'websocket':
+                await incoming.put({'type': 'websocket.connect'})
+            publisher = asyncio.ensure_future(publish_once_subscribed())
+            try:
+                await asyncio.wait_for(order_feed_application(scope, incoming.get, send), timeout=5)
+            finally:
+                publisher.cancel()
+            return sent
+
+        return asyncio.run(scenario())
+
+    def websocket(self, token):
+        return self.run_feed({
+            'type': 'websocket', 'path': WEBSOCKET_PATH, 'headers': [],
+            'subprotocols': ['bearer', str(token)],
+        })
+
+    def sse(self, token):
+        return self.run_feed({
+            'type': 'http', 'path': SSE_PATH, 'method': 'GET',
+            'headers': [(b'authorization', f'Bearer {token}'.encode())],
+        })
+
+    def test_staff_receive_events(self):
+        token = self.token(self.waiter)
+        sent = self.websocket(token)
+        self.assertEqual(sent[0], {'type': 'websocket.accept', 'subprotocol': 'bearer'})
+        self.assertIn('"order.created"', sent[1]['text'])
+
+        sent = self.sse(token)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertTrue(sent[1]['body'].startswith(b'data: {"type": "order.created"'))
+
+    def test_customer_is_rejected(self):
+        token = self.token(self.customer)
+        self.assertEqual(self.websocket(token), [{'type': 'websocket.close', 'code': 4401}])
+        self.assertEqual(self.sse(token)[0]['status'], 401)
+
+    def test_revoked_token_is_rejected(self):
+        token = self.token(self.waiter)
+        revoke_token(token)
+        self.assertEqual(self.websocket(token), [{'type': 'websocket.close', 'code': 4401}])
+        self.assertEqual(self.sse(token)[0]['status'], 401)
+
+    def test_token_in_query_string_is_ignored(self):
+        sent = self.run_feed({
+            'type': 'http', 'path': SSE_PATH, 'method': 'GET', 'headers': [],
+            'query_string': f'token={self.token(self.waiter)}'.encode(),
+        })
+        self.assertEqual(sent[0]['status'], 401)
@@ -8,7 +8,9 @@ from .views import (
     TopCustomersReportView,
     CouponViewSet,
     FeedbackCreateAPIView,
-    DashboardAPIView
+    DashboardAPIView,
+    OrderExportView,
+    SalesAnalyticsView
 )
 
 # Create a router instance to handle ViewSets
@@ -32,4 +34,8 @@ urlpatterns = [
     path('feedback/', FeedbackCreateAPIView.as_view(), name='feedback-create'),
     # Path for the manager dashboard
     path('reports/dashboard/', DashboardAPIView.as_view(), name='dashboard-report'),
+    # Streaming order history export for accounting
+    path('reports/export/', OrderExportView.as_view(), name='order-export'),
+    # Time-bucketed sales figures for a date range
+    path('reports/sales/', SalesAnalyticsView.as_view(), name='sales-analytics'),
 ]
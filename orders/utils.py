@@ -1,63 +1,138 @@
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
 import logging
+import secrets
+import string
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+def generate_coupon_code(length=10):
+    """
+    Generates a random, unused coupon code of uppercase letters and digits.
+
+    Args:
+        length (int): The number of characters in the code.
+    """
+    # Imported here because the models import this module
+    from .models import Coupon
+    alphabet = string.ascii_uppercase + string.digits
+    while True:
+        code = ''.join(secrets.choice(alphabet) for _ in range(length))
+        if not Coupon.objects.filter(code=code).exists():
+            return code
+
 def send_email(subject, message, recipient_list):
     """
-    Sends a general email using Django's send_mail function.
+    Queues a general email in the outbox for asynchronous delivery.
+    The email is only sent if the surrounding transaction commits.
 
     Args:
         subject (str): The subject of the email.
         message (str): The body of the email.
         recipient_list (list): A list of recipient email addresses.
     """
-    from_email = settings.DEFAULT_FROM_EMAIL
+    # Imported here because the outbox depends on the models, which import this module
+    from .outbox import queue_email
     try:
-        send_mail(
-            subject,
-            message,
-            from_email,
-            recipient_list,
-            fail_silently=False,
-        )
-        logger.info(f"Email sent successfully with subject: '{subject}' to {recipient_list}")
+        queue_email(subject, message, recipient_list)
+        logger.info(f"Email queued with subject: '{subject}' to {recipient_list}")
         return True
     except Exception as e:
-        logger.error(f"Failed to send email with subject: '{subject}'. Error: {e}")
+        logger.error(f"Failed to queue email with subject: '{subject}'. Error: {e}")
         return False
 
+def increment_or_create(model, lookup, **deltas):
+    """
+    Adds deltas to the counters of the row matching lookup with a single
+    UPDATE ... SET field = field + delta, creating the row if it is missing.
+
+    Args:
+        model: The model class holding the counters.
+        lookup (dict): Field values identifying the row (must be unique).
+        **deltas: Amounts to add, keyed by field name.
+    """
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another writer created the row first; apply on top of theirs
+        model.objects.filter(**lookup).update(**changes)
+
+def bulk_increment_or_create(model, lookup, key, deltas_by_key):
+    """
+    Applies increment_or_create to many rows sharing lookup at once, using
+    one locking SELECT, one bulk UPDATE and one bulk INSERT regardless of the
+    number of rows. Must be called inside a transaction.
+
+    Args:
+        model: The model class holding the counters.
+        lookup (dict): Field values shared by every row.
+        key (str): The field that, together with lookup, identifies a row.
+        deltas_by_key (dict): {key value: {field: amount to add}}.
+    """
+    if not deltas_by_key:
+        return
+    existing = {
+        getattr(obj, key): obj
+        for obj in model.objects.select_for_update().filter(**lookup, **{f'{key}__in': list(deltas_by_key)})
+    }
+    to_update, to_create, fields = [], [], set()
+    for value, deltas in deltas_by_key.items():
+        obj = existing.get(value)
+        if obj is None:
+            to_create.append(model(**lookup, **{key: value}, **deltas))
+            continue
+        for field, amount in deltas.items():
+            setattr(obj, field, getattr(obj, field) + amount)
+            fields.add(field)
+        to_update.append(obj)
+
+    if to_update:
+        model.objects.bulk_update(to_update, sorted(fields))
+    if to_create:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(to_create)
+        except IntegrityError:
+            # Lost a race creating some of the rows; fall back to one at a time
+            for obj in to_create:
+                value = getattr(obj, key)
+                increment_or_create(model, {**lookup, key: value}, **deltas_by_key[value])
+
 def send_order_confirmation_email(order):
     """
-    Sends an order confirmation email to the customer using the generic send_email function.
-    It now uses the unique 'order_id' instead of the internal database 'id'.
+    Queues an order confirmation email to the customer using the generic send_email function.
 
     Args:
         order: The Order object to be confirmed.
     """
-    # Use order.order_id (the unique, short alphanumeric ID)
-    subject = f'Order Confirmation: #{order.order_id}'
+    if not order.customer.email:
+        return False
+
+    subject = f'Order Confirmation: #{order.id}'
     message = f"""
-    Hello {order.customer_name},
+    Hello {order.customer.get_full_name() or order.customer.username},
 
     Thank you for your order!
 
     Order Details:
     --------------------
-    Order ID: {order.order_id}
-    Total Amount: ${order.total_price}
+    Order ID: {order.id}
+    Total Amount: ${order.total}
     Status: {order.status}
 
     Items:
-    {", ".join([item.product.name for item in order.order_items.all()])}
+    {", ".join([order_item.item.name for order_item in order.items.select_related('item')])}
     
     We will notify you when your order is ready.
 
     Sincerely,
     The Restaurant Management Team
     """
-    recipient_list = [order.customer_email]
+    recipient_list = [order.customer.email]
 
     return send_email(subject, message, recipient_list)
@@ -1,10 +1,14 @@
-from rest_framework import viewsets, mixins, status, generics, permissions
+import datetime
+from decimal import Decimal
+
+from rest_framework import viewsets, mixins, status, generics
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.views import APIView
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum, F, Count
+from django.db import transaction
 from django.utils import timezone
 from .models import Order, OrderItem, OrderStatus, Restaurant, Coupon, Reservation, Feedback
 from .serializers import (
@@ -14,76 +18,152 @@ from .serializers import (
     ReservationSerializer,
     FeedbackSerializer
 )
+from .analytics import GRANULARITIES, MAX_HOURLY_DAYS, sales_series
+from .coupons import CouponError, redeem_coupon, validate_coupon
+from . import exports
+from .feed import publish_bulk_status_event, publish_order_event
+from .pagination import KeysetPagination
+from .leaderboard import WINDOWS, top_customers
+from .reservations import TableUnavailable, free_tables
+from .rollups import daily_summary
+from .statuses import (
+    InvalidTransition,
+    TransitionConflict,
+    bulk_transition,
+    registry as status_registry,
+    transition,
+)
 from .utils import generate_coupon_code
-from account.permissions import IsWaiter, IsCashier, IsManagerOrAdmin, IsChef
+from account.permissions import CanUpdateOrderStatus, IsCustomer, IsManagerOrAdmin, IsWaiter
+from account.roles import Capability, has_capability
+from restaurant_management.replicas import ReplicaReadMixin
 
 
-# Custom permission for customers
-class IsCustomer(permissions.BasePermission):
+def _transition_response(view, order, data, error_key='detail'):
     """
-    Custom permission to only allow customer users access.
+    Applies the status change requested in data to order and builds the
+    response: 400 for an unknown status or a move the transition graph does
+    not allow, 409 if the order changed concurrently. An optional 'version'
+    in data makes the change conditional on the version the client saw.
     """
-    def has_permission(self, request, view):
-        return request.user and request.user.role == 'customer'
+    new_status_name = data.get('status')
+    if not new_status_name:
+        return Response({error_key: 'Status is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        status_obj = status_registry.get(new_status_name)
+    except OrderStatus.DoesNotExist:
+        return Response({error_key: 'Invalid status provided.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    expected_version = data.get('version')
+    if expected_version is not None:
+        try:
+            expected_version = int(expected_version)
+        except (TypeError, ValueError):
+            return Response({error_key: 'Version must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        transition(order, status_obj, expected_version)
+    except InvalidTransition as exc:
+        return Response({error_key: str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    except TransitionConflict as exc:
+        current = status_registry.by_id(order.status_id)
+        return Response(
+            {
+                error_key: str(exc),
+                'status': current.name if current else None,
+                'version': order.version,
+            },
+            status=status.HTTP_409_CONFLICT
+        )
+
+    publish_order_event(order, 'order.status')
+    return Response(view.get_serializer(order).data, status=status.HTTP_200_OK)
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     A viewset for handling orders, including their nested items.
     It allows for creation, retrieval, updating, and deletion of orders.
+    Listing and retrieval read from a replica when one is configured.
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    # Largest batch accepted by bulk_status
+    BULK_STATUS_LIMIT = 200
 
     def get_queryset(self):
         """
         Overrides the default queryset to filter orders by the current user.
         Staff can see all orders, customers can only see their own.
         """
-        if self.request.user.role in ['admin', 'manager', 'waiter', 'cashier', 'chef']:
-            return Order.objects.all()
-        return Order.objects.filter(customer=self.request.user)
+        orders = Order.objects.for_listing()
+        if has_capability(self.request, Capability.VIEW_ALL_ORDERS):
+            return orders
+        return orders.filter(customer_id=self.request.user.pk)
 
     def perform_create(self, serializer):
         """
         Auto-assigns the current user as the customer for a new order.
         Sets the initial status to 'pending'.
         """
-        pending_status = OrderStatus.objects.get(name='pending')
-        serializer.save(customer=self.request.user, status=pending_status)
-    
-    @action(detail=True, methods=['patch'])
+        pending_status = status_registry.get('pending')
+        order = serializer.save(customer_id=self.request.user.pk, status=pending_status)
+        publish_order_event(order, 'order.created')
+
+    @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated, CanUpdateOrderStatus])
     def update_status(self, request, pk=None):
         """
         Action to update the status of an order.
         This endpoint is only for staff members.
         """
-        if self.request.user.role not in ['admin', 'manager', 'waiter', 'chef']:
+        order = get_object_or_404(Order, pk=pk)
+        return _transition_response(self, order, request.data)
+
+    @action(
+        detail=False, methods=['post'], url_path='bulk-status',
+        permission_classes=[IsAuthenticated, CanUpdateOrderStatus],
+    )
+    def bulk_status(self, request):
+        """
+        Moves a list of orders to one status in a single transaction, e.g.
+        {"ids": [12, 13, 14], "status": "ready"} from the expo station.
+        Returns a result per id and publishes one feed event for the batch.
+        This endpoint is only for staff members.
+        """
+        ids = request.data.get('ids')
+        if (not isinstance(ids, list) or not ids
+                or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids)):
             return Response(
-                {'detail': 'You do not have permission to perform this action.'},
-                status=status.HTTP_403_FORBIDDEN
+                {'detail': 'ids must be a non-empty list of order ids.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-        order = get_object_or_404(Order, pk=pk)
-        new_status_name = request.data.get('status')
-        if not new_status_name:
+        if len(ids) > self.BULK_STATUS_LIMIT:
             return Response(
-                {'detail': 'Status is required.'},
+                {'detail': f'At most {self.BULK_STATUS_LIMIT} orders can be updated at once.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
+
         try:
-            status_obj = OrderStatus.objects.get(name__iexact=new_status_name)
-            order.status = status_obj
-            order.save()
-            return Response(self.get_serializer(order).data)
+            status_obj = status_registry.get(request.data.get('status') or '')
         except OrderStatus.DoesNotExist:
             return Response(
                 {'detail': 'Invalid status provided.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        with transaction.atomic():
+            results = bulk_transition(ids, status_obj)
+            publish_bulk_status_event(
+                [pk for pk, result in results.items() if result == 'updated'], status_obj
+            )
+        return Response({
+            'status': status_obj.name,
+            'results': [{'id': pk, 'result': result} for pk, result in results.items()],
+        }, status=status.HTTP_200_OK)
+
 class OrderItemViewSet(mixins.DestroyModelMixin, viewsets.GenericViewSet):
     """
     A viewset for managing order items.
@@ -100,11 +180,12 @@ class OrderItemViewSet(mixins.DestroyModelMixin, viewsets.GenericViewSet):
         """
         try:
             instance = self.get_object()
-            if instance.order.customer != request.user:
+            if instance.order.customer_id != request.user.pk:
                 return Response(
                     {'detail': 'You do not have permission to delete this item.'},
                     status=status.HTTP_403_FORBIDDEN
                 )
+            # orders.signals takes the item off the order total and the rollups
             self.perform_destroy(instance)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception:
@@ -113,28 +194,82 @@ class OrderItemViewSet(mixins.DestroyModelMixin, viewsets.GenericViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     A viewset for handling reservations.
+    Listing and availability read from a replica when one is configured;
+    bookings are still checked against the primary when created.
     """
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """
         Overrides the default queryset to filter reservations by the current user.
         Staff can see all reservations, customers can only see their own.
         """
-        if self.request.user.role in ['admin', 'manager', 'waiter', 'cashier']:
-            return Reservation.objects.all()
-        return Reservation.objects.filter(customer=self.request.user)
+        reservations = Reservation.objects.select_related('table')
+        if has_capability(self.request, Capability.VIEW_ALL_RESERVATIONS):
+            return reservations
+        return reservations.filter(customer_id=self.request.user.pk)
     
     def perform_create(self, serializer):
         """
         Auto-assigns the current user as the customer for a new reservation.
         """
-        serializer.save(customer=self.request.user)
+        serializer.save(customer_id=self.request.user.pk)
+
+    def handle_exception(self, exc):
+        # Raised by the serializer when the slots are already taken
+        if isinstance(exc, TableUnavailable):
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return super().handle_exception(exc)
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """
+        Lists the tables free for a whole time window, e.g.
+        ?date=2024-05-17&start=19:00&end=21:00&party_size=4.
+        Instead of end, duration (minutes, default 90) may be given.
+        """
+        try:
+            date = datetime.date.fromisoformat(request.query_params['date'])
+            start = datetime.time.fromisoformat(request.query_params['start'])
+            end = request.query_params.get('end')
+            if end:
+                end = datetime.time.fromisoformat(end)
+            else:
+                duration = datetime.timedelta(minutes=int(request.query_params.get('duration', 90)))
+                end_at = datetime.datetime.combine(date, start) + duration
+                # None means the rest of the day
+                end = end_at.time() if end_at.date() == date else None
+            party_size = int(request.query_params.get('party_size', 1))
+        except KeyError:
+            return Response(
+                {'detail': 'date and start are required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ValueError:
+            return Response(
+                {'detail': 'Use YYYY-MM-DD for date, HH:MM for start and end and a number for party_size.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if end is not None and end <= start:
+            return Response(
+                {'detail': 'end must be after start.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        tables = free_tables(date, start, end, party_size).values('number', 'seats')
+        return Response({
+            'date': date,
+            'start': start,
+            'end': end,
+            'party_size': party_size,
+            'tables': list(tables),
+        }, status=status.HTTP_200_OK)
 
 class CouponViewSet(viewsets.ModelViewSet):
     """
@@ -152,56 +287,91 @@ class CouponViewSet(viewsets.ModelViewSet):
         coupon_code = generate_coupon_code()
         serializer.save(code=coupon_code)
 
-class TopCustomersReportView(generics.ListAPIView):
+    def _coupon_response(self, coupon):
+        return {
+            'code': coupon.code,
+            'discount_percentage': coupon.discount_percentage,
+            'valid_until': coupon.valid_until,
+        }
+
+    @action(detail=False, methods=['get', 'post'], permission_classes=[IsAuthenticated])
+    def validate(self, request):
+        """
+        Checks whether a coupon code can currently be used.
+        Accepts the code as ?code= or in the request body.
+        """
+        code = request.query_params.get('code') or request.data.get('code')
+        if not isinstance(code, str) or not code.strip():
+            return Response({'detail': 'Code is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            coupon = validate_coupon(code)
+        except CouponError as e:
+            return Response({'valid': False, 'reason': e.reason, 'detail': str(e)}, status=status.HTTP_200_OK)
+        return Response({'valid': True, **self._coupon_response(coupon)})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def redeem(self, request):
+        """
+        Consumes one use of a coupon. Returns 409 if it is used up.
+        """
+        code = request.data.get('code')
+        if not isinstance(code, str) or not code.strip():
+            return Response({'detail': 'Code is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            coupon = redeem_coupon(code)
+        except CouponError as e:
+            status_code = status.HTTP_409_CONFLICT if e.reason == 'exhausted' else status.HTTP_400_BAD_REQUEST
+            return Response({'reason': e.reason, 'detail': str(e)}, status=status_code)
+        return Response(self._coupon_response(coupon))
+
+class TopCustomersReportView(ReplicaReadMixin, generics.ListAPIView):
     """
     API view to get a report of the top 5 customers based on their total spending.
+    Accepts ?window=7d|30d|365d|all (default all) and ?limit=N.
     Accessible only by managers and admins.
     """
     permission_classes = [IsAuthenticated, IsManagerOrAdmin]
 
-    def get_queryset(self):
-        # Calculate the total spent by each customer by summing up the costs of their order items.
-        # F() is used to reference model fields directly in the database query.
-        return Order.objects.values('customer__username').annotate(
-            total_spent=Sum(F('items__quantity') * F('items__item__price'))
-        ).order_by('-total_spent')[:5]
-
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        window = request.query_params.get('window', 'all')
+        if window not in WINDOWS:
+            return Response(
+                {'detail': f"window must be one of: {', '.join(WINDOWS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = max(1, int(request.query_params.get('limit', 5)))
+        except ValueError:
+            return Response({'detail': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Served from the precomputed leaderboard rather than aggregating every order
         formatted_customers = [
-            {'name': customer['customer__username'], 'total_spent': customer['total_spent']}
-            for customer in queryset
+            {'name': customer['name'], 'total_spent': customer['total_spent']}
+            for customer in top_customers(window, limit)
         ]
         return Response({'customers': formatted_customers}, status=status.HTTP_200_OK)
 
-class WaiterOrderViewSet(viewsets.ModelViewSet):
+class WaiterOrderViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     A ViewSet for waiters to manage orders.
+    Listing and retrieval read from a replica when one is configured.
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated, IsWaiter]
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
-        serializer.save(waiter=self.request.user)
+        order = serializer.save(waiter_id=self.request.user.pk)
+        publish_order_event(order, 'order.created')
 
     def get_queryset(self):
-        return self.queryset.filter(waiter=self.request.user)
+        return Order.objects.for_listing().filter(waiter_id=self.request.user.pk)
 
     @action(detail=True, methods=['put'])
     def change_status(self, request, pk=None):
         order = self.get_object()
-        new_status = request.data.get('status')
-        # Here we are using a simplified check for the status
-        # In a real app, you would want a more robust check, perhaps from a list of valid statuses
-        if not new_status:
-            return Response({'error': 'Invalid status provided.'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        order.status = OrderStatus.objects.get(name=new_status)
-        order.save()
-        
-        serializer = self.get_serializer(order)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return _transition_response(self, order, request.data, error_key='error')
 
 class FeedbackCreateAPIView(generics.CreateAPIView):
     """
@@ -216,7 +386,7 @@ class FeedbackCreateAPIView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         # Assuming the user submitting the feedback is the customer
         order = serializer.validated_data['order']
-        if order.customer != request.user:
+        if order.customer_id != request.user.pk:
             return Response(
                 {"detail": "You can only leave feedback for orders you placed."},
                 status=status.HTTP_403_FORBIDDEN
@@ -229,47 +399,130 @@ class FeedbackCreateAPIView(generics.CreateAPIView):
             headers=headers
         )
 
-class FeedbackListAPIView(generics.ListAPIView):
+class FeedbackListAPIView(ReplicaReadMixin, generics.ListAPIView):
     """
     API endpoint for managers and admins to list all feedback.
     """
     queryset = Feedback.objects.all()
     serializer_class = FeedbackSerializer
     permission_classes = [IsAuthenticated, IsManagerOrAdmin]
+    pagination_class = KeysetPagination
 
 
-class DashboardAPIView(APIView):
+class DashboardAPIView(ReplicaReadMixin, APIView):
     """
     API endpoint to provide key dashboard metrics for managers.
     """
     permission_classes = [IsAuthenticated, IsManagerOrAdmin]
 
     def get(self, request, *args, **kwargs):
-        # Calculate the start and end of the current day
-        today = timezone.now().date()
-        start_of_day = timezone.make_aware(timezone.datetime.combine(today, timezone.datetime.min.time()))
-        end_of_day = timezone.make_aware(timezone.datetime.combine(today, timezone.datetime.max().time()))
-
-        # Get orders for the current day
-        daily_orders = Order.objects.filter(created_at__range=(start_of_day, end_of_day))
-
-        # Calculate total orders and total revenue
-        total_orders = daily_orders.count()
-        total_revenue = daily_orders.aggregate(Sum('total_price'))['total_price__sum'] or 0
-
-        # Find the top-selling dish of the day
-        top_dish = None
-        top_selling_item = Menu.objects.annotate(
-            total_sold=Count('orderitem')
-        ).order_by('-total_sold').first()
-        
-        if top_selling_item:
-            top_dish = top_selling_item.name
-        
+        # Today's figures come straight from the incrementally maintained rollups
+        summary = daily_summary(timezone.localdate())
+
         # Prepare the response data
         response_data = {
-            'total_orders': total_orders,
-            'revenue': total_revenue,
-            'top_dish': top_dish
+            'total_orders': summary['total_orders'],
+            'revenue': summary['total_sales'],
+            'top_dish': summary['top_item']
         }
         return Response(response_data)
+
+class OrderExportView(ReplicaReadMixin, APIView):
+    """
+    Streams the order history for accounting, e.g.
+    ?kind=items&output=csv&start=2024-01-01&end=2024-03-31.
+    kind is 'orders' or 'items' (one row per order line, the default).
+    output is 'csv', 'ndjson' or 'parquet-csv'. start and end are inclusive
+    dates and both optional.
+    """
+    permission_classes = [IsAuthenticated, IsManagerOrAdmin]
+
+    def get(self, request, *args, **kwargs):
+        kind = request.query_params.get('kind', 'items')
+        fmt = request.query_params.get('output', 'csv')
+        if kind not in exports.COLUMNS or fmt not in exports.FORMATS:
+            return Response(
+                {'detail': f"kind must be one of {', '.join(exports.COLUMNS)} and output one of {', '.join(exports.FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start, end = (
+                datetime.date.fromisoformat(request.query_params[name]) if request.query_params.get(name) else None
+                for name in ('start', 'end')
+            )
+        except ValueError:
+            return Response(
+                {'detail': 'start and end must be dates in YYYY-MM-DD format.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        header, rows = exports.export_rows(kind, start, end)
+        response = StreamingHttpResponse(exports.render(fmt, header, rows), content_type=exports.FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{exports.filename(kind, fmt, start, end)}"'
+        return response
+
+class SalesAnalyticsView(ReplicaReadMixin, APIView):
+    """
+    Revenue, order count and average ticket per period for managers, e.g.
+    ?start=2024-01-01&end=2024-12-31&granularity=month.
+    granularity is hour, day (the default), week or month. The range
+    defaults to the last 30 days. ?status= limits the figures to orders in
+    one status, and ?source=orders skips the daily rollups.
+    """
+    permission_classes = [IsAuthenticated, IsManagerOrAdmin]
+
+    def get(self, request, *args, **kwargs):
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return Response(
+                {'detail': f"granularity must be one of {', '.join(GRANULARITIES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            end = request.query_params.get('end')
+            end = datetime.date.fromisoformat(end) if end else timezone.localdate()
+            start = request.query_params.get('start')
+            start = datetime.date.fromisoformat(start) if start else end - datetime.timedelta(days=29)
+        except ValueError:
+            return Response(
+                {'detail': 'start and end must be dates in YYYY-MM-DD format.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start > end:
+            return Response(
+                {'detail': 'start must not be after end.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if granularity == 'hour' and (end - start).days >= MAX_HOURLY_DAYS:
+            return Response(
+                {'detail': f'Hourly figures are limited to {MAX_HOURLY_DAYS} days.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        status_obj = None
+        if request.query_params.get('status'):
+            try:
+                status_obj = status_registry.get(request.query_params['status'])
+            except OrderStatus.DoesNotExist:
+                return Response(
+                    {'detail': 'Invalid status provided.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        buckets = sales_series(
+            start, end, granularity, status=status_obj,
+            use_rollups=request.query_params.get('source') != 'orders',
+        )
+        total_orders = sum(bucket['orders'] for bucket in buckets)
+        total_revenue = sum((bucket['revenue'] for bucket in buckets), Decimal('0.00'))
+        return Response({
+            'start': start,
+            'end': end,
+            'granularity': granularity,
+            'buckets': buckets,
+            'totals': {
+                'orders': total_orders,
+                'revenue': total_revenue,
+                'average_ticket': (total_revenue / total_orders).quantize(Decimal('0.01')) if total_orders else Decimal('0.00'),
+            },
+        }, status=status.HTTP_200_OK)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        # Keeps the menu cache, ETag version and search index in sync with writes
+        from . import search, signals  # noqa: F401
+
+        post_migrate.connect(search.create_search_index, sender=self, dispatch_uid='products.search.create_search_index')
@@ -0,0 +1,178 @@
+"""
+Generational, tag-based cache for serialized menu payloads.
+
+Every entry is stored together with the generation of each tag it depends on
+('menu' for anything spanning all dishes, 'menu:cat:<id>' for a single
+category). Invalidating a tag is a single counter bump, after which every
+entry carrying the old generation is treated as out of date, without having
+to find or delete the keys themselves.
+
+Rebuilds are single-flight: one worker takes a short lock and recomputes,
+while concurrent requests keep serving the previous payload (stale while
+revalidate) instead of all hitting the database at once.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# How long an entry is served without recomputing, and how long it is kept
+# around afterwards as a stale fallback while a single worker rebuilds it.
+MENU_CACHE_FRESH_FOR = 600
+MENU_CACHE_TIMEOUT = 3600
+# Upper bound on a rebuild; after this another worker may take over.
+MENU_CACHE_LOCK_TIMEOUT = 30
+# How long a request without a stale copy waits for another worker's rebuild.
+MENU_CACHE_WAIT = 2.0
+MENU_CACHE_POLL_INTERVAL = 0.05
+
+ALL_MENU_TAG = 'menu'
+MENU_VERSION_KEY = 'menu:version'
+
+
+def category_tag(category_id):
+    return f'menu:cat:{category_id}'
+
+
+class MenuCache:
+    """
+    Cache layer used by the menu views. Results are returned together with
+    how they were served: 'hit', 'stale' or 'miss'.
+    """
+
+    def __init__(self, backend=cache):
+        self.backend = backend
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def make_key(self, scope, params=()):
+        """
+        Builds a cache key for a scope (e.g. 'list', 'item:5') and any query
+        parameters that change the payload.
+        """
+        digest = hashlib.md5(repr(sorted(params)).encode('utf-8')).hexdigest()
+        return f'menu:data:{scope}:{digest}'
+
+    def generations(self, tags):
+        """
+        Returns the current generation of each tag, seeding missing ones.
+        Seeds are time based so an evicted counter never restarts at a value
+        an old entry might still carry.
+        """
+        keys = {tag: f'gen:{tag}' for tag in tags}
+        current = self.backend.get_many(keys.values())
+        generations = {}
+        for tag, key in keys.items():
+            if key not in current:
+                self.backend.add(key, time.time_ns(), timeout=None)
+                current[key] = self.backend.get(key)
+            generations[tag] = current[key]
+        return generations
+
+    def invalidate(self, category_ids=()):
+        """
+        Marks everything cached for the given categories, and every
+        cross-category payload, as out of date.
+        """
+        tags = [ALL_MENU_TAG] + [category_tag(pk) for pk in set(category_ids) if pk is not None]
+        for tag in tags:
+            key = f'gen:{tag}'
+            try:
+                self.backend.incr(key)
+            except ValueError:
+                self.backend.add(key, time.time_ns(), timeout=None)
+
+    def get_or_compute(self, key, tags, compute):
+        """
+        Returns (value, state) for key, computing it with compute() when the
+        entry is missing, expired or tagged with an outdated generation.
+        """
+        entry = self.backend.get(key)
+        generations = self.generations(tags)
+
+        if entry is not None and entry['tags'] == generations and time.time() < entry['fresh_until']:
+            return self._record(entry['value'], 'hit')
+
+        lock_key = f'{key}:lock'
+        if self.backend.add(lock_key, 1, timeout=MENU_CACHE_LOCK_TIMEOUT):
+            try:
+                return self._record(self._compute(key, generations, compute), 'miss')
+            finally:
+                self.backend.delete(lock_key)
+
+        # Someone else is rebuilding this entry
+        if entry is not None:
+            return self._record(entry['value'], 'stale')
+
+        deadline = time.monotonic() + MENU_CACHE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(MENU_CACHE_POLL_INTERVAL)
+            entry = self.backend.get(key)
+            if entry is not None and entry['tags'] == generations:
+                return self._record(entry['value'], 'hit')
+
+        # The rebuild is taking too long; compute locally rather than fail
+        return self._record(self._compute(key, generations, compute), 'miss')
+
+    def stats(self):
+        """
+        Returns hit/stale/miss counters for this process.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = sum(stats.values())
+        stats['hit_ratio'] = (stats.get('hit', 0) + stats.get('stale', 0)) / lookups if lookups else 0.0
+        return stats
+
+    def _compute(self, key, generations, compute):
+        value = compute()
+        self.backend.set(
+            key,
+            {'value': value, 'tags': generations, 'fresh_until': time.time() + MENU_CACHE_FRESH_FOR},
+            timeout=MENU_CACHE_TIMEOUT,
+        )
+        return value
+
+    def _record(self, value, state):
+        with self._stats_lock:
+            self._stats[state] += 1
+        logger.debug('Menu cache %s', state)
+        return value, state
+
+
+menu_cache = MenuCache()
+
+
+def menu_version():
+    """
+    Returns the menu version, which changes on every write to a dish or a
+    category. Seeded from the clock so a lost counter never repeats a value.
+    """
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        cache.add(MENU_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version():
+    try:
+        cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        cache.add(MENU_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def menu_etag(request, *args, **kwargs):
+    """
+    etag_func for django.views.decorators.http.condition. Combines the menu
+    version with the requested URL and Accept header, so matching requests
+    can be answered with a 304 from the cache alone.
+    """
+    representation = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    digest = hashlib.md5(representation.encode('utf-8')).hexdigest()[:16]
+    return f'menu-{menu_version()}-{digest}'
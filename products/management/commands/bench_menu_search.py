@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.cache import bump_menu_version
+from products.models import Category, Menu
+from products.search import get_backend
+from restaurant_management.bench import rolled_back
+
+
+WORDS = (
+    'chicken paneer lamb prawn tofu mushroom spinach potato lentil chickpea rice naan '
+    'tikka masala korma vindaloo biryani tandoori curry butter garlic ginger coconut '
+    'mango lime chilli smoky creamy crispy roasted grilled spiced sweet tangy fresh'
+).split()
+# Less common words so that each dish shares only a few terms with the rest
+SYLLABLES = ('ka', 'lo', 'mi', 'ra', 'shi', 'to', 'vu', 'ne', 'pa', 'dri', 'gho', 'zen')
+FILLER = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+CATEGORIES = ('Starters', 'Mains', 'Breads', 'Rice', 'Sides', 'Desserts', 'Drinks', 'Specials')
+QUERIES = {
+    'word': ['chicken', 'paneer tikka', 'garlic naan', 'mango'],
+    'prefix': ['chick', 'tand', 'bir', 'cocon'],
+    'typo': ['chiken', 'biriyani', 'tandori', 'vindalo'],
+}
+
+
+class Command(BaseCommand):
+    """
+    Indexes --dishes generated dishes and reports search latency for plain,
+    prefix and misspelt queries, including the facet counts. The generated
+    rows and index entries are rolled back afterwards.
+    """
+    help = 'Benchmark menu full-text search latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dishes', type=int, default=50_000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError('Menu search is not available on this database.')
+        with rolled_back():
+            self._run(backend, options)
+        # The vocabulary cached during the run no longer matches the index
+        bump_menu_version()
+
+    def _run(self, backend, options):
+        random.seed(18)
+        categories = Category.objects.bulk_create(Category(name=name) for name in CATEGORIES)
+        Menu.objects.bulk_create(
+            (
+                Menu(
+                    name=' '.join([random.choice(WORDS), *random.sample(FILLER, 2)]).title(),
+                    description=' '.join([*random.sample(WORDS, 2), *random.choices(FILLER, k=10)]),
+                    price='9.50',
+                    category=random.choice(categories),
+                )
+                for _ in range(options['dishes'])
+            ),
+            batch_size=5000,
+        )
+        started = time.perf_counter()
+        backend.rebuild()
+        self.stdout.write(f"Indexed {options['dishes']} dishes in {time.perf_counter() - started:.2f}s")
+        bump_menu_version()
+
+        self.stdout.write(f"{'queries':<8} {'p50 ms':>8} {'p95 ms':>8} {'avg hits':>9}")
+        for label, queries in QUERIES.items():
+            timings, hits = [], []
+            for i in range(options['repeat']):
+                query = queries[i % len(queries)]
+                start = time.perf_counter()
+                found = backend.search(query, limit=20)
+                timings.append((time.perf_counter() - start) * 1000)
+                hits.append(found['total'])
+            timings.sort()
+            self.stdout.write(
+                f'{label:<8} {statistics.median(timings):8.2f} '
+                f'{timings[int(len(timings) * 0.95) - 1]:8.2f} {statistics.mean(hits):9.0f}'
+            )
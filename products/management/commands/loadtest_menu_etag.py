@@ -0,0 +1,76 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from products.cache import bump_menu_version
+from products.models import Category, Menu
+from products.views import MenuViewSet
+from restaurant_management.bench import rolled_back
+
+
+class Command(BaseCommand):
+    """
+    Simulates clients polling the menu list with If-None-Match. The menu
+    version is bumped every --change-every requests to mimic menu edits.
+    Reports requests/sec overall, the share answered with 304 and the number
+    of queries those 304s issued. Fixture rows are rolled back afterwards.
+    """
+    help = 'Load test conditional GETs against MenuViewSet.list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--dishes', type=int, default=300)
+        parser.add_argument('--change-every', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self._run(options)
+
+    def _run(self, options):
+        User = get_user_model()
+        manager = User.objects.create_user(username='bench-etag', password='bench', role=User.Role.MANAGER)
+        category = Category.objects.create(name='Bench')
+        Menu.objects.bulk_create(
+            Menu(name=f'Dish {i}', description='Bench dish', price='12.00', category=category)
+            for i in range(options['dishes'])
+        )
+        view = MenuViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+
+        etag = None
+        counts = {200: 0, 304: 0}
+        elapsed = {200: 0.0, 304: 0.0}
+        not_modified_queries = 0
+        for i in range(options['requests']):
+            if i and i % options['change_every'] == 0:
+                bump_menu_version()
+
+            headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+            request = factory.get('/api/products/', **headers)
+            force_authenticate(request, user=manager)
+
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = view(request)
+                if hasattr(response, 'render'):
+                    response.render()
+                took = time.perf_counter() - start
+
+            counts[response.status_code] += 1
+            elapsed[response.status_code] += took
+            if response.status_code == 304:
+                not_modified_queries += len(queries)
+            etag = response.get('ETag', etag)
+
+        total = sum(counts.values())
+        self.stdout.write(f'requests:        {total}')
+        self.stdout.write(f'overall req/s:   {total / sum(elapsed.values()):.0f}')
+        for code in (200, 304):
+            rate = counts[code] / elapsed[code] if elapsed[code] else 0
+            self.stdout.write(f'{code} responses:   {counts[code]} ({rate:.0f} req/s)')
+        self.stdout.write(f'queries on 304s: {not_modified_queries}')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.cache import bump_menu_version
+from products.models import Menu
+from products.search import get_backend
+
+
+class Command(BaseCommand):
+    """
+    Recreates the menu search index from the Menu and Category tables, e.g.
+    after bulk imports that bypass the model signals.
+    """
+    help = 'Rebuild the menu full-text search index.'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError('Menu search is not available on this database.')
+
+        with transaction.atomic():
+            backend.rebuild()
+        bump_menu_version()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {Menu.objects.count()} dishes.'))
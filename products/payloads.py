@@ -0,0 +1,72 @@
+"""
+Precomputed, pre-compressed JSON payloads for menu endpoints.
+
+Payloads are rendered to bytes once and cached together with their gzip
+(and, when the brotli package is installed, brotli) encodings, so a request
+only has to pick a variant and write it out.
+"""
+import gzip
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+from .models import Menu
+
+# Best first; only offered when the client accepts them
+ENCODINGS = ('br', 'gzip')
+
+
+def menu_tree():
+    """
+    Returns every dish grouped by category, categories sorted by name,
+    from a single query.
+    """
+    dishes = Menu.objects.select_related('category').order_by('category__name', 'category_id', 'name', 'id')
+    tree = []
+    current = None
+    for dish in dishes:
+        if current is None or current['id'] != dish.category_id:
+            current = {'id': dish.category_id, 'name': dish.category.name, 'dishes': []}
+            tree.append(current)
+        current['dishes'].append({
+            'id': dish.id,
+            'name': dish.name,
+            'description': dish.description,
+            'price': dish.price,
+        })
+    return tree
+
+
+def encode_variants(data):
+    """
+    Renders data to compact JSON and returns {encoding: bytes}, with
+    'identity' for the uncompressed body.
+    """
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+    variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=6)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=5)
+    return variants
+
+
+def negotiate_encoding(request, available=None):
+    """
+    Picks the best content coding the client accepts, 'identity' if none.
+    """
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    for encoding in ENCODINGS:
+        if (encoding in accepted or '*' in accepted) and (available is None or encoding in available):
+            if encoding == 'br' and brotli is None:
+                continue
+            return encoding
+    return 'identity'
@@ -0,0 +1,315 @@
+"""
+Full-text search over the menu.
+
+Dish name, description and category name are kept in a prebuilt inverted
+index: an FTS5 virtual table on SQLite, or a table of weighted tsvectors
+with a GIN index on PostgreSQL. The index is created after migrate, kept in
+sync by the Menu and Category signals and can be rebuilt with the
+rebuild_menu_search command.
+
+Every query word also matches as a prefix ("chick" finds "chicken"). A word
+that is not a prefix of any indexed term is replaced by its closest terms
+from the index vocabulary, so small typos ("chiken") still match.
+"""
+import bisect
+import difflib
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .cache import menu_version
+from .models import Category, Menu
+
+INDEX_TABLE = 'products_menu_search'
+TOKEN_RE = re.compile(r'\w+')
+# Shorter words are only matched as prefixes, never corrected
+MIN_FUZZY_LENGTH = 4
+FUZZY_CUTOFF = 0.75
+MAX_CORRECTIONS = 3
+# Number of ids per statement when syncing many dishes at once
+SYNC_BATCH_SIZE = 500
+
+
+class BaseSearchBackend:
+    """
+    Shared query parsing and vocabulary handling. Subclasses implement the
+    index itself for one database vendor.
+    """
+    def __init__(self):
+        self._vocabulary = []
+        self._vocabulary_version = None
+        self._lock = threading.Lock()
+
+    def ensure_index(self):
+        raise NotImplementedError
+
+    def index(self, menu_ids):
+        """
+        (Re)indexes the given dishes. Ids that no longer exist are dropped.
+        """
+        menu_ids = list(menu_ids)
+        for start in range(0, len(menu_ids), SYNC_BATCH_SIZE):
+            batch = menu_ids[start:start + SYNC_BATCH_SIZE]
+            with connection.cursor() as cursor:
+                self._index_batch(cursor, batch)
+
+    def remove(self, menu_ids):
+        menu_ids = list(menu_ids)
+        for start in range(0, len(menu_ids), SYNC_BATCH_SIZE):
+            batch = menu_ids[start:start + SYNC_BATCH_SIZE]
+            with connection.cursor() as cursor:
+                self._remove_batch(cursor, batch)
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def vocabulary(self):
+        """
+        Sorted indexed terms, reloaded when the menu version changes.
+        """
+        version = menu_version()
+        if version != self._vocabulary_version:
+            with self._lock:
+                if version != self._vocabulary_version:
+                    with connection.cursor() as cursor:
+                        self._vocabulary = sorted(self._load_vocabulary(cursor))
+                    self._vocabulary_version = version
+        return self._vocabulary
+
+    def parse(self, query):
+        """
+        Splits query into words and returns (word, prefix_match, terms)
+        for each. terms lists the corrections to search for when the word
+        is not a prefix of any indexed term, or just the word itself.
+        """
+        vocabulary = None
+        parsed = []
+        for word in TOKEN_RE.findall(query.lower()):
+            terms = [word]
+            prefix = True
+            if len(word) >= MIN_FUZZY_LENGTH:
+                vocabulary = vocabulary if vocabulary is not None else self.vocabulary()
+                position = bisect.bisect_left(vocabulary, word)
+                if position == len(vocabulary) or not vocabulary[position].startswith(word):
+                    corrections = difflib.get_close_matches(word, vocabulary, MAX_CORRECTIONS, FUZZY_CUTOFF)
+                    if corrections:
+                        terms, prefix = corrections, False
+            parsed.append((word, prefix, terms))
+        return parsed
+
+    def search(self, query, category_id=None, limit=20):
+        """
+        Returns a dict with the ranked ids of the best matching dishes, the
+        total number of matches, per-category match counts (ignoring
+        category_id, so clients can switch facets) and the corrections
+        applied to misspelt words.
+        """
+        parsed = self.parse(query)
+        result = {'ids': [], 'total': 0, 'facets': {}, 'corrections': {
+            word: terms for word, prefix, terms in parsed if not prefix
+        }}
+        if not parsed:
+            return result
+
+        expression = self._build_query(parsed)
+        with connection.cursor() as cursor:
+            result['facets'] = dict(self._facets(cursor, expression))
+            result['total'] = (
+                result['facets'].get(int(category_id), 0) if category_id is not None
+                else sum(result['facets'].values())
+            )
+            if result['total']:
+                result['ids'] = self._ranked_ids(cursor, expression, category_id, limit)
+        return result
+
+    def _build_query(self, parsed):
+        raise NotImplementedError
+
+    def _facets(self, cursor, expression):
+        raise NotImplementedError
+
+    def _ranked_ids(self, cursor, expression, category_id, limit):
+        raise NotImplementedError
+
+    def _load_vocabulary(self, cursor):
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 index ranked with bm25, weighting name over category over description.
+    """
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+                f"name, description, category, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE}_vocab USING fts5vocab({INDEX_TABLE}, 'row')"
+            )
+
+    def _source_sql(self):
+        return (
+            f"SELECT m.id, m.name, m.description, c.name FROM {Menu._meta.db_table} m "
+            f"JOIN {Category._meta.db_table} c ON c.id = m.category_id"
+        )
+
+    def _index_batch(self, cursor, menu_ids):
+        placeholders = ', '.join(['%s'] * len(menu_ids))
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid IN ({placeholders})", menu_ids)
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE} (rowid, name, description, category) "
+            f"{self._source_sql()} WHERE m.id IN ({placeholders})",
+            menu_ids,
+        )
+
+    def _remove_batch(self, cursor, menu_ids):
+        placeholders = ', '.join(['%s'] * len(menu_ids))
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid IN ({placeholders})", menu_ids)
+
+    def rebuild(self):
+        self.ensure_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+            cursor.execute(f"INSERT INTO {INDEX_TABLE} (rowid, name, description, category) {self._source_sql()}")
+            cursor.execute(f"INSERT INTO {INDEX_TABLE} ({INDEX_TABLE}) VALUES ('optimize')")
+
+    def _load_vocabulary(self, cursor):
+        cursor.execute(f"SELECT term FROM {INDEX_TABLE}_vocab")
+        return [term for term, in cursor.fetchall()]
+
+    def _build_query(self, parsed):
+        groups = []
+        for word, prefix, terms in parsed:
+            alternatives = [f'"{term}"*' if prefix else f'"{term}"' for term in terms]
+            groups.append(f"({' OR '.join(alternatives)})")
+        return ' AND '.join(groups)
+
+    def _facets(self, cursor, expression):
+        cursor.execute(
+            f"SELECT m.category_id, COUNT(*) FROM {INDEX_TABLE} s "
+            f"JOIN {Menu._meta.db_table} m ON m.id = s.rowid "
+            f"WHERE {INDEX_TABLE} MATCH %s GROUP BY m.category_id",
+            [expression],
+        )
+        return cursor.fetchall()
+
+    def _ranked_ids(self, cursor, expression, category_id, limit):
+        sql = f"SELECT s.rowid FROM {INDEX_TABLE} s"
+        params = [expression]
+        if category_id is not None:
+            sql += f" JOIN {Menu._meta.db_table} m ON m.id = s.rowid WHERE {INDEX_TABLE} MATCH %s AND m.category_id = %s"
+            params.append(category_id)
+        else:
+            sql += f" WHERE {INDEX_TABLE} MATCH %s"
+        cursor.execute(f"{sql} ORDER BY bm25({INDEX_TABLE}, 10.0, 1.0, 4.0) LIMIT %s", params + [limit])
+        return [menu_id for menu_id, in cursor.fetchall()]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Weighted tsvectors (name A, category B, description C) in a side table
+    with a GIN index, ranked with ts_rank. Uses the 'simple' configuration
+    so terms and prefixes behave like the SQLite index.
+    """
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+                f"menu_id bigint PRIMARY KEY REFERENCES {Menu._meta.db_table} (id) ON DELETE CASCADE, "
+                f"category_id bigint NOT NULL, document tsvector NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_gin ON {INDEX_TABLE} USING GIN (document)")
+
+    def _source_sql(self):
+        return (
+            f"SELECT m.id, m.category_id, "
+            f"setweight(to_tsvector('simple', m.name), 'A') || "
+            f"setweight(to_tsvector('simple', c.name), 'B') || "
+            f"setweight(to_tsvector('simple', m.description), 'C') "
+            f"FROM {Menu._meta.db_table} m JOIN {Category._meta.db_table} c ON c.id = m.category_id"
+        )
+
+    def _index_batch(self, cursor, menu_ids):
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE menu_id = ANY(%s)", [menu_ids])
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE} (menu_id, category_id, document) {self._source_sql()} WHERE m.id = ANY(%s)",
+            [menu_ids],
+        )
+
+    def _remove_batch(self, cursor, menu_ids):
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE menu_id = ANY(%s)", [menu_ids])
+
+    def rebuild(self):
+        self.ensure_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {INDEX_TABLE}")
+            cursor.execute(f"INSERT INTO {INDEX_TABLE} (menu_id, category_id, document) {self._source_sql()}")
+
+    def _load_vocabulary(self, cursor):
+        cursor.execute(f"SELECT word FROM ts_stat('SELECT document FROM {INDEX_TABLE}')")
+        return [word for word, in cursor.fetchall()]
+
+    def _build_query(self, parsed):
+        groups = []
+        for word, prefix, terms in parsed:
+            alternatives = [f"{term}:*" if prefix else term for term in terms]
+            groups.append(f"({' | '.join(alternatives)})")
+        return ' & '.join(groups)
+
+    def _facets(self, cursor, expression):
+        cursor.execute(
+            f"SELECT category_id, COUNT(*) FROM {INDEX_TABLE} "
+            f"WHERE document @@ to_tsquery('simple', %s) GROUP BY category_id",
+            [expression],
+        )
+        return cursor.fetchall()
+
+    def _ranked_ids(self, cursor, expression, category_id, limit):
+        sql = (
+            f"SELECT menu_id FROM {INDEX_TABLE}, to_tsquery('simple', %s) query "
+            f"WHERE document @@ query"
+        )
+        params = [expression]
+        if category_id is not None:
+            sql += " AND category_id = %s"
+            params.append(category_id)
+        cursor.execute(f"{sql} ORDER BY ts_rank(document, query) DESC, menu_id LIMIT %s", params + [limit])
+        return [menu_id for menu_id, in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    The configured backend (settings.MENU_SEARCH_BACKEND, a dotted path) or
+    the one for the default database's vendor. None if neither applies.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'MENU_SEARCH_BACKEND', None)
+                backend_class = import_string(path) if path else BACKENDS.get(connection.vendor)
+                _backend = backend_class() if backend_class else False
+    return _backend or None
+
+
+def create_search_index(sender, using, **kwargs):
+    """
+    post_migrate receiver creating the index table if it does not exist.
+    """
+    backend = get_backend()
+    if backend and using == connection.alias:
+        backend.ensure_index()
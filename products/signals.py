@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_menu_version, menu_cache
+from .models import Category, Menu
+from .search import get_backend
+
+
+@receiver(pre_save, sender=Menu, dispatch_uid='products.signals.remember_menu_category')
+def remember_menu_category(sender, instance, update_fields=None, **kwargs):
+    """
+    Records the category a dish is saved out of, so menu_changed also
+    clears the listing it leaves, however it is saved.
+    """
+    instance._previous_category_id = None
+    if instance.pk is None or (update_fields is not None and 'category' not in update_fields):
+        return
+    instance._previous_category_id = (
+        Menu.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+    )
+
+
+@receiver([post_save, post_delete], sender=Menu, dispatch_uid='products.signals.menu_changed')
+def menu_changed(sender, instance, signal, **kwargs):
+    """
+    Invalidates cached menus for the dish's category, and the one it moved
+    out of, and the menu ETag version, and updates the search index once the
+    write commits.
+    """
+    category_ids = [instance.category_id, getattr(instance, '_previous_category_id', None)]
+
+    def invalidate():
+        menu_cache.invalidate(category_ids)
+        search = get_backend()
+        if search:
+            if signal is post_delete:
+                search.remove([instance.pk])
+            else:
+                search.index([instance.pk])
+        bump_menu_version()
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=Category, dispatch_uid='products.signals.category_changed')
+def category_changed(sender, instance, signal, **kwargs):
+    """
+    Category names are embedded in every serialized dish and indexed for
+    search, so a category write invalidates and reindexes its dishes as well.
+    Deleted dishes are removed from the index by menu_changed.
+    """
+    def invalidate():
+        menu_cache.invalidate([instance.pk])
+        search = get_backend()
+        if search and signal is post_save:
+            search.index(Menu.objects.filter(category_id=instance.pk).values_list('id', flat=True))
+        bump_menu_version()
+    transaction.on_commit(invalidate)
@@ -1,3 +1,193 @@
+import gzip
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .cache import ALL_MENU_TAG, MenuCache, category_tag
+from .models import Category, Menu
+from .search import get_backend
+from .views import MenuCategoryListView, MenuViewSet
+
+
+class MenuSearchTests(TestCase):
+    """
+    Search matches prefixes and misspellings, ranks name matches first and
+    counts matches per category.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mains = Category.objects.create(name='Mains')
+        cls.starters = Category.objects.create(name='Starters')
+        cls.tikka = Menu.objects.create(name='Chicken Tikka', description='Charred in the tandoor', price='12.00', category=cls.mains)
+        cls.korma = Menu.objects.create(name='Vegetable Korma', description='Mild curry, no chicken', price='10.00', category=cls.mains)
+        cls.wings = Menu.objects.create(name='Chicken Wings', description='Smoky glaze', price='7.00', category=cls.starters)
+        get_backend().rebuild()
+
+    def setUp(self):
+        self.search = get_backend()
+
+    def test_prefix_match_ranks_names_first(self):
+        found = self.search.search('chick')
+        self.assertEqual(found['total'], 3)
+        self.assertEqual(found['ids'][-1], self.korma.pk)
+        self.assertEqual(found['facets'], {self.mains.pk: 2, self.starters.pk: 1})
+
+    def test_typo_is_corrected(self):
+        found = self.search.search('tandor', category_id=self.mains.pk)
+        self.assertEqual(found['ids'], [self.tikka.pk])
+        self.assertEqual(found['corrections'], {'tandor': ['tandoor']})
+
+
+class GroupedMenuTests(TestCase):
+    """
+    The grouped menu is built with one query, then served as cached bytes
+    in the encoding the client asks for.
+    """
+
+    def _get(self, **headers):
+        request = APIRequestFactory().get('/menu/by-category/', **headers)
+        force_authenticate(request, user=self.user)
+        return MenuCategoryListView.as_view()(request)
+
+    def test_single_query_then_cached_gzip(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='customer', password='secret')
+        for name in ('Mains', 'Desserts'):
+            category = Category.objects.create(name=name)
+            for i in range(3):
+                Menu.objects.create(name=f'{name} {i}', description='', price='5.00', category=category)
+
+        with self.assertNumQueries(1):
+            plain = self._get()
+        tree = json.loads(plain.content)['categories']
+        self.assertEqual([(c['name'], len(c['dishes'])) for c in tree], [('Desserts', 3), ('Mains', 3)])
+
+        with self.assertNumQueries(0):
+            compressed = self._get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed['X-Cache'], 'HIT')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+
+
+class MenuCacheTests(TestCase):
+    """
+    Entries are served until one of their tags is invalidated, and only one
+    worker rebuilds an entry at a time.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.menu_cache = MenuCache()
+        self.category = Category.objects.create(name='Mains')
+
+    def compute(self, value):
+        calls = []
+
+        def compute():
+            calls.append(value)
+            return value
+        return compute, calls
+
+    def test_miss_then_hit(self):
+        compute, calls = self.compute(['curry'])
+        tags = [category_tag(self.category.pk)]
+        self.assertEqual(self.menu_cache.get_or_compute('key', tags, compute), (['curry'], 'miss'))
+        self.assertEqual(self.menu_cache.get_or_compute('key', tags, compute), (['curry'], 'hit'))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.menu_cache.stats()['hit_ratio'], 0.5)
+
+    def test_writes_invalidate_their_tags(self):
+        other = Category.objects.create(name='Desserts')
+        tags = {
+            'all': [ALL_MENU_TAG],
+            'mains': [category_tag(self.category.pk)],
+            'desserts': [category_tag(other.pk)],
+        }
+        for name, entry_tags in tags.items():
+            self.menu_cache.get_or_compute(name, entry_tags, lambda: name)
+
+        def states():
+            return {
+                name: self.menu_cache.get_or_compute(name, entry_tags, lambda: name)[1]
+                for name, entry_tags in tags.items()
+            }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Menu.objects.create(name='Curry', description='', price='9.00', category=self.category)
+        self.assertEqual(states(), {'all': 'miss', 'mains': 'miss', 'desserts': 'hit'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.name = 'Sweets'
+            other.save()
+        self.assertEqual(states(), {'all': 'miss', 'mains': 'hit', 'desserts': 'miss'})
+
+    def test_single_flight_serves_stale_while_rebuilding(self):
+        tags = [ALL_MENU_TAG]
+        self.menu_cache.get_or_compute('key', tags, lambda: 'old')
+        self.menu_cache.invalidate()
+
+        # Another worker holds the rebuild lock
+        cache.add('key:lock', 1)
+        compute, calls = self.compute('new')
+        self.assertEqual(self.menu_cache.get_or_compute('key', tags, compute), ('old', 'stale'))
+        self.assertEqual(calls, [])
+
+        cache.delete('key:lock')
+        self.assertEqual(self.menu_cache.get_or_compute('key', tags, compute), ('new', 'miss'))
+        self.assertEqual(self.menu_cache.get_or_compute('key', tags, compute), ('new', 'hit'))
+        self.assertEqual(calls, ['new'])
+
+
+class MenuListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(username='manager', password='secret', role=User.Role.MANAGER)
+        self.category = Category.objects.create(name='Mains')
+        Menu.objects.create(name='Curry', description='', price='9.00', category=self.category)
+
+    def _list(self, headers=None, **params):
+        request = APIRequestFactory().get('/menu/', params, **(headers or {}))
+        force_authenticate(request, user=self.user)
+        return MenuViewSet.as_view({'get': 'list'})(request)
+
+    def test_etag_changes_on_menu_writes(self):
+        etag = self._list()['ETag']
+        self.assertEqual(self._list({'HTTP_IF_NONE_MATCH': etag}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Menu.objects.create(name='Naan', description='', price='2.00', category=self.category)
+        response = self._list({'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['dishes']), 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Curries'
+            self.category.save()
+        self.assertEqual(self._list({'HTTP_IF_NONE_MATCH': etag}).status_code, 200)
+
+    def test_moving_a_dish_clears_its_old_category(self):
+        dish = Menu.objects.get()
+        self.assertEqual(len(self._list(category=self.category.pk).data['dishes']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dish.category = Category.objects.create(name='Specials')
+            dish.save()
+        response = self._list(category=self.category.pk)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['dishes'], [])
+
+    def test_non_numeric_category_is_rejected(self):
+        self.assertEqual(self._list(category='abc').status_code, 400)
 
-# Create your tests here.
+    def test_cache_is_keyed_on_the_category_only(self):
+        self.assertEqual(self._list(category=self.category.pk)['X-Cache'], 'MISS')
+        response = self._list(category=f'0{self.category.pk}', page='7', utm_source='mail')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(response.data['dishes']), 1)
@@ -1,68 +1,198 @@
-from rest_framework import viewsets, permissions
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework import generics, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.core.cache import cache
 from account.permissions import IsManagerOrAdmin
-from .models import Menu
+from orders.popularity import POPULAR_SIZE, WINDOWS, top_dishes
+from restaurant_management.replicas import ReplicaReadMixin
+from .cache import ALL_MENU_TAG, category_tag, menu_cache, menu_etag
+from .models import Category, Menu
+from .payloads import encode_variants, menu_tree, negotiate_encoding
+from .search import get_backend
 from .serializers import MenuSerializer
 
+def dish_list_key(category_id=None):
+    """
+    Cache key of a dish list, all dishes or those of one category. Keyed on
+    the category alone so arbitrary query parameters cannot add entries.
+    """
+    return menu_cache.make_key('list', [('category', None if category_id is None else int(category_id))])
+
 class MenuViewSet(viewsets.ModelViewSet):
     """
     A viewset for viewing and editing menu items.
     Only managers and admins can create, update, or delete menu items.
     """
-    queryset = Menu.objects.all()
+    queryset = Menu.objects.select_related('category')
     serializer_class = MenuSerializer
     permission_classes = [permissions.IsAuthenticated, IsManagerOrAdmin]
 
+    @method_decorator(condition(etag_func=menu_etag))
     def list(self, request, *args, **kwargs):
         """
         Custom list method to add caching logic.
+        Payloads are cached per category, given as ?category=<id>.
         """
-        # Define a cache key for the menu items
-        cache_key = 'menu_items'
-        
-        # Try to get the data from the cache first
-        cached_data = cache.get(cache_key)
-
-        if cached_data:
-            # If data is in the cache, return it with the 'cached' flag
-            response_data = {'dishes': cached_data, 'cached': True}
-            return Response(response_data)
-        
-        # If no cached data, fetch from the database
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        
-        # Extract just the names of the dishes for the response
-        dish_names = [item['name'] for item in serializer.data]
-        
-        # Cache the data for 10 minutes (600 seconds)
-        cache.set(cache_key, dish_names, timeout=600)
-        
-        response_data = {'dishes': dish_names, 'cached': False}
-        return Response(response_data)
-
-    def perform_create(self, serializer):
+        category_id = request.query_params.get('category')
+        if category_id is not None and not category_id.isdigit():
+            return Response(
+                {'detail': 'The category parameter must be numeric.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        category_id = None if category_id is None else int(category_id)
+        tags = [ALL_MENU_TAG] if category_id is None else [category_tag(category_id)]
+        cache_key = dish_list_key(category_id)
+
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
+            if category_id is not None:
+                queryset = queryset.filter(category_id=category_id)
+            return self.get_serializer(queryset, many=True).data
+
+        dishes, state = menu_cache.get_or_compute(cache_key, tags, build)
+        response_data = {'dishes': dishes, 'cached': state != 'miss'}
+        return Response(response_data, headers={'X-Cache': state.upper()})
+
+    @method_decorator(condition(etag_func=menu_etag))
+    def retrieve(self, request, *args, **kwargs):
         """
-        Clears the cache when a new menu item is created.
+        Serves a single dish from the menu cache.
         """
-        # Save the new menu item
-        serializer.save()
-        # Invalidate the cache
-        cache.delete('menu_items')
+        cache_key = menu_cache.make_key(f"item:{kwargs['pk']}")
+        data, state = menu_cache.get_or_compute(
+            cache_key, [ALL_MENU_TAG], lambda: self.get_serializer(self.get_object()).data
+        )
+        return Response(data, headers={'X-Cache': state.upper()})
 
-    def perform_update(self, serializer):
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def search(self, request):
         """
-        Clears the cache when a menu item is updated.
+        Full-text search over dish names, descriptions and categories, e.g.
+        ?q=chicken tikka&category=3&limit=20. Results are ranked, words also
+        match as prefixes and misspelt words are corrected. facets counts
+        the matches per category.
         """
-        # Save the updated menu item
-        serializer.save()
-        # Invalidate the cache
-        cache.delete('menu_items')
+        query = request.query_params.get('q', '').strip()
+        category_id = request.query_params.get('category')
+        limit = request.query_params.get('limit', '20')
+        if not query:
+            return Response({'detail': 'A search query q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if (category_id and not category_id.isdigit()) or not limit.isdigit():
+            return Response(
+                {'detail': 'category and limit must be numbers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        backend = get_backend()
+        if backend is None:
+            return Response(
+                {'detail': 'Menu search is not available on this database.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        found = backend.search(query, int(category_id) if category_id else None, min(int(limit), 100))
+
+        dishes = Menu.objects.select_related('category').in_bulk(found['ids'])
+        category_names = dict(Category.objects.filter(pk__in=found['facets']).values_list('id', 'name'))
+        return Response({
+            'query': query,
+            'total': found['total'],
+            'results': self.get_serializer([dishes[pk] for pk in found['ids'] if pk in dishes], many=True).data,
+            'facets': [
+                {'category_id': pk, 'category': category_names.get(pk), 'count': count}
+                for pk, count in sorted(found['facets'].items(), key=lambda facet: -facet[1])
+            ],
+            'corrections': found['corrections'],
+        })
+
+def grouped_menu_etag(request, *args, **kwargs):
+    """
+    menu_etag plus the negotiated content coding, since each coding is a
+    different representation.
+    """
+    return f'{menu_etag(request)}-{negotiate_encoding(request)}'
+
+class MenuCategoryListView(generics.ListAPIView):
+    """
+    API view listing the whole menu grouped by category, or the dishes of
+    one category given as ?category=<id>.
+    The grouped menu is built from one query and cached as JSON bytes with
+    compressed variants until a dish or category changes. The per-category
+    lists share their cache entries with MenuViewSet.list.
+    """
+    serializer_class = MenuSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Menu.objects.select_related('category').filter(
+            category_id=self.request.query_params.get('category')
+        )
+
+    @method_decorator(condition(etag_func=grouped_menu_etag))
+    def list(self, request, *args, **kwargs):
+        category_id = request.query_params.get('category')
+        if category_id is None:
+            return self.grouped(request)
+        if not category_id.isdigit():
+            return Response(
+                {'detail': 'The category parameter must be numeric.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-    def perform_destroy(self, instance):
+        category_id = int(category_id)
+        dishes, state = menu_cache.get_or_compute(
+            dish_list_key(category_id), [category_tag(category_id)],
+            lambda: self.get_serializer(self.get_queryset(), many=True).data,
+        )
+        return Response({'category': category_id, 'dishes': dishes}, headers={'X-Cache': state.upper()})
+
+    def grouped(self, request):
         """
-        Clears the cache when a menu item is deleted.
+        Writes out the cached category -> dishes tree in the best encoding
+        the client accepts, skipping serialization entirely.
         """
-        instance.delete()
-        cache.delete('menu_items')
+        variants, state = menu_cache.get_or_compute(
+            menu_cache.make_key('grouped'), [ALL_MENU_TAG], lambda: encode_variants({'categories': menu_tree()})
+        )
+        encoding = negotiate_encoding(request, variants)
+        response = HttpResponse(variants[encoding], content_type='application/json')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        response['X-Cache'] = state.upper()
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+class PopularMenuView(APIView):
+    """
+    The dishes selling best right now, for the public menu.
+    ?window= is hour, day (the default) or week and ?limit= at most 50.
+    """
+    permission_classes = [permissions.AllowAny]
+    default_window = 'day'
+    cache_scope = {'public': True}
+
+    def get(self, request, *args, **kwargs):
+        window = request.query_params.get('window', self.default_window)
+        limit = request.query_params.get('limit', '10')
+        if window not in WINDOWS or not limit.isdigit():
+            return Response(
+                {'detail': f"window must be one of {', '.join(WINDOWS)} and limit a number."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dishes, max_age = top_dishes(window, min(int(limit), POPULAR_SIZE))
+        response = Response({'window': window, 'dishes': dishes})
+        patch_cache_control(response, max_age=max_age, **self.cache_scope)
+        return response
+
+class PopularDishesReportView(ReplicaReadMixin, PopularMenuView):
+    """
+    Best selling dishes over the last hour, day or week for managers.
+    Same figures as PopularMenuView, defaulting to the last week.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsManagerOrAdmin]
+    default_window = 'week'
+    cache_scope = {'private': True}
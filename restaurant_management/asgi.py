@@ -2,6 +2,8 @@
 ASGI config for restaurant_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests for the live order feed (WebSocket and Server-Sent Events) are routed
+to orders.asgi; everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +15,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant_management.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from orders.asgi import handles as is_order_feed, order_feed_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if is_order_feed(scope):
+        return await order_feed_application(scope, receive, send)
+    return await django_application(scope, receive, send)
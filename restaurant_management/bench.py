@@ -0,0 +1,17 @@
+"""
+Helpers shared by the benchmark and load-test management commands.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def rolled_back(using=None):
+    """
+    Runs the block in a transaction that is always rolled back, so the
+    fixture rows a benchmark creates never reach the database.
+    """
+    with transaction.atomic(using=using):
+        yield
+        transaction.set_rollback(True, using=using)
@@ -0,0 +1,163 @@
+"""
+Database configuration from the environment.
+
+DB_ENGINE selects the backend:
+
+sqlite (default)
+    DB_NAME, the file, defaults to db.sqlite3 in the project directory.
+    DB_SQLITE_PROFILE is 'default' for SQLite's own settings, or 'tuned'
+    for persistent connections, WAL journaling, relaxed fsyncs and a busy
+    timeout. WAL adds -wal and -shm files next to the database and relaxed
+    fsyncs can lose the last transactions on a power loss, so it is opt-in.
+postgresql
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and DB_PORT. Connections persist
+    for DB_CONN_MAX_AGE seconds (default 60) and are health checked before
+    reuse unless DB_CONN_HEALTH_CHECKS is false. DB_POOL picks a pooled
+    mode: 'native' for psycopg's connection pool (Django 5.1+, sized by
+    DB_POOL_MIN_SIZE and DB_POOL_MAX_SIZE) or 'pgbouncer' when connecting
+    through PgBouncer in transaction pooling mode.
+
+DB_REPLICAS lists read replicas, comma separated: host or host:port for
+PostgreSQL, file paths for SQLite. See restaurant_management/replicas.py.
+"""
+import os
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Applied to every new connection by the 'tuned' SQLite profile
+SQLITE_TUNED_PRAGMAS = {
+    # Readers no longer block the writer, nor the writer readers
+    'journal_mode': 'WAL',
+    # Sync at checkpoints only. Durable against crashes of the process,
+    # a power loss can drop the last transactions but not corrupt the file
+    'synchronous': 'NORMAL',
+    # Wait for the write lock instead of failing with "database is locked"
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+    # In KiB when negative, i.e. 20 MB of page cache per connection
+    'cache_size': -20000,
+}
+
+
+def _env_bool(env, name, default):
+    value = env.get(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_int(env, name, default):
+    value = env.get(name)
+    try:
+        return default if value is None or value == '' else int(value)
+    except ValueError:
+        raise ImproperlyConfigured(f'{name} must be an integer, got {value!r}.')
+
+
+def database_config(base_dir, env=None):
+    """
+    The settings dict for the default database, built from env
+    (os.environ by default).
+    """
+    env = os.environ if env is None else env
+    engine = env.get('DB_ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        return _sqlite_config(base_dir, env)
+    if engine == 'postgresql':
+        return _postgresql_config(env)
+    raise ImproperlyConfigured(f"DB_ENGINE must be 'sqlite' or 'postgresql', got {engine!r}.")
+
+
+def _sqlite_config(base_dir, env):
+    config = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': env.get('DB_NAME') or base_dir / 'db.sqlite3',
+    }
+    profile = env.get('DB_SQLITE_PROFILE', 'default')
+    if profile == 'tuned':
+        config['CONN_MAX_AGE'] = _env_int(env, 'DB_CONN_MAX_AGE', 60)
+        if django.VERSION >= (5, 1):
+            config['OPTIONS'] = {
+                'init_command': ';'.join(f'PRAGMA {name} = {value}' for name, value in SQLITE_TUNED_PRAGMAS.items()),
+                # Take the write lock when the transaction starts. A deferred
+                # transaction that reads first and then writes fails at once
+                # when another writer holds the lock, whatever the busy timeout
+                'transaction_mode': 'IMMEDIATE',
+            }
+        else:
+            config['PRAGMAS'] = dict(SQLITE_TUNED_PRAGMAS)
+    elif profile != 'default':
+        raise ImproperlyConfigured(f"DB_SQLITE_PROFILE must be 'tuned' or 'default', got {profile!r}.")
+    return config
+
+
+def _postgresql_config(env):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('DB_NAME', 'restaurant_management'),
+        'USER': env.get('DB_USER', ''),
+        'PASSWORD': env.get('DB_PASSWORD', ''),
+        'HOST': env.get('DB_HOST', 'localhost'),
+        'PORT': env.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': _env_int(env, 'DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': _env_bool(env, 'DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {'connect_timeout': _env_int(env, 'DB_CONNECT_TIMEOUT', 5)},
+    }
+    pool = env.get('DB_POOL', '')
+    if pool == 'native':
+        if django.VERSION < (5, 1):
+            raise ImproperlyConfigured('DB_POOL=native needs Django 5.1 or later and psycopg 3.')
+        # The pool owns connection reuse; Django refuses persistent
+        # connections on top of it
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': _env_int(env, 'DB_POOL_MIN_SIZE', 2),
+            'max_size': _env_int(env, 'DB_POOL_MAX_SIZE', 10),
+            'timeout': _env_int(env, 'DB_POOL_TIMEOUT', 10),
+        }
+    elif pool == 'pgbouncer':
+        # In transaction pooling a server connection is only ours until the
+        # transaction ends, which breaks named cursors. Querysets iterated
+        # with .iterator() are then fetched whole by the client
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    elif pool:
+        raise ImproperlyConfigured(f"DB_POOL must be 'native' or 'pgbouncer', got {pool!r}.")
+    return config
+
+
+def replica_configs(primary, env=None):
+    """
+    Settings dicts for the replicas in DB_REPLICAS, aliased replica_1,
+    replica_2 and so on. Each copies the primary's settings. Test runs
+    mirror them to the primary's test database.
+    """
+    env = os.environ if env is None else env
+    configs = {}
+    for number, location in enumerate(filter(None, env.get('DB_REPLICAS', '').split(',')), start=1):
+        config = {**primary, 'OPTIONS': dict(primary.get('OPTIONS', {})), 'TEST': {'MIRROR': 'default'}}
+        location = location.strip()
+        if config['ENGINE'] == 'django.db.backends.sqlite3':
+            config['NAME'] = location
+        else:
+            host, _, port = location.partition(':')
+            config['HOST'] = host
+            config['PORT'] = port or config['PORT']
+        configs[f'replica_{number}'] = config
+    return configs
+
+
+@receiver(connection_created, dispatch_uid='restaurant_management.db.apply_sqlite_pragmas')
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Applies the PRAGMAS of the database's settings to each new SQLite
+    connection, on Django versions without the init_command option.
+    """
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
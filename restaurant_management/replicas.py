@@ -0,0 +1,142 @@
+"""
+Read-replica routing.
+
+Writes always go to the primary ('default'). Reads go to one of
+settings.DATABASE_REPLICAS only inside replica_reads(), which views enter
+through ReplicaReadMixin (safe methods only) and Celery tasks through the
+same replica_reads() used as a decorator. Everything else keeps reading
+from the primary.
+
+Reads stay on the primary, even in a replica_reads() block:
+- inside a transaction on the primary,
+- after the current request or task wrote anything,
+- for REPLICA_STICKY_SECONDS after the requesting user last wrote, so a
+  user sees their own changes even while the replicas lag behind.
+"""
+import contextlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+STICKY_KEY = 'replicas:sticky:{}'
+DEFAULT_STICKY_SECONDS = 10
+
+_replica_reads = ContextVar('replica_reads', default=False)
+# A one-item list per request or task, set to True on the first write
+_wrote = ContextVar('replica_wrote', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+@contextlib.contextmanager
+def replica_reads():
+    """
+    Lets reads in the block go to a replica. Also usable as a decorator.
+    """
+    reads_token = _replica_reads.set(True)
+    wrote_token = _wrote.set([False]) if _wrote.get() is None else None
+    try:
+        yield
+    finally:
+        if wrote_token is not None:
+            _wrote.reset(wrote_token)
+        _replica_reads.reset(reads_token)
+
+
+def stick_to_primary():
+    """
+    Sends the rest of the current replica_reads() block to the primary.
+    """
+    _replica_reads.set(False)
+
+
+def _sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+
+
+def mark_user_wrote(user_id):
+    cache.set(STICKY_KEY.format(user_id), True, _sticky_seconds())
+
+
+def user_is_sticky(user_id):
+    return bool(cache.get(STICKY_KEY.format(user_id)))
+
+
+class ReplicaRouter:
+    """
+    Database router sending replica_reads() reads to a random replica.
+    """
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return None
+        wrote = _wrote.get()
+        if wrote and wrote[0]:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        aliases = replicas()
+        return random.choice(aliases) if aliases else None
+
+    def db_for_write(self, model, **hints):
+        wrote = _wrote.get()
+        if wrote is not None:
+            wrote[0] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Remembers users whose request wrote to the database, so their reads
+    stay on the primary for REPLICA_STICKY_SECONDS. Must come after the
+    authentication middleware; DRF sets request.user on the underlying
+    request once it authenticates.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrote = [False]
+        token = _wrote.set(wrote)
+        try:
+            response = self.get_response(request)
+        finally:
+            _wrote.reset(token)
+        user = getattr(request, 'user', None)
+        if wrote[0] and replicas() and user is not None and user.is_authenticated:
+            mark_user_wrote(user.pk)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    View mixin serving GET, HEAD and OPTIONS requests from a replica,
+    unless the user wrote within the last REPLICA_STICKY_SECONDS.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if replicas() and request.user.is_authenticated and user_is_sticky(request.user.pk):
+            stick_to_primary()
@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from .db import database_config, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -54,6 +57,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'restaurant_management.replicas.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -64,7 +68,8 @@ MIDDLEWARE = [
 # Django Rest Framework and Simple JWT settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from the token claims instead of the user row
+        'account.authentication.ClaimsJWTAuthentication',
     ],
 }
 
@@ -89,6 +94,7 @@ SIMPLE_JWT = {
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
     "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
+    "TOKEN_REFRESH_SERIALIZER": "account.serializers.CustomTokenRefreshSerializer",
     "JTI_CLAIM": "jti",
     "SLIDING_TOKEN_REFRESH_EXP_CLAIM": "refresh_exp",
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
@@ -119,13 +125,23 @@ WSGI_APPLICATION = 'restaurant_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Configured from the environment, see restaurant_management/db.py. Defaults
+# to SQLite with its stock settings; DB_SQLITE_PROFILE=tuned turns on WAL,
+# relaxed fsyncs and persistent connections for a busy single node. Set
+# DB_ENGINE=postgresql and DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+# for PostgreSQL.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
 
+# Read replicas from DB_REPLICAS. Reports, exports and order listings read
+# from them, see restaurant_management/replicas.py. A user's reads stay on
+# the primary for REPLICA_STICKY_SECONDS after they write.
+DATABASES.update(replica_configs(DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['restaurant_management.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -181,10 +197,40 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Live order feed (orders.feed). Events fan out in-process by default; set a
+# Redis URL, e.g. 'redis://localhost:6379/1', to share them between processes.
+ORDER_FEED_REDIS_URL = None
+
+# Default cache. Token revocation and replica stickiness live here, so every
+# worker process must share it: set CACHE_REDIS_URL, e.g.
+# 'redis://localhost:6379/2', in production (`manage.py check --deploy` fails
+# otherwise). Without it each process keeps its own in-memory cache.
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+
+# Menu search (products.search). The index backend is picked from the database
+# vendor (SQLite FTS5 or PostgreSQL tsvector); set a dotted path to override it.
+MENU_SEARCH_BACKEND = None
+
 # Celery Beat Scheduling
 CELERY_BEAT_SCHEDULE = {
     'daily-sales-report': {
         'task': 'orders.tasks.generate_daily_report',
         'schedule': 86400.0, # 24 hours in seconds
     },
+    # Picks up emails whose retry is due or whose delivery task was lost
+    'drain-email-outbox': {
+        'task': 'orders.tasks.send_outbox_emails',
+        'schedule': 60.0,
+    },
+    'prune-dish-sales-buckets': {
+        'task': 'orders.tasks.prune_dish_sales_buckets',
+        'schedule': 86400.0,
+    },
 }